@@ -0,0 +1 @@
+"""Benchmarks for agoradatatools. Run a benchmark module with `python -m benchmarks.<module>`."""
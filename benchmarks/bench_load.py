@@ -0,0 +1,82 @@
+"""Compares the streaming JSON writer in `load.df_to_json` with writing the full list of records
+at once. Usage: `python -m benchmarks.bench_load [n_rows]`"""
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from agoradatatools.etl import load
+from benchmarks.harness import measure, print_measurements
+
+
+def make_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a data frame shaped like rnaseq_differential_expression"""
+    rng = np.random.default_rng(seed)
+    logfc = rng.normal(size=n_rows)
+    logfc[rng.random(n_rows) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "ensembl_gene_id": [f"ENSG{i:011d}" for i in range(n_rows)],
+            "hgnc_symbol": rng.choice(["APOE", "TREM2", "BIN1", None], size=n_rows),
+            "logfc": logfc,
+            "fc": 2**logfc,
+            "ci_l": logfc - 0.5,
+            "ci_r": logfc + 0.5,
+            "adj_p_val": rng.random(n_rows),
+            "tissue": rng.choice(
+                ["CBE", "DLPFC", "FP", "IFG", "PHG", "STG", "TCX"], size=n_rows
+            ),
+            "study": rng.choice(["MAYO", "MSSM", "ROSMAP"], size=n_rows),
+            "model": rng.choice(
+                [
+                    "AD Diagnosis (males and females)",
+                    "AD Diagnosis x Sex (females only)",
+                ],
+                size=n_rows,
+            ),
+        }
+    )
+
+
+def write_all_records(df: pd.DataFrame, staging_path: str, filename: str) -> str:
+    """The original implementation of df_to_json, which builds the full list of records first"""
+    df = df.replace({np.nan: None})
+    df_as_dict = df.to_dict(orient="records")
+    path = os.path.join(staging_path, filename)
+    with open(path, "w+") as temp_json:
+        json.dump(df_as_dict, temp_json, cls=load.NumpyEncoder, indent=2)
+    return path
+
+
+def main(n_rows: int = 200000):
+    df = make_frame(n_rows)
+    with tempfile.TemporaryDirectory() as staging_path:
+        measurements = [
+            measure(
+                "write all records",
+                write_all_records,
+                df=df,
+                staging_path=staging_path,
+                filename="all_records.json",
+            ),
+            measure(
+                "df_to_json (streaming)",
+                load.df_to_json,
+                df=df,
+                staging_path=staging_path,
+                filename="streaming.json",
+            ),
+        ]
+        with open(measurements[0].result) as f1, open(measurements[1].result) as f2:
+            identical = f1.read() == f2.read()
+
+    print(f"{n_rows} rows, identical output: {identical}")
+    print_measurements(measurements)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
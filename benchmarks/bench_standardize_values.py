@@ -0,0 +1,72 @@
+"""Compares `utils.standardize_values` with its original regex-based `DataFrame.replace` implementation
+on wide data frames shaped like the source files after extraction: mostly numeric columns, with a few
+text columns that contain missing value markers such as "n/a" and "N/A".
+Usage: `python -m benchmarks.bench_standardize_values [n_rows] [n_numeric_columns] [n_text_columns]`"""
+
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from agoradatatools.etl import utils
+from benchmarks.harness import measure, print_measurements
+
+
+def standardize_values_replace(df: pd.DataFrame) -> pd.DataFrame:
+    """The original implementation of utils.standardize_values"""
+    try:
+        df.replace(["n/a", "N/A", "n/A", "N/a"], np.nan, regex=True, inplace=True)
+    except TypeError:
+        print("Error comparing types.")
+
+    return df
+
+
+def make_frame(
+    n_rows: int, n_numeric_columns: int, n_text_columns: int, seed: int = 0
+) -> pd.DataFrame:
+    """Builds a data frame with float, integer and text columns, in that order"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(n_numeric_columns):
+        if i % 2:
+            columns[f"count_{i}"] = rng.integers(0, 1000, size=n_rows)
+        else:
+            values = rng.random(n_rows)
+            values[rng.random(n_rows) < 0.05] = np.nan
+            columns[f"score_{i}"] = values
+    text_values = np.array(
+        ["ENSG00000000001", "CBE", "DLPFC", "n/a", "N/A", "not measured (n/a)", None],
+        dtype=object,
+    )
+    for i in range(n_text_columns):
+        columns[f"text_{i}"] = rng.choice(text_values, size=n_rows)
+    return pd.DataFrame(columns)
+
+
+def main(n_rows: int = 50000, n_numeric_columns: int = 200, n_text_columns: int = 10):
+    df = make_frame(n_rows, n_numeric_columns, n_text_columns)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        measurements = [
+            measure(
+                "standardize_values (DataFrame.replace)",
+                lambda: standardize_values_replace(df.copy()),
+            ),
+            measure(
+                "standardize_values",
+                lambda: utils.standardize_values(df=df.copy()),
+            ),
+        ]
+
+    identical = measurements[0].result.equals(measurements[1].result)
+    print(
+        f"{n_rows} rows, {n_numeric_columns} numeric and {n_text_columns} text columns, "
+        + f"identical output: {identical}"
+    )
+    print_measurements(measurements)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,429 @@
+"""Measures the wall time and peak memory of every transform in `agoradatatools.etl.transform` and
+of the helpers in `agoradatatools.etl.utils`, on synthetic inputs shaped like the production source
+files. Scale 1 approximates the size of the production inputs; by default every benchmark is also
+run at 10 times that size so that code that scales badly stands out.
+Usage: `python -m benchmarks.bench_transforms [scale ...]`"""
+
+import sys
+import warnings
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from agoradatatools.etl import transform, utils
+from benchmarks.harness import Measurement, measure, print_measurements
+
+# approximate number of rows in the production inputs at scale 1
+N_GENES = 60000
+N_DIFF_EXP = 300000
+N_PROTEOMICS = 40000
+N_PROTEOMICS_TMT = 8000
+N_PROTEOMICS_SRM = 300
+N_TARGETS = 1000
+N_MEDIAN_EXPRESSION = 150000
+N_PHAROS_CLASSES = 20000
+N_GENES_BIODOMAINS = 200000
+N_TEP_ADI = 300
+N_UNIPROT = 80000
+N_OVERALL_SCORES = 20000
+N_IMMUNOHISTO = 5000
+N_TEAMS = 40
+N_TEAM_MEMBERS = 400
+
+TISSUES = ["CBE", "DLPFC", "FP", "IFG", "PHG", "STG", "TCX"]
+BIODOMAINS = [
+    "Apoptosis",
+    "Autophagy",
+    "Endolysosome",
+    "Immune Response",
+    "Lipid Metabolism",
+    "Mitochondrial Metabolism",
+    "Oxidative Stress",
+    "Synapse",
+]
+
+
+def scaled(n: int, scale: float) -> int:
+    """Returns the number of rows of an input with `n` rows at scale 1, at least 1 so that every
+    benchmark can run at small scales"""
+    return max(int(n * scale), 1)
+
+
+def gene_ids(n: int) -> np.ndarray:
+    """Returns `n` distinct Ensembl IDs"""
+    return np.array([f"ENSG{i:011d}" for i in range(n)], dtype=object)
+
+
+def with_missing(
+    values: np.ndarray, rng: np.random.Generator, fraction: float = 0.05
+) -> np.ndarray:
+    """Returns a copy of `values` with a random `fraction` of the values replaced by NaN"""
+    values = values.astype(float if values.dtype.kind in "biuf" else object)
+    values[rng.random(len(values)) < fraction] = np.nan
+    return values
+
+
+def make_proteomics(n_rows: int, genes: np.ndarray, rng: np.random.Generator):
+    log2_fc = rng.normal(scale=0.2, size=n_rows)
+    return pd.DataFrame(
+        {
+            "uniqid": [f"PROT{i}|P{i:05d}" for i in range(n_rows)],
+            "hgnc_symbol": [f"PROT{i}" for i in range(n_rows)],
+            "uniprotid": [f"P{i:05d}" for i in range(n_rows)],
+            "ensembl_gene_id": rng.choice(genes, size=n_rows),
+            "tissue": rng.choice(TISSUES[:4], size=n_rows),
+            "log2_fc": with_missing(log2_fc, rng),
+            "ci_upr": log2_fc + 0.1,
+            "ci_lwr": log2_fc - 0.1,
+            "pval": rng.random(n_rows),
+            "cor_pval": rng.random(n_rows),
+        }
+    )
+
+
+def make_diff_exp_data(n_rows: int, genes: np.ndarray, rng: np.random.Generator):
+    logfc = rng.normal(size=n_rows)
+    return pd.DataFrame(
+        {
+            "model": rng.choice(
+                ["Diagnosis", "Diagnosis.AOD", "Diagnosis.Sex"], n_rows
+            ),
+            "tissue": rng.choice(TISSUES, size=n_rows),
+            "comparison": "AD-CONTROL",
+            "ensembl_gene_id": rng.choice(genes, size=n_rows),
+            "logfc": logfc,
+            "ci_l": logfc - 0.5,
+            "ci_r": logfc + 0.5,
+            "aveexpr": rng.normal(size=n_rows),
+            "t": rng.normal(size=n_rows),
+            "p_value": rng.random(n_rows),
+            "adj_p_val": rng.random(n_rows),
+            "gene_biotype": rng.choice(["protein_coding", "lncRNA"], size=n_rows),
+            "chromosome_name": rng.integers(1, 23, size=n_rows).astype(str),
+            "direction": rng.choice(["UP", "DOWN", "NONE"], size=n_rows),
+            "hgnc_symbol": with_missing(
+                np.array([f"GENE{i}" for i in range(n_rows)], dtype=object), rng
+            ),
+            "percentage_gc_content": rng.uniform(30, 70, size=n_rows),
+            "gene_length": rng.integers(100, 500000, size=n_rows),
+            "sex": rng.choice(["ALL", "FEMALE", "MALE"], size=n_rows),
+            "study": rng.choice(["MAYO", "MSSM", "ROSMAP"], size=n_rows),
+        }
+    )
+
+
+def make_genes_biodomains(n_rows: int, genes: np.ndarray, rng: np.random.Generator):
+    return pd.DataFrame(
+        {
+            "biodomain": with_missing(rng.choice(BIODOMAINS, size=n_rows), rng, 0.01),
+            "ensembl_gene_id": rng.choice(genes, size=n_rows),
+            "go_terms": with_missing(
+                np.array(
+                    [f"GO term {i}" for i in rng.integers(0, 5000, size=n_rows)],
+                    dtype=object,
+                ),
+                rng,
+                0.01,
+            ),
+        }
+    )
+
+
+def make_gene_info_datasets(scale: float, rng: np.random.Generator) -> dict:
+    """Builds the 13 source files of the gene_info dataset"""
+    n_genes = scaled(N_GENES, scale)
+    genes = gene_ids(n_genes)
+
+    def rows(n: int) -> int:
+        return scaled(n, scale)
+
+    def unique_genes(n: int) -> np.ndarray:
+        return rng.choice(genes, size=min(rows(n), n_genes), replace=False)
+
+    gene_metadata = pd.DataFrame(
+        {
+            "ensembl_gene_id": genes,
+            "name": [f"gene {i}" for i in range(n_genes)],
+            "symbol": [f"GENE{i}" for i in range(n_genes)],
+            "type_of_gene": "protein-coding",
+            "alias": [
+                np.array([f"ALIAS{i}"] * (i % 3), dtype=object) if i % 10 else None
+                for i in range(n_genes)
+            ],
+            "summary": [f"Summary {i}" for i in range(n_genes)],
+            "ensembl_release": "111",
+            "ensembl_possible_replacements": [
+                np.array([], dtype=object) if i % 10 else None for i in range(n_genes)
+            ],
+            "ensembl_permalink": [
+                f"https://ensembl.org/Homo_sapiens/Gene/Summary?g={gene}"
+                for gene in genes
+            ],
+        }
+    )
+    igap_genes = unique_genes(1000)
+    eqtl_genes = unique_genes(20000)
+    tep_genes = unique_genes(N_TEP_ADI)
+    n_targets = rows(N_TARGETS)
+    n_median_expression = rows(N_MEDIAN_EXPRESSION)
+    n_pharos = rows(N_PHAROS_CLASSES)
+    n_uniprot = rows(N_UNIPROT)
+
+    return {
+        "gene_metadata": gene_metadata,
+        "igap": pd.DataFrame(
+            {
+                "ensembl_gene_id": igap_genes,
+                "hgnc_symbol": [f"GENE{i}" for i in range(len(igap_genes))],
+            }
+        ),
+        "eqtl": pd.DataFrame(
+            {
+                "ensembl_gene_id": eqtl_genes,
+                "is_eqtl": rng.random(len(eqtl_genes)) < 0.5,
+            }
+        ),
+        "proteomics": make_proteomics(rows(N_PROTEOMICS), genes, rng),
+        "diff_exp_data": make_diff_exp_data(rows(N_DIFF_EXP), genes, rng),
+        "proteomics_tmt": make_proteomics(rows(N_PROTEOMICS_TMT), genes, rng),
+        "proteomics_srm": make_proteomics(rows(N_PROTEOMICS_SRM), genes, rng),
+        "target_list": pd.DataFrame(
+            {
+                "source": rng.choice(["Source_1", "Source_2"], size=n_targets),
+                "team": rng.choice([f"Team_{i}" for i in range(20)], size=n_targets),
+                "rank": rng.integers(1, 100, size=n_targets).astype(str),
+                "ensembl_gene_id": rng.choice(genes, size=n_targets),
+                "hgnc_symbol": [f"GENE{i}" for i in range(n_targets)],
+                "target_choice_justification": with_missing(
+                    np.array(["Justification"] * n_targets, dtype=object), rng
+                ),
+                "predicted_therapeutic_direction": "Inhibition",
+                "data_used_to_support_target_selection": "Support",
+                "data_synapseid": "syn12345",
+                "study": with_missing(
+                    np.array(["Study"] * n_targets, dtype=object), rng
+                ),
+                "input_data": "Genetics, RNA, Protein",
+                "validation_study_details": np.nan,
+                "initial_nomination": rng.integers(2018, 2024, size=n_targets),
+            }
+        ),
+        "median_expression": pd.DataFrame(
+            {
+                "ensembl_gene_id": rng.choice(genes, size=n_median_expression),
+                "min": rng.random(n_median_expression),
+                "first_quartile": rng.random(n_median_expression) + 1,
+                "median": rng.random(n_median_expression) + 2,
+                "mean": rng.random(n_median_expression) + 2,
+                "third_quartile": rng.random(n_median_expression) + 3,
+                "max": rng.random(n_median_expression) + 4,
+                "tissue": rng.choice(TISSUES, size=n_median_expression),
+            }
+        ),
+        "pharos_classes": pd.DataFrame(
+            {
+                "ensembl_gene_id": rng.choice(genes, size=n_pharos),
+                "uniprot_id": [f"P{i:05d}" for i in range(n_pharos)],
+                "hgnc_symbol": [f"GENE{i}" for i in range(n_pharos)],
+                "pharos_class": with_missing(
+                    rng.choice(["Tbio", "Tchem", "Tclin", "Tdark"], size=n_pharos), rng
+                ),
+            }
+        ),
+        "genes_biodomains": make_genes_biodomains(rows(N_GENES_BIODOMAINS), genes, rng),
+        "tep_adi_info": pd.DataFrame(
+            {
+                "ensembl_gene_id": tep_genes,
+                "hgnc_symbol": [f"GENE{i}" for i in range(len(tep_genes))],
+                "is_adi": rng.random(len(tep_genes)) < 0.5,
+                "is_tep": rng.random(len(tep_genes)) < 0.5,
+            }
+        ),
+        "ensg_to_uniprot_mapping": pd.DataFrame(
+            {
+                "uniprotkb_accessions": [f"Q{i:05d}" for i in range(n_uniprot)],
+                "ensembl_gene_id": rng.choice(genes, size=n_uniprot),
+            }
+        ),
+    }
+
+
+def make_overall_scores(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n_rows = scaled(N_OVERALL_SCORES, scale)
+    return pd.DataFrame(
+        {
+            "ensg": gene_ids(n_rows),
+            "hgnc_gene_id": [f"GENE{i}" for i in range(n_rows)],
+            "target_risk_score": rng.uniform(0, 5, size=n_rows),
+            "genetics_score": rng.uniform(0, 3, size=n_rows),
+            "multi_omics_score": rng.uniform(0, 2, size=n_rows),
+            "isscored_genetics": rng.choice(["Y", "N"], size=n_rows),
+            "isscored_omics": rng.choice(["Y", "N"], size=n_rows),
+        }
+    )
+
+
+def make_immunohisto(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    n_rows = scaled(N_IMMUNOHISTO, scale)
+    return pd.DataFrame(
+        {
+            "model": rng.choice([f"Model{i}" for i in range(10)], size=n_rows),
+            "type": rng.choice(["Insoluble Abeta40", "Plaque Size"], size=n_rows),
+            "measurement": rng.random(n_rows),
+            "units": rng.choice(["pg/mg", "um^2"], size=n_rows),
+            "age_death": rng.choice([4, 6, 8, 12], size=n_rows),
+            "tissue": rng.choice(["cerebral cortex", "hippocampus"], size=n_rows),
+            "sex": rng.choice(["male", "female"], size=n_rows),
+            "genotype": with_missing(
+                rng.choice([f"genotype{i}" for i in range(5)], size=n_rows), rng
+            ),
+        }
+    )
+
+
+def make_team_info(scale: float, rng: np.random.Generator) -> dict:
+    n_teams = scaled(N_TEAMS, scale)
+    n_members = scaled(N_TEAM_MEMBERS, scale)
+    teams = [f"Team {i}" for i in range(n_teams)]
+    return {
+        "team_info": pd.DataFrame(
+            {
+                "team": teams,
+                "team_full": [f"{team} University" for team in teams],
+                "program": rng.choice(["AMP-AD", "Resilience-AD"], size=n_teams),
+                "description": [f"Description of {team}'s research." for team in teams],
+            }
+        ),
+        "team_member_info": pd.DataFrame(
+            {
+                "team": rng.choice(teams, size=n_members),
+                "name": [f"Scientist {i}" for i in range(n_members)],
+                "isprimaryinvestigator": rng.random(n_members) < 0.1,
+                "url": with_missing(
+                    np.array(
+                        [f"http://www.fake-url.edu/{i}" for i in range(n_members)],
+                        dtype=object,
+                    ),
+                    rng,
+                    0.5,
+                ),
+            }
+        ),
+    }
+
+
+def make_raw_source(scale: float, rng: np.random.Generator) -> pd.DataFrame:
+    """Builds a source file as it is read from Synapse, before the column names and values are
+    standardized"""
+    df = make_diff_exp_data(
+        scaled(N_DIFF_EXP, scale), gene_ids(scaled(N_GENES, scale)), rng
+    )
+    df["hgnc_symbol"] = df["hgnc_symbol"].replace({np.nan: "NA"})
+    df["direction"] = df["direction"].replace({"NONE": "n/a"})
+    df["comparison"] = "AD - CONTROL"
+    return df.rename(columns={"adj_p_val": "adj.P.Val", "logfc": "logFC"})
+
+
+def copy_datasets(datasets: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Copies every data frame, since several transforms modify their input"""
+    return {name: df.copy() for name, df in datasets.items()}
+
+
+def make_benchmarks(scale: float, seed: int = 0) -> Dict[str, Callable]:
+    """Builds the inputs at the given scale and returns one function per benchmark. Every function
+    copies its inputs before calling the transform, so it can be run more than once.
+
+    Args:
+        scale (float): Size of the inputs relative to the production inputs
+        seed (int, optional): Seed of the random number generator. Defaults to 0.
+
+    Returns:
+        Dict[str, Callable]: Mapping of benchmark name to a function without arguments
+    """
+    rng = np.random.default_rng(seed)
+    gene_info_datasets = make_gene_info_datasets(scale, rng)
+    genes_biodomains = {
+        "genes_biodomains": gene_info_datasets["genes_biodomains"],
+    }
+    diff_exp_data = {"diff_exp_data": gene_info_datasets["diff_exp_data"]}
+    overall_scores = {"overall_scores": make_overall_scores(scale, rng)}
+    biomarkers = {"biomarkers": make_immunohisto(scale, rng)}
+    team_info = make_team_info(scale, rng)
+    raw_source = make_raw_source(scale, rng)
+    median_expression = gene_info_datasets["median_expression"]
+
+    return {
+        "transform_gene_info": lambda: transform.transform_gene_info(
+            datasets=copy_datasets(gene_info_datasets),
+            adjusted_p_value_threshold=0.05,
+            protein_level_threshold=0.05,
+        ),
+        "transform_genes_biodomains": lambda: transform.transform_genes_biodomains(
+            datasets=copy_datasets(genes_biodomains)
+        ),
+        "transform_distribution_data": lambda: transform.transform_distribution_data(
+            datasets=copy_datasets(overall_scores),
+            overall_max_score=5,
+            genetics_max_score=3,
+            omics_max_score=2,
+        ),
+        "transform_rnaseq_differential_expression": lambda: (
+            transform.transform_rnaseq_differential_expression(
+                datasets=copy_datasets(diff_exp_data)
+            )
+        ),
+        "immunohisto_transform": lambda: transform.immunohisto_transform(
+            datasets=copy_datasets(biomarkers), dataset_name="biomarkers"
+        ),
+        "transform_team_info": lambda: transform.transform_team_info(
+            datasets=copy_datasets(team_info)
+        ),
+        "utils.standardize_column_names": lambda: utils.standardize_column_names(
+            df=raw_source.copy()
+        ),
+        "utils.standardize_values": lambda: utils.standardize_values(
+            df=raw_source.copy()
+        ),
+        "utils.rename_columns": lambda: utils.rename_columns(
+            df=raw_source.copy(), column_map={"adj.P.Val": "adj_p_val"}
+        ),
+        "utils.nest_fields": lambda: utils.nest_fields(
+            df=median_expression,
+            grouping="ensembl_gene_id",
+            new_column="median_expression",
+            drop_columns=["ensembl_gene_id"],
+        ),
+        "utils.calculate_distribution": lambda: utils.calculate_distribution(
+            df=median_expression, grouping="tissue", distribution_column="median"
+        ),
+    }
+
+
+def run_benchmarks(scale: float, repeat: int = 1) -> List[Measurement]:
+    """Runs every benchmark at the given scale
+
+    Args:
+        scale (float): Size of the inputs relative to the production inputs
+        repeat (int, optional): Number of timed runs of each benchmark. Defaults to 1.
+
+    Returns:
+        List[Measurement]: one measurement per benchmark
+    """
+    measurements = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name, func in make_benchmarks(scale).items():
+            measurements.append(measure(name, func, repeat=repeat))
+    return measurements
+
+
+def main(*scales: float):
+    for scale in scales or (1, 10):
+        print(f"scale {scale:g}")
+        print_measurements(run_benchmarks(scale))
+        print()
+
+
+if __name__ == "__main__":
+    main(*[float(arg) for arg in sys.argv[1:]])
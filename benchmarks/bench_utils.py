@@ -0,0 +1,92 @@
+"""Compares `utils.nest_fields` with its original groupby/apply implementation on a data frame
+shaped like the ensembl_info input of gene_info (one group per gene).
+Usage: `python -m benchmarks.bench_utils [n_groups] [rows_per_group]`"""
+
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from agoradatatools.etl import utils
+from benchmarks.harness import measure, print_measurements
+
+
+def nest_fields_groupby(
+    df: pd.DataFrame,
+    grouping: str,
+    new_column: str,
+    drop_columns: list = [],
+    nested_field_is_list: bool = True,
+) -> pd.DataFrame:
+    """The original implementation of utils.nest_fields"""
+    nested = (
+        df.groupby(grouping)
+        .apply(
+            lambda row: row.replace({np.nan: None})
+            .drop(columns=drop_columns)
+            .to_dict("records")
+        )
+        .reset_index()
+        .rename(columns={0: new_column})
+    )
+
+    if nested_field_is_list:
+        return nested
+
+    lengths = nested[new_column].apply(len)
+    if all(lengths == 1):
+        nested[new_column] = nested[new_column].apply(lambda row: row[0])
+        return nested
+    else:
+        raise ValueError(
+            "nested_field_is_list cannot be False when there are multiple rows to nest per "
+            + grouping
+        )
+
+
+def make_frame(n_groups: int, rows_per_group: int, seed: int = 0) -> pd.DataFrame:
+    """Builds a data frame with `rows_per_group` rows for each of `n_groups` genes, in random order"""
+    rng = np.random.default_rng(seed)
+    n_rows = n_groups * rows_per_group
+    score = rng.random(n_rows)
+    score[rng.random(n_rows) < 0.1] = np.nan
+    df = pd.DataFrame(
+        {
+            "ensembl_gene_id": np.repeat(
+                [f"ENSG{i:011d}" for i in range(n_groups)], rows_per_group
+            ),
+            "ensembl_release": rng.integers(100, 110, size=n_rows),
+            "ensembl_possible_replacements": rng.choice(
+                ["ENSG00000000001", None], size=n_rows
+            ),
+            "ensembl_permalink": [f"https://ensembl.org/{i}" for i in range(n_rows)],
+            "score": score,
+        }
+    )
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def main(n_groups: int = 60000, rows_per_group: int = 1):
+    df = make_frame(n_groups, rows_per_group)
+    kwargs = dict(
+        df=df,
+        grouping="ensembl_gene_id",
+        new_column="ensembl_info",
+        drop_columns=["ensembl_gene_id"],
+        nested_field_is_list=rows_per_group > 1,
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        measurements = [
+            measure("nest_fields (groupby/apply)", nest_fields_groupby, **kwargs),
+            measure("nest_fields", utils.nest_fields, **kwargs),
+        ]
+
+    identical = measurements[0].result.equals(measurements[1].result)
+    print(f"{n_groups} groups of {rows_per_group} rows, identical output: {identical}")
+    print_measurements(measurements)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
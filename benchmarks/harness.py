@@ -0,0 +1,73 @@
+"""Helpers to measure the wall time and peak memory of a function."""
+
+import gc
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+
+@dataclass
+class Measurement:
+    """
+    Result of running a benchmarked function.
+
+    Attributes:
+        name: Name of the benchmark.
+        wall_seconds: Elapsed wall time of the fastest repeat.
+        peak_memory_mb: Peak memory allocated while the function ran, in MB.
+        result: Return value of the last repeat.
+    """
+
+    name: str
+    wall_seconds: float
+    peak_memory_mb: float
+    result: Any = None
+
+
+def measure(name: str, func: Callable, *args, repeat: int = 1, **kwargs) -> Measurement:
+    """Runs a function and measures its wall time and peak memory. The wall time is measured
+    without tracing memory allocations, since tracing slows the function down.
+
+    Args:
+        name (str): Name of the benchmark
+        func (Callable): Function to benchmark
+        repeat (int, optional): Number of timed runs; the fastest is reported. Defaults to 1.
+        *args, **kwargs: Arguments passed to `func`
+
+    Returns:
+        Measurement: wall time and peak memory of the function
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(
+        name=name,
+        wall_seconds=min(timings),
+        peak_memory_mb=peak / 1024**2,
+        result=result,
+    )
+
+
+def print_measurements(measurements: List[Measurement]) -> None:
+    """Prints a table of measurements
+
+    Args:
+        measurements (List[Measurement]): measurements to print
+    """
+    width = max([len(m.name) for m in measurements] + [9])
+    print(f"{'benchmark':<{width}}  {'wall (s)':>10}  {'peak (MB)':>10}")
+    for m in measurements:
+        print(f"{m.name:<{width}}  {m.wall_seconds:>10.3f}  {m.peak_memory_mb:>10.1f}")
@@ -1,9 +1,537 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
-import synapseclient
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+from pandas._libs.parsers import STR_NA_VALUES
+from pandas.api.types import infer_dtype
+
+from agoradatatools.etl import utils
+
+if TYPE_CHECKING:
+    import synapseclient
+
+logger = logging.getLogger(__name__)
+
+# supported values of the `engine` key of csv and tsv source files
+CSV_ENGINES = ["c", "arrow"]
+
+# bump when the parsing or standardization of source files changes to invalidate persistent caches
+ENTITY_CACHE_VERSION = 3
+
+
+def get_read_options(entity: dict) -> Optional[dict]:
+    """Gets the optional `columns`, `dtypes` and `engine` of a source file defined in the configuration file
+
+    Args:
+        entity (dict): A source file defined in the configuration file
+
+    Returns:
+        Optional[dict]: the `columns`, `dtypes` and `engine` keys that are set, or None if the whole file is
+            read with inferred dtypes by the default parser
+    """
+    read_options = {
+        key: entity[key] for key in ("columns", "dtypes", "engine") if entity.get(key)
+    }
+    return read_options or None
+
+
+def resolve_read_options(
+    file_columns: List[str], columns: List[str] = None, dtypes: dict = None
+) -> dict:
+    """Maps the columns and dtypes of a source file, given with standardized column names (see
+    utils.standardize_column_name), to the column names in the file.
+
+    Args:
+        file_columns (List[str]): column names in the source file
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None, inferred dtypes.
+
+    Raises:
+        ValueError: If a column is not in the source file.
+
+    Returns:
+        dict: `usecols` and `dtype` keyword arguments for pandas, only the ones that are set
+    """
+    file_names = {}
+    for file_column in file_columns:
+        file_names.setdefault(utils.standardize_column_name(file_column), file_column)
+
+    missing = [
+        column
+        for column in list(columns or []) + list(dtypes or {})
+        if column not in file_names
+    ]
+    if missing:
+        raise ValueError(
+            "Columns not found in the source file: " + ", ".join(dict.fromkeys(missing))
+        )
+
+    read_kwargs = {}
+    if columns:
+        # in the order of the file, which is the order pandas returns them in
+        usecols = {file_names[column] for column in columns}
+        read_kwargs["usecols"] = [
+            file_column for file_column in file_columns if file_column in usecols
+        ]
+    if dtypes:
+        read_kwargs["dtype"] = {
+            file_names[column]: dtype for column, dtype in dtypes.items()
+        }
+    return read_kwargs
+
+
+def select_columns(
+    df: pd.DataFrame, columns: List[str] = None, dtypes: dict = None
+) -> pd.DataFrame:
+    """Keeps the columns and sets the dtypes of a data frame that was read in full, for the sources
+    that can not select columns or dtypes while parsing.
+
+    Args:
+        df (pd.DataFrame): data frame read from a source file
+        columns (List[str], optional): standardized names of the columns to keep. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None.
+
+    Returns:
+        pd.DataFrame: data frame with the selected columns and dtypes
+    """
+    if not columns and not dtypes:
+        return df
+    read_kwargs = resolve_read_options(
+        file_columns=list(df.columns), columns=columns, dtypes=dtypes
+    )
+    if "usecols" in read_kwargs:
+        df = df[read_kwargs["usecols"]]
+    if "dtype" in read_kwargs:
+        df = df.astype(read_kwargs["dtype"])
+    return df
+
+
+class EntityCache:
+    """Run-scoped cache of extracted entities. Datasets in the configuration file often share the same
+    source files, so each entity is downloaded and parsed once per run and every dataset receives its own
+    copy of the DataFrame. When the datasets of the run are known, an entity is evicted from the cache as
+    soon as the last dataset using it has received it.
+
+    If a `cache_path` is provided, entities pinned to a version (e.g. `syn27211942.1`) are also stored
+    there as uncompressed Feather files, which later runs read instead of downloading and parsing the
+    source file again. A pinned version never changes, so these files never go stale.
+
+    Attributes:
+        uses (Counter): Number of remaining uses of each cached entity, keyed by (syn_id, source).
+        dataset_uses (Dict[str, Counter]): Remaining uses of each dataset, keyed by dataset name, so that the
+            uses of a dataset that fails or is not processed can be given up with `release_dataset`.
+        cache_path (str): Directory of the persistent cache, or None if entities are only cached in memory.
+    """
+
+    def __init__(self, datasets: List[dict] = None, cache_path: str = None):
+        """Initialize the class
+
+        Args:
+            datasets (List[dict], optional): Datasets defined in the configuration file, used to count
+                how many times each entity will be requested. Defaults to None, in which case entities
+                are kept for the whole run.
+            cache_path (str, optional): Directory of the persistent cache. Defaults to None.
+        """
+        self.uses = Counter()
+        self.dataset_uses: Dict[str, Counter] = {}
+        for dataset in datasets or []:
+            dataset_name, dataset_config = list(dataset.items())[0]
+            if not isinstance(dataset_config, dict):
+                continue
+            for entity in dataset_config.get("files", []):
+                key = self.get_key(
+                    syn_id=entity["id"],
+                    source=entity["format"],
+                    read_options=get_read_options(entity),
+                )
+                self.uses[key] += 1
+                self.dataset_uses.setdefault(dataset_name, Counter())[key] += 1
+        self.cache_path = cache_path
+        self._frames = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(syn_id: str, source: str, read_options: dict = None) -> tuple:
+        """Returns the cache key of an entity. The same file read with different columns or dtypes
+        is a different entity.
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+            source (str): the source of the data to be loaded to df
+            read_options (dict, optional): columns and dtypes the entity is read with, see get_read_options. Defaults to None.
+
+        Returns:
+            tuple: cache key of the entity
+        """
+        if not read_options:
+            return (syn_id, source)
+        return (syn_id, source, json.dumps(read_options, sort_keys=True))
+
+    def get_or_load(
+        self,
+        syn_id: str,
+        source: str,
+        loader: Callable[[], pd.DataFrame],
+        read_options: dict = None,
+        dataset_name: str = None,
+    ) -> pd.DataFrame:
+        """Returns a cached entity, calling `loader` to load it if it is not cached yet.
+        Concurrent requests for the same entity wait for a single load.
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+            source (str): the source of the data to be loaded to df
+            loader (Callable[[], pd.DataFrame]): Function that loads the entity
+            read_options (dict, optional): columns and dtypes the entity is read with, see get_read_options. Defaults to None.
+            dataset_name (str, optional): Name of the dataset that uses the entity. Defaults to None.
+
+        Returns:
+            pd.DataFrame: data frame that the caller can modify without affecting the cache
+        """
+        key = self.get_key(syn_id=syn_id, source=source, read_options=read_options)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key in self._frames:
+                df = self._frames[key]
+            else:
+                df = self._read_persistent(
+                    syn_id=syn_id, source=source, read_options=read_options
+                )
+                if df is None:
+                    df = loader()
+                    self._write_persistent(
+                        df=df, syn_id=syn_id, source=source, read_options=read_options
+                    )
+
+            with self._lock:
+                if self._give_up_use(key=key, dataset_name=dataset_name):
+                    # last use, hand over the cached frame itself
+                    return df
+                self._frames[key] = df
+
+        return df.copy()
+
+    def is_cached(self, syn_id: str, source: str, read_options: dict = None) -> bool:
+        """Checks whether an entity can be taken from the cache without downloading it
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+            source (str): the source of the data to be loaded to df
+            read_options (dict, optional): columns and dtypes the entity is read with, see get_read_options. Defaults to None.
+
+        Returns:
+            bool: whether the entity is in the in-memory or the persistent cache
+        """
+        key = self.get_key(syn_id=syn_id, source=source, read_options=read_options)
+        with self._lock:
+            if key in self._frames:
+                return True
+        path = self.get_persistent_path(
+            syn_id=syn_id, source=source, read_options=read_options
+        )
+        return path is not None and os.path.exists(path)
+
+    def release(
+        self,
+        syn_id: str,
+        source: str,
+        read_options: dict = None,
+        dataset_name: str = None,
+    ) -> None:
+        """Gives up one use of an entity without loading it, e.g. for a dataset that is not processed.
+        The entity is evicted from the cache if that was its last use.
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+            source (str): the source of the data to be loaded to df
+            read_options (dict, optional): columns and dtypes the entity is read with, see get_read_options. Defaults to None.
+            dataset_name (str, optional): Name of the dataset that gives up the use. Defaults to None.
+        """
+        key = self.get_key(syn_id=syn_id, source=source, read_options=read_options)
+        with self._lock:
+            self._give_up_use(key=key, dataset_name=dataset_name)
+
+    def release_dataset(self, dataset_name: str) -> None:
+        """Gives up every use of a dataset that it has not taken yet, e.g. because it failed or was not
+        processed. Entities are evicted from the cache if these were their last uses.
+
+        Args:
+            dataset_name (str): Name of the dataset
+        """
+        with self._lock:
+            for key, count in self.dataset_uses.pop(dataset_name, Counter()).items():
+                if key in self.uses:
+                    self.uses[key] -= count
+                    if self.uses[key] <= 0:
+                        del self.uses[key]
+                        self._frames.pop(key, None)
+
+    def _give_up_use(self, key: tuple, dataset_name: str = None) -> bool:
+        """Gives up one use of an entity, which must be done while holding the lock. A dataset that has
+        no use of the entity left does not give up the use of another dataset.
+
+        Returns:
+            bool: whether this was the last use of the entity, which is evicted from the cache
+        """
+        if dataset_name is not None and dataset_name in self.dataset_uses:
+            dataset_uses = self.dataset_uses[dataset_name]
+            if dataset_uses[key] <= 0:
+                return False
+            dataset_uses[key] -= 1
+            if dataset_uses[key] <= 0:
+                del dataset_uses[key]
+        if key not in self.uses:
+            return False
+        self.uses[key] -= 1
+        if self.uses[key] > 0:
+            return False
+        del self.uses[key]
+        self._frames.pop(key, None)
+        return True
+
+    def clear(self) -> None:
+        """Removes all entities from the in-memory cache. The persistent cache is left untouched."""
+        with self._lock:
+            self._frames.clear()
+            self._key_locks.clear()
+            self.uses.clear()
+            self.dataset_uses.clear()
+
+    def get_persistent_path(
+        self, syn_id: str, source: str, read_options: dict = None
+    ) -> Optional[str]:
+        """Returns the path of an entity in the persistent cache
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+            source (str): the source of the data to be loaded to df
+            read_options (dict, optional): columns and dtypes the entity is read with, see get_read_options. Defaults to None.
+
+        Returns:
+            Optional[str]: path of the cached Feather file, or None if there is no persistent cache
+                or the entity is not pinned to a version
+        """
+        if not self.cache_path or not re.fullmatch(r"syn\d+\.\d+", syn_id):
+            return None
+        file_name = f"{syn_id}.{source}.feather"
+        if read_options:
+            options_digest = hashlib.sha256(
+                json.dumps(read_options, sort_keys=True).encode("utf-8")
+            ).hexdigest()[:16]
+            file_name = f"{syn_id}.{source}.{options_digest}.feather"
+        return os.path.join(self.cache_path, f"v{ENTITY_CACHE_VERSION}", file_name)
+
+    def _read_persistent(
+        self, syn_id: str, source: str, read_options: dict = None
+    ) -> Optional[pd.DataFrame]:
+        """Reads an entity from the persistent cache, returns None if it is not cached"""
+        path = self.get_persistent_path(
+            syn_id=syn_id, source=source, read_options=read_options
+        )
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            return _arrow_to_frame(feather.read_table(path))
+        except (pa.ArrowException, OSError, ValueError) as e:
+            logger.warning("Unable to read %s from the entity cache: %s", syn_id, e)
+            return None
+
+    def _write_persistent(
+        self, df: pd.DataFrame, syn_id: str, source: str, read_options: dict = None
+    ) -> None:
+        """Writes an entity to the persistent cache. Entities that do not survive an exact
+        round trip through Arrow (e.g. columns of mixed types) are not cached."""
+        path = self.get_persistent_path(
+            syn_id=syn_id, source=source, read_options=read_options
+        )
+        if path is None:
+            return
+        try:
+            table = _frame_to_arrow(df)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            logger.info("%s can not be stored in the entity cache: %s", syn_id, e)
+            return
+        if not _frames_are_identical(df, _arrow_to_frame(table)):
+            logger.info("%s changes when stored in Arrow, not caching it", syn_id)
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(table, temp_path, compression="uncompressed")
+        os.replace(temp_path, path)
+
+
+class EntityPrefetcher:
+    """Downloads Synapse entities ahead of time in a bounded pool of threads, so that the source files
+    of a dataset download concurrently instead of one after the other. Each thread holds at most one
+    request, so the pool size also bounds the number of connections to Synapse.
+
+    Attributes:
+        syn (synapseclient.Synapse): Synapse client session used for the downloads.
+        max_workers (int): Number of entities downloaded at the same time.
+    """
+
+    def __init__(self, syn: "synapseclient.Synapse", max_workers: int = 4):
+        """Initialize the class
+
+        Args:
+            syn (synapseclient.Synapse): Synapse client session used for the downloads.
+            max_workers (int, optional): Number of entities downloaded at the same time. Defaults to 4.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.syn = syn
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="adt-download"
+        )
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def split_syn_id(syn_id: str) -> Tuple[str, Optional[str]]:
+        """Splits a Synapse ID into the ID and the version number, if provided
+
+        Args:
+            syn_id (str): Synapse ID of the entity, e.g. `syn27211942` or `syn27211942.1`
+
+        Returns:
+            Tuple[str, Optional[str]]: the Synapse ID without version and the version number or None
+        """
+        syn_id_version = syn_id.split(".")
+        return syn_id_version[0], syn_id_version[1] if len(syn_id_version) > 1 else None
+
+    def prefetch(self, syn_ids: List[str]) -> None:
+        """Starts downloading entities in the background. Entities that are already being
+        downloaded are not downloaded again.
+
+        Args:
+            syn_ids (List[str]): Synapse IDs of the entities, including the version number if provided
+        """
+        with self._lock:
+            for syn_id in syn_ids:
+                if syn_id not in self._futures:
+                    synapse_id, version = self.split_syn_id(syn_id)
+                    self._futures[syn_id] = self._executor.submit(
+                        self.syn.get, synapse_id, version=version
+                    )
+
+    def get(self, syn_id: str) -> "synapseclient.Entity":
+        """Gets an entity, waiting for its download if it was prefetched and downloading it otherwise.
+        Download errors are raised here, to the dataset that needs the entity.
+
+        Args:
+            syn_id (str): Synapse ID of the entity, including the version number if provided
+
+        Returns:
+            synapseclient.Entity: the downloaded entity
+        """
+        with self._lock:
+            future = self._futures.pop(syn_id, None)
+        if future is None:
+            synapse_id, version = self.split_syn_id(syn_id)
+            return self.syn.get(synapse_id, version=version)
+        return future.result()
+
+    def shutdown(self) -> None:
+        """Cancels the downloads that have not started and waits for the others"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._executor.shutdown(wait=True)
+
+
+def _frame_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Converts a DataFrame to an Arrow table, recording which object columns use NaN for missing
+    values so that `_arrow_to_frame` can restore them (Arrow turns all missing strings into None).
+    """
+    nan_columns = []
+    for column in df.columns[df.dtypes == object]:
+        is_missing = df[column].isna().to_numpy()
+        # only the missing values are compared with None
+        if (
+            is_missing.any()
+            and not np.equal(df[column].to_numpy()[is_missing], None).any()
+        ):
+            nan_columns.append(column)
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"agoradatatools"] = json.dumps({"nan_columns": nan_columns}).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _arrow_to_frame(table: pa.Table) -> pd.DataFrame:
+    """Converts an Arrow table written by `_frame_to_arrow` back to a DataFrame"""
+    df = table.to_pandas()
+    metadata = json.loads((table.schema.metadata or {}).get(b"agoradatatools", b"{}"))
+    for column in metadata.get("nan_columns", []):
+        df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+def _frames_are_identical(left: pd.DataFrame, right: pd.DataFrame) -> bool:
+    """Checks that two DataFrames have the same values, dtypes, index and kind of missing values.
+    `DataFrame.equals` treats None and NaN as the same value and 1 and True as equal values, so the
+    missing values and the inferred type of object columns are also compared."""
+    if not left.dtypes.equals(right.dtypes) or not left.equals(right):
+        return False
+    for column in range(left.shape[1]):
+        if left.dtypes.iloc[column] != object:
+            continue
+        left_values = left.iloc[:, column].to_numpy()
+        right_values = right.iloc[:, column].to_numpy()
+        if infer_dtype(left_values, skipna=False) != infer_dtype(
+            right_values, skipna=False
+        ) or not np.array_equal(
+            np.equal(left_values, None), np.equal(right_values, None)
+        ):
+            return False
+    return True
+
+
+def get_entity(
+    syn_id: str, syn: "synapseclient.Synapse", prefetcher: EntityPrefetcher = None
+) -> "synapseclient.Entity":
+    """Gets a synapse entity from its id string, with the version number if provided
+
+    Args:
+        syn_id (str): Synapse ID of the entity
+        syn (synapseclient.Synapse): synapseclient.Synapse session object.
+        prefetcher (EntityPrefetcher, optional): Downloads of entities started ahead of time. Defaults to None.
+
+    Returns:
+        synapseclient.Entity: the downloaded entity
+    """
+    if prefetcher is not None:
+        return prefetcher.get(syn_id)
+    synapse_id, version = EntityPrefetcher.split_syn_id(syn_id)
+    return syn.get(synapse_id, version=version)
 
 
 def get_entity_as_df(
-    syn_id: str, source: str, syn: synapseclient.Synapse
+    syn_id: str,
+    source: str,
+    syn: "synapseclient.Synapse",
+    prefetcher: EntityPrefetcher = None,
+    columns: List[str] = None,
+    dtypes: dict = None,
+    engine: str = "c",
 ) -> pd.DataFrame:
     """
     1. Creates and logs into synapseclient session (if not provided)
@@ -14,42 +542,271 @@ def get_entity_as_df(
         syn_id (str): Synapse ID of entity to be loaded to df
         source (str): the source of the data to be loaded to df
         syn (synapseclient.Synapse): synapseclient.Synapse session object.
+        prefetcher (EntityPrefetcher, optional): Downloads of entities started ahead of time. Defaults to None.
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name, e.g. `category`. Defaults to None.
+        engine (str, optional): parser of csv and tsv files, one of CSV_ENGINES. Defaults to "c".
 
     Returns:
         pd.DataFrame: data frame generated from data source provided
     """
 
-    syn_id_version = syn_id.split(".")
-    synapse_id = syn_id_version[0]
-    if len(syn_id_version) > 1:
-        version = syn_id_version[1]
-    else:
-        version = None
-
-    entity = syn.get(synapse_id, version=version)
+    entity = get_entity(syn_id=syn_id, syn=syn, prefetcher=prefetcher)
 
     if source == "table":
-        dataset = read_table_into_df(table_id=syn_id, syn=syn)
+        dataset = select_columns(
+            df=read_table_into_df(table_id=syn_id, syn=syn),
+            columns=columns,
+            dtypes=dtypes,
+        )
     elif source == "csv":
-        dataset = read_csv_into_df(csv_path=entity.path)
+        dataset = read_csv_into_df(
+            csv_path=entity.path, columns=columns, dtypes=dtypes, engine=engine
+        )
     elif source == "tsv":
-        dataset = read_tsv_into_df(tsv_path=entity.path)
+        dataset = read_tsv_into_df(
+            tsv_path=entity.path, columns=columns, dtypes=dtypes, engine=engine
+        )
     elif source == "feather":
-        dataset = read_feather_into_df(feather_path=entity.path)
+        dataset = read_feather_into_df(
+            feather_path=entity.path, columns=columns, dtypes=dtypes
+        )
     elif source == "json":
-        dataset = read_json_into_df(json_path=entity.path)
+        dataset = select_columns(
+            df=read_json_into_df(json_path=entity.path),
+            columns=columns,
+            dtypes=dtypes,
+        )
     else:
         raise ValueError("File type not supported.")
 
     return dataset
 
 
-def read_csv_into_df(csv_path: str) -> pd.DataFrame:
+def get_csv_engine(engine: str) -> str:
+    """Checks the parser of a csv or tsv source file
+
+    Args:
+        engine (str): `engine` of a source file in the configuration file
+
+    Raises:
+        ValueError: If the engine is not supported.
+
+    Returns:
+        str: the engine
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(
+            f"CSV engine {engine} not supported. Must be one of: "
+            + ", ".join(CSV_ENGINES)
+        )
+    return engine
+
+
+def read_delimited_with_arrow(
+    path: str,
+    sep: str,
+    read_kwargs: dict = None,
+    float_precision: Optional[str] = "round_trip",
+) -> Optional[pd.DataFrame]:
+    """Parses a csv or tsv file with the multithreaded Arrow CSV reader. The data frame has the same
+    column names, dtypes and values as the one from the pandas C parser: columns with a non-numeric dtype
+    in `read_kwargs` are read as text, like the C parser does, and numbers that Arrow reads differently,
+    like hexadecimal integers, integers that overflow int64 or floats that overflow to infinity, make it
+    give up so that the C parser is used.
+
+    Args:
+        path (str): path to the file
+        sep (str): field delimiter
+        read_kwargs (dict, optional): `usecols` and `dtype`, see resolve_read_options. Defaults to None.
+        float_precision (Optional[str], optional): `float_precision` of the C parser to match. Arrow parses
+            floats exactly, like "round_trip", so files with floats are left to the C parser otherwise.
+            Defaults to "round_trip".
+
+    Returns:
+        Optional[pd.DataFrame]: the data frame, or None if Arrow can not parse the file like the C parser,
+            e.g. because its rows do not all have the same number of fields or it has no rows
+    """
+    read_kwargs = read_kwargs or {}
+    # pandas names unnamed and duplicate columns, e.g. "Unnamed: 0" and "a.1"
+    column_names = list(pd.read_csv(path, sep=sep, nrows=0).columns)
+    # the C parser converts the text of the columns with a dtype
+    text_columns = [
+        name
+        for name, dtype in read_kwargs.get("dtype", {}).items()
+        if not pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype))
+    ]
+    exact_floats = float_precision == "round_trip"
+
+    def csv_options(**convert_options) -> dict:
+        return dict(
+            read_options=pa_csv.ReadOptions(
+                use_threads=True, column_names=column_names, skip_rows=1
+            ),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(
+                null_values=sorted(STR_NA_VALUES),
+                strings_can_be_null=True,
+                true_values=["True", "TRUE", "true"],
+                false_values=["False", "FALSE", "false"],
+                **convert_options,
+            ),
+        )
+
+    def read_table(**convert_options) -> pa.Table:
+        return pa_csv.read_csv(path, **csv_options(**convert_options))
+
+    table_options = dict(
+        include_columns=read_kwargs.get("usecols"),
+        column_types={name: pa.string() for name in text_columns},
+    )
+    try:
+        if not exact_floats:
+            # the types of the first block show most files with floats without reading the whole file
+            with pa_csv.open_csv(path, **csv_options(**table_options)) as reader:
+                if any(pa.types.is_floating(field.type) for field in reader.schema):
+                    return None
+        table = read_table(**table_options)
+        if table.num_rows == 0:
+            # the C parser reads the columns of a file without rows as object
+            return None
+        # the C parser does not parse dates, read them again as text
+        temporal_columns = [
+            field.name for field in table.schema if pa.types.is_temporal(field.type)
+        ]
+        if temporal_columns:
+            text_table = read_table(
+                include_columns=temporal_columns,
+                column_types={name: pa.string() for name in temporal_columns},
+            )
+            for name in temporal_columns:
+                table = table.set_column(
+                    table.column_names.index(name), name, text_table.column(name)
+                )
+        if not exact_floats and any(
+            pa.types.is_floating(field.type) for field in table.schema
+        ):
+            return None
+        # the text of the numbers that Arrow may read differently from the C parser
+        hex_digits = any(
+            pa.types.is_integer(field.type) for field in table.schema
+        ) and _has_hex_digits(path)
+        check_columns = [
+            field.name
+            for field in table.schema
+            if _numbers_need_checking(
+                values=table.column(field.name), hex_digits=hex_digits
+            )
+        ]
+        if check_columns:
+            check_table = read_table(
+                include_columns=check_columns,
+                column_types={name: pa.string() for name in check_columns},
+            )
+    except pa.ArrowInvalid as e:
+        logger.info("Arrow can not parse %s, using the C parser: %s", path, e)
+        return None
+
+    for name in check_columns:
+        if not _numbers_match_the_c_parser(
+            values=table.column(name), text=check_table.column(name)
+        ):
+            logger.info(
+                "Arrow reads the numbers of column %s of %s differently, using the C parser",
+                name,
+                path,
+            )
+            return None
+
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            # the C parser reads columns without any value as float
+            df[field.name] = np.nan
+        elif df[field.name].dtype == object and table.column(field.name).null_count:
+            # and missing text or booleans as NaN, where Arrow gives None
+            df[field.name] = df[field.name].where(df[field.name].notna(), np.nan)
+    # the columns with a str or object dtype are already text, and astype would turn their missing values
+    # into "nan"
+    dtypes = {
+        name: dtype
+        for name, dtype in read_kwargs.get("dtype", {}).items()
+        if not (
+            isinstance(pd.api.types.pandas_dtype(dtype), np.dtype)
+            and pd.api.types.pandas_dtype(dtype).kind in "OU"
+        )
+    }
+    if dtypes:
+        df = df.astype(dtypes)
+    return df
+
+
+def _has_hex_digits(path: str) -> bool:
+    """Checks whether a file has text like `0x1A`, which Arrow reads as an integer and the C parser as text"""
+    with open(path, "rb") as file:
+        content = file.read()
+    return b"0x" in content or b"0X" in content
+
+
+def _numbers_need_checking(values: pa.ChunkedArray, hex_digits: bool) -> bool:
+    """Checks whether the text of a column that Arrow reads as numbers must be checked, see
+    _numbers_match_the_c_parser
+
+    Args:
+        values (pa.ChunkedArray): a column read by Arrow
+        hex_digits (bool): whether the file has hexadecimal integers, see _has_hex_digits
+
+    Returns:
+        bool: True for integer columns of files with hexadecimal integers, float columns with infinity and
+            float columns that only have whole numbers, like integers that overflow int64
+    """
+    if pa.types.is_integer(values.type):
+        return hex_digits
+    if not pa.types.is_floating(values.type):
+        return False
+    return (
+        pc.any(pc.is_inf(values)).as_py()
+        or pc.all(pc.equal(values, pc.floor(values))).as_py()
+    )
+
+
+def _numbers_match_the_c_parser(values: pa.ChunkedArray, text: pa.ChunkedArray) -> bool:
+    """Checks that the C parser would read the text of a column that Arrow reads as numbers as the same
+    numbers of the same dtype
+
+    Args:
+        values (pa.ChunkedArray): the integer or float column read by Arrow
+        text (pa.ChunkedArray): the same column read as text
+
+    Returns:
+        bool: False if the C parser reads the column differently, e.g. as text or as integers
+    """
+    is_integer = pc.all(pc.match_substring_regex(text, r"^[+-]?\d+$")).as_py()
+    if pa.types.is_integer(values.type):
+        # Arrow also reads hexadecimal integers, which the C parser leaves as text
+        return is_integer
+    if is_integer:
+        # Arrow reads integers that overflow int64 and integers with a sign as floats, which the C parser
+        # reads as integers or text when no value is missing
+        return values.null_count > 0 and pc.max(pc.abs(values)).as_py() < 2.0**63
+    is_infinity = pc.match_substring_regex(
+        text, r"^[+-]?(inf|infinity)$", ignore_case=True
+    )
+    # floats that overflow to infinity are left as text by the C parser
+    return pc.sum(pc.is_inf(values)).as_py() == pc.sum(is_infinity).as_py()
+
+
+def read_csv_into_df(
+    csv_path: str, columns: List[str] = None, dtypes: dict = None, engine: str = "c"
+) -> pd.DataFrame:
     """
     Reads provided csv file into dataframe using file path
 
     Args:
         csv_path (str): path to input csv file
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None.
+        engine (str, optional): "c" for the pandas C parser or "arrow" for the multithreaded Arrow CSV reader. Defaults to "c".
 
     Raises:
         ValueError: If file source is not .csv, raise error indicating that the
@@ -65,15 +822,32 @@ def read_csv_into_df(csv_path: str) -> pd.DataFrame:
             + f"{str(csv_path)} matches the file extension."
         )
 
-    return pd.read_csv(csv_path, float_precision="round_trip")
+    read_kwargs = {}
+    if columns or dtypes:
+        read_kwargs = resolve_read_options(
+            file_columns=list(pd.read_csv(csv_path, nrows=0).columns),
+            columns=columns,
+            dtypes=dtypes,
+        )
+    if get_csv_engine(engine) == "arrow":
+        df = read_delimited_with_arrow(path=csv_path, sep=",", read_kwargs=read_kwargs)
+        if df is not None:
+            return df
+    return pd.read_csv(csv_path, float_precision="round_trip", **read_kwargs)
 
 
-def read_tsv_into_df(tsv_path: str) -> pd.DataFrame:
+def read_tsv_into_df(
+    tsv_path: str, columns: List[str] = None, dtypes: dict = None, engine: str = "c"
+) -> pd.DataFrame:
     """
     Reads provided tsv file into dataframe using file path
 
     Args:
         tsv_path (str): path to input tsv file
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None.
+        engine (str, optional): "c" for the pandas C parser or "arrow" for the multithreaded Arrow CSV reader.
+            Defaults to "c".
 
     Raises:
         ValueError: If file source is not .tsv, raise error indicating that the
@@ -89,10 +863,70 @@ def read_tsv_into_df(tsv_path: str) -> pd.DataFrame:
             + f"{str(tsv_path)} matches the file extension."
         )
 
-    return pd.read_csv(tsv_path, sep="\t")
+    read_kwargs = {}
+    if columns or dtypes:
+        read_kwargs = resolve_read_options(
+            file_columns=list(pd.read_csv(tsv_path, sep="\t", nrows=0).columns),
+            columns=columns,
+            dtypes=dtypes,
+        )
+    if get_csv_engine(engine) == "arrow":
+        df = read_delimited_with_arrow(
+            path=tsv_path, sep="\t", read_kwargs=read_kwargs, float_precision=None
+        )
+        if df is not None:
+            return df
+    return pd.read_csv(tsv_path, sep="\t", **read_kwargs)
+
+
+def read_delimited_in_chunks(
+    path: str,
+    source: str,
+    chunk_size: int,
+    columns: List[str] = None,
+    dtypes: dict = None,
+) -> Iterator[pd.DataFrame]:
+    """Reads a csv or tsv file `chunk_size` rows at a time, with the same options as read_csv_into_df and
+    read_tsv_into_df and the pandas C parser. The type of each column is inferred chunk by chunk, so a
+    column can have a different dtype in different chunks, e.g. int64 in a chunk without missing values
+    and float64 in a chunk with missing values.
+
+    Args:
+        path (str): path to input csv or tsv file
+        source (str): "csv" or "tsv"
+        chunk_size (int): number of rows of each chunk
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None.
 
+    Raises:
+        ValueError: If the source is not csv or tsv, or does not match the extension of the file
 
-def read_table_into_df(table_id: str, syn: synapseclient.Synapse) -> pd.DataFrame:
+    Yields:
+        Iterator[pd.DataFrame]: the chunks of the file, in order
+    """
+    if source not in ["csv", "tsv"]:
+        raise ValueError(f"Only csv and tsv files can be read in chunks, not {source}.")
+    if path.split(".")[-1] != source:
+        raise ValueError(
+            "Please make sure the source parameter in the configuration for "
+            + f"{str(path)} matches the file extension."
+        )
+
+    sep = "," if source == "csv" else "\t"
+    read_kwargs = {"float_precision": "round_trip"} if source == "csv" else {}
+    if columns or dtypes:
+        read_kwargs.update(
+            resolve_read_options(
+                file_columns=list(pd.read_csv(path, sep=sep, nrows=0).columns),
+                columns=columns,
+                dtypes=dtypes,
+            )
+        )
+    with pd.read_csv(path, sep=sep, chunksize=chunk_size, **read_kwargs) as reader:
+        yield from reader
+
+
+def read_table_into_df(table_id: str, syn: "synapseclient.Synapse") -> pd.DataFrame:
     """
     Reads a Synapse table into a dataframe.
 
@@ -110,12 +944,16 @@ def read_table_into_df(table_id: str, syn: synapseclient.Synapse) -> pd.DataFram
     return query_result.asDataFrame()
 
 
-def read_feather_into_df(feather_path: str) -> pd.DataFrame:
+def read_feather_into_df(
+    feather_path: str, columns: List[str] = None, dtypes: dict = None
+) -> pd.DataFrame:
     """
     Reads provided feather file into dataframe using file path
 
     Args:
         feather_path (str): path to input feather file
+        columns (List[str], optional): standardized names of the columns to read. Defaults to None, all columns.
+        dtypes (dict, optional): dtype of some columns, keyed by standardized name. Defaults to None.
 
     Raises:
         ValueError: If file source is not .feather, raise error indicating that the
@@ -131,7 +969,19 @@ def read_feather_into_df(feather_path: str) -> pd.DataFrame:
             + f"{str(feather_path)} matches the file extension."
         )
 
-    return pd.read_feather(feather_path)
+    if not columns and not dtypes:
+        return pd.read_feather(feather_path)
+
+    read_kwargs = resolve_read_options(
+        # memory-mapped, only the schema is read
+        file_columns=feather.read_table(feather_path, memory_map=True).column_names,
+        columns=columns,
+        dtypes=dtypes,
+    )
+    df = pd.read_feather(feather_path, columns=read_kwargs.get("usecols"))
+    if "dtype" in read_kwargs:
+        df = df.astype(read_kwargs["dtype"])
+    return df
 
 
 def read_json_into_df(json_path: str) -> pd.DataFrame:
@@ -1,9 +1,33 @@
+import gzip
+import io
 import json
+import logging
 import os
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 import numpy as np
 import pandas as pd
-from synapseclient import Activity, File, Synapse
+
+if typing.TYPE_CHECKING:
+    from synapseclient import Synapse
+
+logger = logging.getLogger(__name__)
+
+# number of rows converted to records at a time when writing JSON files
+JSON_CHUNK_SIZE = 10000
+
+# supported values of the `final_format` configuration key. The format is also the file extension.
+# indent: indentation of the JSON output, None for compact output.
+# lines: whether records are written one per line (NDJSON) instead of as a JSON array.
+FINAL_FORMATS = {
+    "json": {"indent": 2, "lines": False},
+    "min.json": {"indent": None, "lines": False},
+    "json.gz": {"indent": None, "lines": False},
+    "ndjson": {"indent": None, "lines": True},
+    "ndjson.gz": {"indent": None, "lines": True},
+}
 
 
 class NumpyEncoder(json.JSONEncoder):
@@ -19,6 +43,30 @@ class NumpyEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+def get_json_encoder(
+    indent: typing.Optional[int] = 2,
+) -> typing.Callable[[typing.Any], str]:
+    """Returns a function that encodes an object as a JSON string with NumpyEncoder.
+
+    Args:
+        indent (typing.Optional[int], optional): 2 to indent the output by 2 spaces, or None for
+            compact output without any whitespace. Defaults to 2.
+
+    Raises:
+        ValueError: If the indentation is not supported.
+
+    Returns:
+        typing.Callable[[typing.Any], str]: JSON encoding function
+    """
+    if indent not in (2, None):
+        raise ValueError("JSON output can only be indented by 2 spaces or compact.")
+
+    separators = None if indent else (",", ":")
+    return lambda obj: json.dumps(
+        obj, cls=NumpyEncoder, indent=indent, separators=separators
+    )
+
+
 def create_temp_location(staging_path: str):
     """Creates a temporary location to store the json files.
         Does nothing if directory already exists.
@@ -81,7 +129,7 @@ def remove_non_values(d: dict) -> dict:
     return cleaned_dict
 
 
-def load(file_path: str, provenance: list, destination: str, syn: Synapse) -> tuple:
+def load(file_path: str, provenance: list, destination: str, syn: "Synapse") -> tuple:
     """Reads file to be loaded into Synapse
     :param syn: synapse object
     :return: synapse id of the file loaded into Synapse.  Returns None if it
@@ -97,30 +145,235 @@ def load(file_path: str, provenance: list, destination: str, syn: Synapse) -> tu
         tuple: Returns a tuple of the name fo the file and the version number.
     """
 
+    from synapseclient import Activity, File
+
     activity = Activity(used=provenance)
     file = File(file_path, parent=destination)
     file = syn.store(file, activity=activity, forceVersion=False)
     return (file.id, file.versionNumber)
 
 
-def df_to_json(df: pd.DataFrame, staging_path: str, filename: str) -> str:
-    """Converts a data frame into a json file.
+class UploadQueue:
+    """Background queue of uploads to Synapse, so that a dataset is uploaded while the next datasets are
+    processed instead of the processing waiting for each upload.
+
+    Attributes:
+        max_workers (int): Number of uploads that run at the same time.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        """Initialize the class
+
+        Args:
+            max_workers (int, optional): Number of uploads that run at the same time. Defaults to 2.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="adt-upload"
+        )
+        self._futures: typing.Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, upload_func: typing.Callable[[], None]) -> Future:
+        """Queues an upload
+
+        Args:
+            name (str): Name of the upload, usually the name of the dataset. Names must be unique.
+            upload_func (typing.Callable[[], None]): Function that uploads the file and records its outputs
+
+        Returns:
+            Future: future of the upload
+        """
+        with self._lock:
+            if name in self._futures:
+                raise ValueError(f"An upload named {name} is already queued")
+            future = self._executor.submit(upload_func)
+            self._futures[name] = future
+        return future
+
+    def wait(self) -> typing.Dict[str, Exception]:
+        """Waits for every queued upload to complete and stops the queue
+
+        Returns:
+            typing.Dict[str, Exception]: the error of each upload that failed, keyed by its name
+        """
+        with self._lock:
+            futures = dict(self._futures)
+        wait(futures.values())
+        self._executor.shutdown(wait=True)
+        errors = {}
+        for name, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                logger.error("Upload of %s failed: %s", name, error)
+                errors[name] = error
+        return errors
+
+
+def get_final_format(final_format: str) -> dict:
+    """Returns the writer options of a supported `final_format`
+
+    Args:
+        final_format (str): final format of a dataset in the configuration file
+
+    Raises:
+        ValueError: If the format is not supported.
+
+    Returns:
+        dict: dictionary with the `indent` and `lines` options of the format
+    """
+    if final_format not in FINAL_FORMATS:
+        raise ValueError(
+            f"Final format {final_format} not supported. Must be one of: "
+            + ", ".join(FINAL_FORMATS)
+        )
+    return FINAL_FORMATS[final_format]
+
+
+def open_output_file(path: str) -> typing.TextIO:
+    """Opens a file for writing text. Files ending in `.gz` are gzip-compressed; the compressed file
+    does not include a timestamp, so the same content always produces the same file.
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        typing.TextIO: file opened for writing
+    """
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(
+            gzip.GzipFile(path, mode="wb", mtime=0), encoding="utf-8"
+        )
+    return open(path, "w+", encoding="utf-8")
+
+
+class JsonRecordsWriter:
+    """Writes data frames to an open file as a single JSON array of records, or as one record per line
+    if `lines` is True, one data frame at a time. Only the records of the data frame being written are
+    held in memory. With the default options, the output is identical to
+    `json.dump(records, file, cls=NumpyEncoder, indent=2)` for the records of all the data frames.
+
+    Attributes:
+        file (typing.TextIO): file opened for writing
+        chunk_size (int): number of rows converted at a time
+        indent (typing.Optional[int]): 2 or None for compact output
+        lines (bool): whether records are written as newline-delimited JSON
+        records_written (int): number of records written so far
+    """
+
+    def __init__(
+        self,
+        file: typing.TextIO,
+        chunk_size: int = JSON_CHUNK_SIZE,
+        indent: typing.Optional[int] = 2,
+        lines: bool = False,
+    ):
+        """Initialize the class
+
+        Args:
+            file (typing.TextIO): file opened for writing
+            chunk_size (int, optional): number of rows converted at a time. Defaults to JSON_CHUNK_SIZE.
+            indent (typing.Optional[int], optional): 2 or None for compact output. Defaults to 2.
+            lines (bool, optional): write newline-delimited JSON. Defaults to False.
+        """
+        self.file = file
+        self.chunk_size = chunk_size
+        self.indent = indent
+        self.lines = lines
+        self.records_written = 0
+        self._encode = get_json_encoder(indent=indent)
+
+    def write(self, df: pd.DataFrame) -> None:
+        """Writes the rows of a data frame, `chunk_size` rows at a time
+
+        Args:
+            df (pd.DataFrame): DataFrame to be written
+        """
+        for start in range(0, len(df), self.chunk_size):
+            chunk = df.iloc[start : start + self.chunk_size].replace({np.nan: None})
+            records = chunk.to_dict(orient="records")
+            if self.lines:
+                self.file.writelines(self._encode(record) + "\n" for record in records)
+            elif self.indent:
+                # strip the brackets and newlines enclosing the chunk's array
+                self.file.write("[\n" if not self.records_written else ",\n")
+                self.file.write(self._encode(records)[2:-2])
+            else:
+                self.file.write("[" if not self.records_written else ",")
+                self.file.write(self._encode(records)[1:-1])
+            self.records_written += len(records)
+
+    def close(self) -> None:
+        """Ends the JSON array. The file itself is left open."""
+        if self.lines:
+            return
+        if not self.records_written:
+            self.file.write("[]")
+        else:
+            self.file.write("\n]" if self.indent else "]")
+
+
+def write_json_records(
+    df: pd.DataFrame,
+    file: typing.TextIO,
+    chunk_size: int = JSON_CHUNK_SIZE,
+    indent: typing.Optional[int] = 2,
+    lines: bool = False,
+) -> None:
+    """Writes the rows of a data frame to an open file as a JSON array of records, or as one
+    record per line if `lines` is True. Rows are converted and written `chunk_size` rows at a time,
+    so the full list of records is never held in memory. With the default options, the
+    output is identical to `json.dump(records, file, cls=NumpyEncoder, indent=2)`.
+
+    Args:
+        df (pd.DataFrame): DataFrame to be written
+        file (typing.TextIO): file opened for writing
+        chunk_size (int, optional): number of rows converted at a time. Defaults to JSON_CHUNK_SIZE.
+        indent (typing.Optional[int], optional): 2 or None for compact output. Defaults to 2.
+        lines (bool, optional): write newline-delimited JSON. Defaults to False.
+    """
+    writer = JsonRecordsWriter(
+        file=file,
+        chunk_size=chunk_size,
+        indent=indent,
+        lines=lines,
+    )
+    writer.write(df)
+    writer.close()
+
+
+def df_to_json(
+    df: pd.DataFrame,
+    staging_path: str,
+    filename: str,
+    chunk_size: int = JSON_CHUNK_SIZE,
+    final_format: str = "json",
+) -> str:
+    """Converts a data frame into a json file. Records are streamed to the file in chunks.
 
     Args:
         df (pd.DataFrame): DataFrame to be converted to JSON
         staging_path (str): Path to staging directory
         filename (str): name of JSON file to be created
+        chunk_size (int, optional): number of rows converted at a time. Defaults to JSON_CHUNK_SIZE.
+        final_format (str, optional): one of FINAL_FORMATS. Defaults to "json".
 
     Returns:
        str: Returns a string containing the name of the new JSON file
     """
-
-    df = df.replace({np.nan: None})
-    df_as_dict = df.to_dict(orient="records")
-    temp_json = open(os.path.join(staging_path, filename), "w+")
-    json.dump(df_as_dict, temp_json, cls=NumpyEncoder, indent=2)
-    temp_json.close()
-    return temp_json.name
+    options = get_final_format(final_format)
+    json_path = os.path.join(staging_path, filename)
+    with open_output_file(json_path) as temp_json:
+        write_json_records(
+            df=df,
+            file=temp_json,
+            chunk_size=chunk_size,
+            indent=options["indent"],
+            lines=options["lines"],
+        )
+    return json_path
 
 
 def df_to_csv(df: pd.DataFrame, staging_path: str, filename: str) -> str:
@@ -141,22 +394,32 @@ def df_to_csv(df: pd.DataFrame, staging_path: str, filename: str) -> str:
     return temp_csv.name
 
 
-def dict_to_json(df: dict, staging_path: str, filename: str) -> str:
+def dict_to_json(
+    df: dict,
+    staging_path: str,
+    filename: str,
+    final_format: str = "json",
+) -> str:
     """Converts a data dictionary into a JSON file.
 
     Args:
         df (dict): Dictionary to be converted to a JSON file
         staging_path (str): Path to staging directory
         filename (str): name of JSON file to be created
+        final_format (str, optional): one of FINAL_FORMATS. Defaults to "json".
 
     Returns:
         str: Returns a string containing the name of the new JSON file
     """
-
+    options = get_final_format(final_format)
     df_as_dict = [  # TODO explore the df.to_dict() function for this case
         {d: remove_non_values(v) if isinstance(v, dict) else v for d, v in df.items()}
     ]
-    temp_json = open(os.path.join(staging_path, filename), "w+")
-    json.dump(df_as_dict, temp_json, cls=NumpyEncoder, indent=2)
-    temp_json.close()
-    return temp_json.name
+    encode = get_json_encoder(indent=options["indent"])
+    json_path = os.path.join(staging_path, filename)
+    with open_output_file(json_path) as temp_json:
+        if options["lines"]:
+            temp_json.writelines(encode(record) + "\n" for record in df_as_dict)
+        else:
+            temp_json.write(encode(df_as_dict))
+    return json_path
@@ -1,24 +1,18 @@
-"""Submodule for Agora Data Tools Transformations"""
+"""Submodule for Agora Data Tools Transformations
+
+The transform functions are imported from their modules the first time they are used, see registry.py.
+"""
+
+from agoradatatools.etl.transform import registry
+
+
+def __getattr__(name: str):
+    """Gets a transform function the first time it is accessed"""
+    func = registry.get_transform_function(name=name)
+    if func is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return func
 
-from agoradatatools.etl.transform.biodomain_info import transform_biodomain_info
-from agoradatatools.etl.transform.distribution_data import transform_distribution_data
-from agoradatatools.etl.transform.gene_info import transform_gene_info
-from agoradatatools.etl.transform.genes_biodomains import transform_genes_biodomains
-from agoradatatools.etl.transform.overall_scores import transform_overall_scores
-from agoradatatools.etl.transform.proteomics_distribution import (
-    transform_proteomics_distribution_data,
-)
-from agoradatatools.etl.transform.rna_distribution import (
-    transform_rna_distribution_data,
-)
-from agoradatatools.etl.transform.rnaseq_differential_expression import (
-    transform_rnaseq_differential_expression,
-)
-from agoradatatools.etl.transform.team_info import transform_team_info
-from agoradatatools.etl.transform.proteomics import transform_proteomics
-from agoradatatools.etl.transform.immunohisto_transform import (
-    immunohisto_transform,
-)
 
 __all__ = [
     "transform_distribution_data",
@@ -1,6 +1,9 @@
 import pandas as pd
 
+from agoradatatools.etl.transform.registry import register_transform
 
+
+@register_transform(datasets=["biodomain_info"], inputs=["genes_biodomains"])
 def transform_biodomain_info(datasets: dict) -> pd.DataFrame:
     """Takes dictionary of dataset DataFrames, extracts the genes_biodomains
     DataFrame, gets a unique list of biodomain names, and outputs the list as
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from agoradatatools.etl.transform.registry import register_transform
+
 
 def calculate_distribution(df: pd.DataFrame, col: str, is_scored, upper_bound) -> dict:
     if is_scored:
@@ -64,6 +66,11 @@ def calculate_distribution(df: pd.DataFrame, col: str, is_scored, upper_bound) -
     return obj
 
 
+@register_transform(
+    datasets=["distribution_data"],
+    inputs=["overall_scores"],
+    parameters=["overall_max_score", "genetics_max_score", "omics_max_score"],
+)
 def transform_distribution_data(
     datasets: dict,
     overall_max_score,
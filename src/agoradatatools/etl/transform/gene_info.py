@@ -1,10 +1,55 @@
 import numpy as np
 import pandas as pd
 
-from agoradatatools.etl.utils import nest_fields
+from agoradatatools.etl.utils import merge_one_to_one, nest_fields
 from agoradatatools.etl import transform
+from agoradatatools.etl.transform.registry import register_transform
 
 
+def fill_empty_arrays(column: pd.Series) -> pd.Series:
+    """Replaces the values of a column of arrays that are not arrays, e.g. NaN for the genes added by
+    an outer merge, with an empty object array. The replaced values share a single empty array.
+
+    Args:
+        column (pd.Series): column of numpy arrays and missing values
+
+    Returns:
+        pd.Series: the column, with an array in every row
+    """
+    is_array = np.fromiter(
+        (isinstance(value, np.ndarray) for value in column),
+        dtype=bool,
+        count=len(column),
+    )
+    if is_array.all():
+        return column
+    values = column.to_numpy(dtype=object, copy=True)
+    missing = np.empty((~is_array).sum(), dtype=object)
+    # fill stores the array itself in every element, where assignment would broadcast it
+    missing.fill(np.ndarray(0, dtype=object))
+    values[~is_array] = missing
+    return pd.Series(values, index=column.index, name=column.name)
+
+
+@register_transform(
+    datasets=["gene_info"],
+    inputs=[
+        "gene_metadata",
+        "igap",
+        "eqtl",
+        "proteomics",
+        "proteomics_tmt",
+        "proteomics_srm",
+        "diff_exp_data",
+        "target_list",
+        "median_expression",
+        "pharos_classes",
+        "genes_biodomains",
+        "tep_adi_info",
+        "ensg_to_uniprot_mapping",
+    ],
+    parameters=["adjusted_p_value_threshold", "protein_level_threshold"],
+)
 def transform_gene_info(
     datasets: dict, adjusted_p_value_threshold: float, protein_level_threshold: float
 ) -> pd.DataFrame:
@@ -113,14 +158,15 @@ def transform_gene_info(
     )
     RESOURCE_URL_SUFFIX = "%22%5D%7D%5D%7D"
 
-    tep_info["resource_url"] = tep_info.apply(
-        lambda row: (
-            RESOURCE_URL_PREFIX + row["hgnc_symbol"] + RESOURCE_URL_SUFFIX
-            if row["is_adi"] is True or row["is_tep"] is True
-            else np.NaN
-        ),
-        axis=1,
+    has_resource = (tep_info["is_adi"] | tep_info["is_tep"]).to_numpy()
+    resource_url = np.full(len(tep_info), np.NaN, dtype=object)
+    # object arrays concatenate element by element, so a missing hgnc_symbol raises a TypeError
+    resource_url[has_resource] = (
+        RESOURCE_URL_PREFIX
+        + tep_info["hgnc_symbol"].to_numpy(dtype=object)[has_resource]
+        + RESOURCE_URL_SUFFIX
     )
+    tep_info["resource_url"] = resource_url
 
     # Collapse uniprot IDs into a list for each ensembl_gene_id
     collapsed_uniprot = (
@@ -130,27 +176,22 @@ def transform_gene_info(
     )
 
     # Merge all the datasets
-    gene_info = gene_metadata
-
-    for dataset in [
-        igap,
-        eqtl,
-        rna_change,
-        proteomics_concat,
-        target_list,
-        median_expression,
-        druggability,
-        biodomains,
-        tep_info,
-        collapsed_uniprot,
-    ]:
-        gene_info = pd.merge(
-            left=gene_info,
-            right=dataset,
-            on="ensembl_gene_id",
-            how="outer",
-            validate="one_to_one",
-        )
+    gene_info = merge_one_to_one(
+        frames=[
+            gene_metadata,
+            igap,
+            eqtl,
+            rna_change,
+            proteomics_concat,
+            target_list,
+            median_expression,
+            druggability,
+            biodomains,
+            tep_info,
+            collapsed_uniprot,
+        ],
+        on="ensembl_gene_id",
+    )
 
     # Populate values for rows that didn't exist in the individual datasets
 
@@ -167,14 +208,9 @@ def transform_gene_info(
     )
 
     # fillna doesn't work for creating an empty array, need this function instead for alias and possible replacements
-    gene_info["alias"] = gene_info["alias"].apply(
-        lambda row: row if isinstance(row, np.ndarray) else np.ndarray(0, dtype=object)
-    )
-
-    gene_info["ensembl_possible_replacements"] = gene_info[
-        "ensembl_possible_replacements"
-    ].apply(
-        lambda row: row if isinstance(row, np.ndarray) else np.ndarray(0, dtype=object)
+    gene_info["alias"] = fill_empty_arrays(column=gene_info["alias"])
+    gene_info["ensembl_possible_replacements"] = fill_empty_arrays(
+        column=gene_info["ensembl_possible_replacements"]
     )
 
     # Add ensembl_info as a nested field. This is done after merging all other data sets so it applies to
@@ -214,13 +250,9 @@ def transform_gene_info(
     ) & gene_info["protein_brain_change_studied"]
 
     # create 'total_nominations' field
-    gene_info["total_nominations"] = gene_info.apply(
-        lambda row: (
-            len(row["target_nominations"])
-            if isinstance(row["target_nominations"], list)
-            else np.NaN
-        ),
-        axis=1,
+    # target_nominations is a list for nominated genes and NaN for the others
+    gene_info["total_nominations"] = gene_info["target_nominations"].map(
+        len, na_action="ignore"
     )
 
     # Remove some extra columns that got added during merges
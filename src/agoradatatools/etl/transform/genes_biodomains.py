@@ -3,6 +3,7 @@ from typing import Union
 import pandas as pd
 
 from agoradatatools.etl.utils import nest_fields
+from agoradatatools.etl.transform.registry import register_transform
 
 
 def count_grouped_total(
@@ -37,6 +38,7 @@ def count_grouped_total(
     return df
 
 
+@register_transform(datasets=["genes_biodomains"], inputs=["genes_biodomains"])
 def transform_genes_biodomains(datasets: dict) -> pd.DataFrame:
     """Takes dictionary of dataset DataFrames, extracts the genes_biodomains
     DataFrame, calculates some metrics on GO terms per gene / biodomain, and
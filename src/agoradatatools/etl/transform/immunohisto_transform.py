@@ -6,7 +6,10 @@ This is for the Model AD project.
 import pandas as pd
 from typing import Dict, List
 
+from agoradatatools.etl.transform.registry import register_transform
 
+
+@register_transform(datasets=["biomarkers", "pathology"])
 def immunohisto_transform(
     datasets: Dict[str, pd.DataFrame],
     dataset_name: str,
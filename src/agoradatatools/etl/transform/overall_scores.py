@@ -1,7 +1,10 @@
 import numpy as np
 import pandas as pd
 
+from agoradatatools.etl.transform.registry import register_transform
 
+
+@register_transform(datasets=["overall_scores"])
 def transform_overall_scores(df: pd.DataFrame) -> pd.DataFrame:
     interesting_columns = [
         "ensg",
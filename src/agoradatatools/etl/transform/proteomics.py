@@ -5,7 +5,10 @@ entries.
 
 import pandas as pd
 
+from agoradatatools.etl.transform.registry import register_transform
 
+
+@register_transform(datasets=["proteomics", "proteomics_tmt", "proteomics_srm"])
 def transform_proteomics(df: pd.DataFrame) -> pd.DataFrame:
     """Filters out rows that have "CON__" in their uniqid. This label indicates that the protein
     is a known contaminant and should be removed from the final data set. Rows with an NA uniqid
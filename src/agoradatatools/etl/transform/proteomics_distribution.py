@@ -1,8 +1,10 @@
 import pandas as pd
 
 from agoradatatools.etl import utils, transform
+from agoradatatools.etl.transform.registry import register_transform
 
 
+@register_transform(datasets=["proteomics_distribution_data"])
 def transform_proteomics_distribution_data(datasets: dict) -> pd.DataFrame:
     """Takes dictionary of dataset DataFrames and calculates the distribution
     of the "log2_fc" column by tissue for each dataset. Data sets must be named
@@ -0,0 +1,337 @@
+"""Registry of the custom transformations of the datasets defined in the configuration file. Each transform
+module declares the datasets its transformation applies to with the `register_transform` decorator. The
+decorators are read from the source of the modules without importing them, so only the module of a
+dataset is imported, the first time its transformation is requested.
+"""
+
+import ast
+import importlib
+import importlib.util
+import inspect
+import pkgutil
+import threading
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+_registry: Dict[str, "TransformSpec"] = {}
+_lock = threading.Lock()
+_import_lock = threading.Lock()
+# module of the transformation of each dataset and of each transform function, see _index_transform_modules
+_dataset_modules: Optional[Dict[str, str]] = None
+_function_modules: Optional[Dict[str, str]] = None
+
+
+@dataclass(frozen=True)
+class TransformSpec:
+    """
+    The custom transformation of one or more datasets.
+
+    Attributes:
+        func: The transform function. It is called with the keyword arguments its signature names among
+              `datasets` (the input files of the dataset, by name), `df` (the input file named after the
+              dataset), `dataset_name` and the names in `parameters`.
+        datasets: Names of the datasets in the configuration file that the transformation applies to.
+        inputs: Names of the input files that the transformation requires, in addition to the file named
+                after the dataset for functions that take `df` or `dataset_name`.
+        parameters: Keys of the `custom_transformations` mapping of the dataset that are passed to `func`.
+    """
+
+    func: Callable
+    datasets: Tuple[str, ...]
+    inputs: Tuple[str, ...] = ()
+    parameters: Tuple[str, ...] = ()
+
+    def get_required_inputs(self, dataset_name: str) -> Tuple[str, ...]:
+        """Returns the names of the input files that the transformation of a dataset requires
+
+        Args:
+            dataset_name (str): Name of the dataset
+
+        Returns:
+            Tuple[str, ...]: names of the required input files
+        """
+        signature = inspect.signature(self.func).parameters
+        if "df" in signature or "dataset_name" in signature:
+            return (dataset_name,) + self.inputs
+        return self.inputs
+
+    def get_config_errors(
+        self,
+        dataset_name: str,
+        input_names: Collection[str],
+        custom_transformations: Union[dict, int, None] = None,
+    ) -> List[str]:
+        """Checks that a dataset provides the input files and parameters that the transformation requires
+
+        Args:
+            dataset_name (str): Name of the dataset
+            input_names (Collection[str]): names of the input files of the dataset
+            custom_transformations (Union[dict, int, None], optional): the `custom_transformations` value of the
+                dataset in the configuration file. Defaults to None.
+
+        Returns:
+            List[str]: a message for the missing input files and one for the missing parameters, if any
+        """
+        errors = []
+        missing_inputs = [
+            name
+            for name in self.get_required_inputs(dataset_name=dataset_name)
+            if name not in input_names
+        ]
+        if missing_inputs:
+            errors.append(
+                f"The transformation of dataset {dataset_name} requires the following files: "
+                + ", ".join(missing_inputs)
+            )
+        if not isinstance(custom_transformations, dict):
+            custom_transformations = {}
+        missing_parameters = [
+            name for name in self.parameters if name not in custom_transformations
+        ]
+        if missing_parameters:
+            errors.append(
+                f"The transformation of dataset {dataset_name} requires the following custom_transformations: "
+                + ", ".join(missing_parameters)
+            )
+        return errors
+
+    def apply(
+        self,
+        datasets: Dict[str, pd.DataFrame],
+        dataset_name: str,
+        custom_transformations: Union[dict, int, None] = None,
+    ) -> Union[pd.DataFrame, dict]:
+        """Applies the transformation to the input files of a dataset
+
+        Args:
+            datasets (Dict[str, pd.DataFrame]): input files of the dataset, by name
+            dataset_name (str): Name of the dataset
+            custom_transformations (Union[dict, int, None], optional): the `custom_transformations` value of the
+                dataset in the configuration file. Defaults to None.
+
+        Raises:
+            ValueError: If an input file or a parameter required by the transformation is missing
+
+        Returns:
+            Union[pd.DataFrame, dict]: the transformed dataset
+        """
+        errors = self.get_config_errors(
+            dataset_name=dataset_name,
+            input_names=datasets,
+            custom_transformations=custom_transformations,
+        )
+        if errors:
+            raise ValueError(errors[0])
+        if not isinstance(custom_transformations, dict):
+            custom_transformations = {}
+
+        signature = inspect.signature(self.func).parameters
+        kwargs = {name: custom_transformations[name] for name in self.parameters}
+        if "datasets" in signature:
+            kwargs["datasets"] = datasets
+        if "df" in signature:
+            kwargs["df"] = datasets[dataset_name]
+        if "dataset_name" in signature:
+            kwargs["dataset_name"] = dataset_name
+        return self.func(**kwargs)
+
+
+def register_transform(
+    datasets: Collection[str],
+    inputs: Collection[str] = (),
+    parameters: Collection[str] = (),
+) -> Callable[[Callable], Callable]:
+    """Decorator that registers a function as the custom transformation of datasets, see TransformSpec.
+    The function must be defined at the top level of a module of this package, with the dataset names
+    written out as a list of strings, so that _index_transform_modules can find it without importing
+    the module.
+
+    Args:
+        datasets (Collection[str]): Names of the datasets that the transformation applies to
+        inputs (Collection[str], optional): Names of the input files that the transformation requires. Defaults to ().
+        parameters (Collection[str], optional): Keys of the `custom_transformations` mapping passed to the function. Defaults to ().
+
+    Raises:
+        ValueError: If one of the datasets already has a different transformation
+
+    Returns:
+        Callable[[Callable], Callable]: decorator that returns the function unchanged
+    """
+
+    def decorator(func: Callable) -> Callable:
+        spec = TransformSpec(
+            func=func,
+            datasets=tuple(datasets),
+            inputs=tuple(inputs),
+            parameters=tuple(parameters),
+        )
+        with _lock:
+            for dataset_name in spec.datasets:
+                registered = _registry.get(dataset_name)
+                if registered is not None and registered.func is not func:
+                    raise ValueError(
+                        f"Dataset {dataset_name} already has a transformation: {registered.func.__name__}"
+                    )
+            for dataset_name in spec.datasets:
+                _registry[dataset_name] = spec
+        return func
+
+    return decorator
+
+
+def _get_registered_names(source: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Reads the datasets and the names of the functions that `register_transform` decorators register
+    in the source of a module
+
+    Args:
+        source (str): source of the module
+
+    Returns:
+        Optional[Tuple[List[str], List[str]]]: names of the datasets and names of the functions, or None
+            if the dataset names of a decorator are not written out as a list of strings
+    """
+    dataset_names, function_names = [], []
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        for decorator in node.decorator_list:
+            if not (
+                isinstance(decorator, ast.Call)
+                and getattr(decorator.func, "id", getattr(decorator.func, "attr", None))
+                == register_transform.__name__
+            ):
+                continue
+            datasets = next(
+                (
+                    keyword.value
+                    for keyword in decorator.keywords
+                    if keyword.arg == "datasets"
+                ),
+                decorator.args[0] if decorator.args else None,
+            )
+            try:
+                dataset_names.extend(ast.literal_eval(datasets))
+            except (TypeError, ValueError):
+                return None
+            function_names.append(node.name)
+    return dataset_names, function_names
+
+
+def _index_transform_modules() -> None:
+    """Finds the module of the transformation of each dataset from the source of the modules of this package,
+    once. A module whose decorators can not be read that way is imported instead.
+    """
+    global _dataset_modules, _function_modules
+    with _import_lock:
+        if _dataset_modules is not None:
+            return
+        dataset_modules, function_modules = {}, {}
+        package = importlib.import_module(__package__)
+        for module in pkgutil.iter_modules(package.__path__):
+            module_name = f"{__package__}.{module.name}"
+            if module_name == __name__:
+                continue
+            with open(importlib.util.find_spec(module_name).origin) as module_file:
+                names = _get_registered_names(source=module_file.read())
+            if names is None:
+                importlib.import_module(module_name)
+                with _lock:
+                    specs = [
+                        spec
+                        for spec in _registry.values()
+                        if spec.func.__module__ == module_name
+                    ]
+                names = (
+                    [name for spec in specs for name in spec.datasets],
+                    [spec.func.__name__ for spec in specs],
+                )
+            dataset_modules.update(dict.fromkeys(names[0], module_name))
+            function_modules.update(dict.fromkeys(names[1], module_name))
+        _dataset_modules, _function_modules = dataset_modules, function_modules
+
+
+def _import_transform_module(module_name: str) -> None:
+    """Imports a transform module, which registers its transformations. The registered functions are then
+    also attributes of the package, in place of a module of the same name like `immunohisto_transform`.
+
+    Args:
+        module_name (str): Full name of the module
+    """
+    importlib.import_module(module_name)
+    package = importlib.import_module(__package__)
+    with _lock:
+        specs = list(_registry.values())
+    for spec in specs:
+        setattr(package, spec.func.__name__, spec.func)
+
+
+def get_transform(dataset_name: str) -> Optional[TransformSpec]:
+    """Gets the custom transformation of a dataset, importing its module if needed
+
+    Args:
+        dataset_name (str): Name of the dataset
+
+    Returns:
+        Optional[TransformSpec]: the transformation, or None if the dataset has no custom transformation
+    """
+    _index_transform_modules()
+    module_name = _dataset_modules.get(dataset_name)
+    if module_name is None:
+        return None
+    _import_transform_module(module_name=module_name)
+    with _lock:
+        return _registry.get(dataset_name)
+
+
+def get_transform_function(name: str) -> Optional[Callable]:
+    """Gets a registered transform function by its name, importing its module if needed
+
+    Args:
+        name (str): Name of the function, e.g. `transform_gene_info`
+
+    Returns:
+        Optional[Callable]: the function, or None if no transformation has that name
+    """
+    _index_transform_modules()
+    module_name = _function_modules.get(name)
+    if module_name is None:
+        return None
+    _import_transform_module(module_name=module_name)
+    with _lock:
+        return next(
+            (spec.func for spec in _registry.values() if spec.func.__name__ == name),
+            None,
+        )
+
+
+def get_transform_config_errors(datasets: List[dict]) -> List[str]:
+    """Checks the datasets of a configuration file against the transformations they use, before any of them
+    is processed. Only the modules of these transformations are imported.
+
+    Args:
+        datasets (List[dict]): Datasets defined in the configuration file
+
+    Returns:
+        List[str]: a message for each missing input file or parameter, empty if the configuration is valid
+    """
+    errors = []
+    for dataset in datasets:
+        dataset_name, dataset_config = list(dataset.items())[0]
+        if (
+            not isinstance(dataset_config, dict)
+            or "custom_transformations" not in dataset_config
+        ):
+            continue
+        spec = get_transform(dataset_name=dataset_name)
+        if spec is None:
+            continue
+        errors.extend(
+            spec.get_config_errors(
+                dataset_name=dataset_name,
+                input_names=[entity["name"] for entity in dataset_config["files"]],
+                custom_transformations=dataset_config["custom_transformations"],
+            )
+        )
+    return errors
@@ -1,6 +1,8 @@
 from agoradatatools.etl import transform, utils
+from agoradatatools.etl.transform.registry import register_transform
 
 
+@register_transform(datasets=["rna_distribution_data"], inputs=["diff_exp_data"])
 def transform_rna_distribution_data(datasets: dict):
     # "datasets" contains the unprocessed RNA-seq data, which needs to go
     # through the same processing as before in order to use it here.
@@ -1,3 +1,9 @@
+from agoradatatools.etl.transform.registry import register_transform
+
+
+@register_transform(
+    datasets=["rnaseq_differential_expression"], inputs=["diff_exp_data"]
+)
 def transform_rnaseq_differential_expression(datasets: dict):
     diff_exp_data = datasets["diff_exp_data"]
 
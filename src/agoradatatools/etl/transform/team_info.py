@@ -1,6 +1,9 @@
 import pandas as pd
 
+from agoradatatools.etl.transform.registry import register_transform
 
+
+@register_transform(datasets=["team_info"], inputs=["team_info", "team_member_info"])
 def transform_team_info(datasets: dict):
     team_info = datasets["team_info"]
     team_member_info = datasets["team_member_info"]
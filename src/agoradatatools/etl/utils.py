@@ -1,13 +1,19 @@
-from typing import Union
+import re
+from typing import TYPE_CHECKING, List, Union
 
 import numpy as np
 import pandas as pd
-import synapseclient
 import yaml
 
+if TYPE_CHECKING:
+    import synapseclient
+
+# text values containing this marker, in any case, are replaced with NaN by standardize_values
+MISSING_VALUE_MARKER = "n/a"
+
 
 # TODO remove "_" - these utils functions are not only used internally
-def _login_to_synapse(token: str = None) -> synapseclient.Synapse:
+def _login_to_synapse(token: str = None) -> "synapseclient.Synapse":
     """Logs into Synapse python client, returns authenticated Synapse session.
 
     Args:
@@ -16,6 +22,8 @@ def _login_to_synapse(token: str = None) -> synapseclient.Synapse:
     Returns:
         synapseclient.Synapse: authenticated Synapse client session
     """
+    import synapseclient
+
     syn = synapseclient.Synapse()
     if token is None:
         syn.login()
@@ -77,8 +85,45 @@ def standardize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def standardize_column_name(column: str) -> str:
+    """Standardizes a single column name the same way as standardize_column_names
+
+    Args:
+        column (str): column name, as in the source file
+
+    Returns:
+        str: standardized column name
+    """
+    column = re.sub("[#@&*^?()%$#!/]", "", column)
+    column = re.sub("[ -.]", "_", column)
+    return column.lower()
+
+
+def find_missing_value_markers(values: np.ndarray) -> np.ndarray:
+    """Finds the text values that contain "n/a", in any case, e.g. "N/A" or "not measured (n/a)".
+    Values that are not strings, such as numbers, lists and None, never match.
+
+    Args:
+        values (np.ndarray): values of a column
+
+    Returns:
+        np.ndarray: Boolean array, True for the values that are missing value markers
+    """
+    return np.fromiter(
+        (
+            isinstance(value, str) and MISSING_VALUE_MARKER in value.lower()
+            for value in values
+        ),
+        dtype=bool,
+        count=len(values),
+    )
+
+
 def standardize_values(df: pd.DataFrame) -> pd.DataFrame:
-    """Finds non-compliant values and corrects them
+    """Replaces the missing value markers of the text columns with NaN, see find_missing_value_markers.
+    Only object and string columns are scanned, cell by cell, and categorical columns category by
+    category; numeric and boolean columns can not contain text and are skipped. Object columns are
+    then converted to a better dtype where possible, e.g. [1, NaN] to float64.
     *if more data cleaning options need to be added to this,
     this needs to be refactored to another function
 
@@ -88,10 +133,23 @@ def standardize_values(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Resulting DataFrame with standardized values
     """
-    try:
-        df.replace(["n/a", "N/A", "n/A", "N/a"], np.nan, regex=True, inplace=True)
-    except TypeError:  # I could not get this to trigger without mocking replace
-        print("Error comparing types.")
+    for position, dtype in enumerate(df.dtypes):
+        column = df.iloc[:, position]
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = column.cat.categories
+            markers = categories[find_missing_value_markers(categories.to_numpy())]
+            if len(markers):
+                df.isetitem(position, column.cat.remove_categories(markers))
+        elif isinstance(dtype, pd.StringDtype):
+            markers = find_missing_value_markers(column.to_numpy(dtype=object))
+            if markers.any():
+                df.isetitem(position, column.mask(markers))
+        elif dtype == object:
+            markers = find_missing_value_markers(column.to_numpy())
+            if markers.any():
+                column = column.mask(markers, np.nan)
+            # like DataFrame.replace, which this replaces, e.g. [1, "N/A"] becomes [1.0, NaN]
+            df.isetitem(position, column.infer_objects())
 
     return df
 
@@ -115,6 +173,106 @@ def rename_columns(df: pd.DataFrame, column_map: dict) -> pd.DataFrame:
     return df
 
 
+def _get_new_duplicates(before: list, after: list) -> list:
+    """Finds the names that renaming a list of column names made duplicate
+
+    Args:
+        before (list): column names before renaming
+        after (list): column names after renaming, in the same order
+
+    Returns:
+        list: the names in `after` that repeat an earlier name, where the name in `before` did not
+    """
+    return [
+        name
+        for index, name in enumerate(after)
+        if name in after[:index] and before[index] not in before[:index]
+    ]
+
+
+def merge_one_to_one(frames: List[pd.DataFrame], on: str) -> pd.DataFrame:
+    """Outer joins data frames on a key column in a single pass. The result is the same as merging them
+    one after another with `pd.merge(left, right, on=on, how="outer", validate="one_to_one")`: the rows of
+    the first frame in order, followed by the new keys of each other frame in order, with missing keys
+    matching each other; the same columns in the same order, including the `_x` and `_y` suffixes of
+    columns that appear in more than one frame; and the same MergeError if a frame has duplicate keys.
+    Instead of copying the growing result at every merge, each frame is indexed by its keys once and
+    aligned to the union of the keys with a single reindex.
+
+    Args:
+        frames (List[pd.DataFrame]): data frames to join, each with an `on` column
+        on (str): name of the key column
+
+    Raises:
+        pd.errors.MergeError: If the keys of a frame are not unique, or if the suffixes make two
+            columns of the result share a name
+
+    Returns:
+        pd.DataFrame: the joined data frame, with a RangeIndex
+    """
+    keys = pd.Index([], dtype=object)
+    key_values = []
+    indexed_frames = []
+    # columns of the result in order, as [frame position, column, name so far], with None for the key
+    result_columns = []
+    for position, frame in enumerate(frames):
+        # like pd.merge, None and NaN keys match each other
+        frame_keys = pd.Index(frame[on].where(frame[on].notna(), np.nan))
+        if not frame_keys.is_unique:
+            side = "left" if position == 0 else "right"
+            raise pd.errors.MergeError(
+                f"Merge keys are not unique in {side} dataset; not a one-to-one merge"
+            )
+
+        overlap = set(frame.columns) & {name for _, _, name in result_columns}
+        overlap.discard(on)
+        left_names = [name for _, _, name in result_columns]
+        for result_column in result_columns:
+            if result_column[2] in overlap:
+                result_column[2] += "_x"
+        right_names = [
+            column + "_y" if column in overlap else column for column in frame.columns
+        ]
+        duplicates = _get_new_duplicates(
+            before=left_names, after=[name for _, _, name in result_columns]
+        ) + _get_new_duplicates(before=list(frame.columns), after=right_names)
+        if duplicates:
+            raise pd.errors.MergeError(
+                f"Passing 'suffixes' which cause duplicate columns {set(duplicates)} is not allowed."
+            )
+
+        if position > 0 and len(keys) > 0:
+            # pd.merge keeps the key where it is in the left frame, unless the left frame is empty
+            result_columns += [
+                [position, column, name]
+                for column, name in zip(frame.columns, right_names)
+                if column != on
+            ]
+        else:
+            result_columns = [
+                column for column in result_columns if column[0] is not None
+            ] + [
+                [None, on, on] if column == on else [position, column, name]
+                for column, name in zip(frame.columns, right_names)
+            ]
+
+        is_new = ~frame_keys.isin(keys)
+        keys = keys.append(frame_keys[is_new])
+        key_values.append(frame[on].to_numpy()[is_new])
+        indexed_frames.append(frame.drop(columns=on).set_axis(frame_keys, axis=0))
+
+    aligned_frames = [indexed_frame.reindex(keys) for indexed_frame in indexed_frames]
+    key_column = pd.Series(np.concatenate(key_values), index=keys)
+    return pd.concat(
+        [
+            key_column if position is None else aligned_frames[position][column]
+            for position, column, _ in result_columns
+        ],
+        axis=1,
+        keys=[name for _, _, name in result_columns],
+    ).reset_index(drop=True)
+
+
 def nest_fields(
     df: pd.DataFrame,
     grouping: str,
@@ -143,18 +301,33 @@ def nest_fields(
                         to data sets where there is only one row to collapse, e.g. one row of Ensembl info for one
                         Ensembl ID.
 
+    Raises:
+        ValueError: If there are no rows with a value for <grouping>, or if nested_field_is_list is False
+                    and there are multiple rows for a group.
+
     Returns:
         pd.DataFrame: New 2 column DataFrame with group and nested dictionaries
     """
-    nested = (
-        df.groupby(grouping)
-        .apply(
-            lambda row: row.replace({np.nan: None})
-            .drop(columns=drop_columns)
-            .to_dict("records")
+    # rows with a missing grouping value are left out, as groupby does
+    df = df[df[grouping].notna()].sort_values(grouping, kind="stable")
+    if df.empty:
+        raise ValueError(
+            f"Cannot nest fields, there are no rows with a value for {grouping}"
         )
-        .reset_index()
-        .rename(columns={0: new_column})
+    records = df.drop(columns=drop_columns).replace({np.nan: None}).to_dict("records")
+
+    # each group is a run of consecutive rows in the sorted data frame
+    keys = df[grouping].to_numpy()
+    is_start = np.ones(len(keys), dtype=bool)
+    is_start[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(keys))
+
+    nested = pd.DataFrame(
+        {
+            grouping: df[grouping].iloc[starts].reset_index(drop=True),
+            new_column: [records[start:end] for start, end in zip(starts, ends)],
+        }
     )
 
     if nested_field_is_list:
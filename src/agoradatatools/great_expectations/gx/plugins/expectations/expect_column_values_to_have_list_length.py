@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Optional
 
 import pandas as pd
 from great_expectations.core.expectation_configuration import ExpectationConfiguration
@@ -9,6 +9,8 @@ from great_expectations.expectations.metrics import (
     column_condition_partial,
 )
 
+from expectations.list_utils import flatten_lists, to_column_result
+
 
 # This class defines a Metric to support your Expectation.
 # For most ColumnMapExpectations, the main business logic for calculation will live in this class.
@@ -21,9 +23,11 @@ class ColumnValuesListLength(ColumnMapMetricProvider):
 
     # This method implements the core logic for the PandasExecutionEngine
     @column_condition_partial(engine=PandasExecutionEngine)
-    def _pandas(cls, column: pd.core.series.Series, list_length: int, **kwargs) -> bool:
+    def _pandas(
+        _cls, column: pd.core.series.Series, list_length: int, **kwargs
+    ) -> bool:
         """Core logic for list length checking metric on a
-        pandas execution engine.
+        pandas execution engine. A cell passes if it is a list with the expected length.
 
         Args:
             column (pd.core.series.Series): Pandas column to be evaluated.
@@ -31,24 +35,8 @@ class ColumnValuesListLength(ColumnMapMetricProvider):
         Returns:
             bool: Whether or not the column values have the expected list length.
         """
-        return column.apply(lambda x: cls._check_list_length(x, list_length))
-
-    @staticmethod
-    def _check_list_length(cell: Any, list_length: int) -> bool:
-        """Check if a cell is a list, and if it has the expected length.
-
-        Args:
-            cell (Any): Individual cell to be evaluated.
-            list_length (int): Expected list length.
-
-        Returns:
-            bool: Whether or not the cell is a list with the expected length.
-        """
-        if not isinstance(cell, list):
-            return False
-        if len(cell) != list_length:
-            return False
-        return True
+        flattened = flatten_lists(column)
+        return to_column_result(column, flattened, flattened.lengths == list_length)
 
 
 # This class defines the Expectation itself
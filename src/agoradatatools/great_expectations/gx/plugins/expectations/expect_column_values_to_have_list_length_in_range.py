@@ -1,5 +1,6 @@
-from typing import Any, Optional
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 from great_expectations.core.expectation_configuration import ExpectationConfiguration
 from great_expectations.execution_engine import PandasExecutionEngine
@@ -9,6 +10,8 @@ from great_expectations.expectations.metrics import (
     column_condition_partial,
 )
 
+from expectations.list_utils import flatten_lists, to_column_result
+
 
 # This class defines a Metric to support your Expectation.
 # For most ColumnMapExpectations, the main business logic for calculation will live in this class.
@@ -22,10 +25,10 @@ class ColumnValuesListLengthInRange(ColumnMapMetricProvider):
     # This method implements the core logic for the PandasExecutionEngine
     @column_condition_partial(engine=PandasExecutionEngine)
     def _pandas(
-        cls, column: pd.core.series.Series, list_length_range: list, **kwargs
+        _cls, column: pd.core.series.Series, list_length_range: list, **kwargs
     ) -> bool:
         """Core logic for list length checking metric on a
-        pandas execution engine.
+        pandas execution engine. A cell passes if it is a list with a length in the range.
 
         Args:
             column (pd.core.series.Series): Pandas column to be evaluated.
@@ -33,29 +36,17 @@ class ColumnValuesListLengthInRange(ColumnMapMetricProvider):
         Returns:
             bool: Whether or not the column values have the expected list length.
         """
-        return column.apply(
-            lambda x: cls._check_list_length_in_range(x, list_length_range)
-        )
-
-    @staticmethod
-    def _check_list_length_in_range(cell: Any, list_length_range: list) -> bool:
-        """Check if a cell is a list, and if it has the expected length.
-
-        Args:
-            cell (Any): Individual cell to be evaluated.
-            list_length_range (list): list of length 2 containing the minimum and maximum allowed lengths.
-        Returns:
-            bool: Whether or not the cell is a list with the expected length.
-        """
-        if not isinstance(cell, list):
-            return False
-        if len(list_length_range) != 2:
-            raise ValueError(
-                "list_length_range must be a list of length 2 containing the minimum and maximum allowed lengths."
+        flattened = flatten_lists(column)
+        list_ok = np.zeros(0, dtype=bool)
+        if flattened.is_list.any():
+            if len(list_length_range) != 2:
+                raise ValueError(
+                    "list_length_range must be a list of length 2 containing the minimum and maximum allowed lengths."
+                )
+            list_ok = (flattened.lengths >= min(list_length_range)) & (
+                flattened.lengths <= max(list_length_range)
             )
-        if len(cell) >= min(list_length_range) and len(cell) <= max(list_length_range):
-            return True
-        return False
+        return to_column_result(column, flattened, list_ok)
 
 
 # This class defines the Expectation itself
@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Optional
 
 import pandas as pd
 from great_expectations.core.expectation_configuration import ExpectationConfiguration
@@ -9,6 +9,13 @@ from great_expectations.expectations.metrics import (
     column_condition_partial,
 )
 
+from expectations.list_utils import (
+    all_members,
+    flatten_lists,
+    members_are_in,
+    to_column_result,
+)
+
 
 # This class defines a Metric to support your Expectation.
 # For most ColumnMapExpectations, the main business logic for calculation will live in this class.
@@ -22,10 +29,10 @@ class ColumnValuesListMembers(ColumnMapMetricProvider):
     # This method implements the core logic for the PandasExecutionEngine
     @column_condition_partial(engine=PandasExecutionEngine)
     def _pandas(
-        cls, column: pd.core.series.Series, list_members: set, **kwargs
+        _cls, column: pd.core.series.Series, list_members: set, **kwargs
     ) -> bool:
         """Core logic for list member checking metric on a
-        pandas execution engine.
+        pandas execution engine. A cell passes if it is a list and all of its items are expected members.
 
         Args:
             column (pd.core.series.Series): Pandas column to be evaluated.
@@ -33,24 +40,9 @@ class ColumnValuesListMembers(ColumnMapMetricProvider):
         Returns:
             bool: Whether or not the column values have the expected list members.
         """
-        return column.apply(lambda x: cls._check_list_members(x, list_members))
-
-    @staticmethod
-    def _check_list_members(cell: Any, list_members: set) -> bool:
-        """Check if a cell is a list, and if it has the expected members.
-
-        Args:
-            cell (Any): Individual cell to be evaluated.
-            list_members (set): Expected list members.
-
-        Returns:
-            bool: Whether or not the cell is a list with the expected members.
-        """
-        if not isinstance(cell, list):
-            return False
-        if not all(item in list_members for item in cell):
-            return False
-        return True
+        flattened = flatten_lists(column)
+        member_ok = members_are_in(flattened.members, list_members)
+        return to_column_result(column, flattened, all_members(flattened, member_ok))
 
 
 # This class defines the Expectation itself
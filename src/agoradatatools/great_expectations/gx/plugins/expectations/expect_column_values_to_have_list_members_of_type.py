@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Optional
 
 import pandas as pd
 from great_expectations.core.expectation_configuration import ExpectationConfiguration
@@ -9,6 +9,13 @@ from great_expectations.expectations.metrics import (
     column_condition_partial,
 )
 
+from expectations.list_utils import (
+    all_members,
+    flatten_lists,
+    members_are_instances,
+    to_column_result,
+)
+
 
 # This class defines a Metric to support your Expectation.
 # For most ColumnMapExpectations, the main business logic for calculation will live in this class.
@@ -21,9 +28,11 @@ class ColumnValuesListMembersOfType(ColumnMapMetricProvider):
 
     # This method implements the core logic for the PandasExecutionEngine
     @column_condition_partial(engine=PandasExecutionEngine)
-    def _pandas(cls, column: pd.core.series.Series, member_type: str, **kwargs) -> bool:
+    def _pandas(
+        _cls, column: pd.core.series.Series, member_type: str, **kwargs
+    ) -> bool:
         """Core logic for list member checking metric on a
-        pandas execution engine.
+        pandas execution engine. A cell passes if it is a list and all of its items are of the expected type.
 
         Args:
             column (pd.core.series.Series): Pandas column to be evaluated.
@@ -31,19 +40,6 @@ class ColumnValuesListMembersOfType(ColumnMapMetricProvider):
         Returns:
             bool: Whether or not the column values have the expected list members.
         """
-        return column.apply(lambda x: cls._check_list_member_type(x, member_type))
-
-    @staticmethod
-    def _check_list_member_type(cell: Any, member_type: str) -> bool:
-        """Check if a cell is a list, and if it has members of the expected type.
-
-        Args:
-            cell (Any): Individual cell to be evaluated.
-            member_type (str): Expected list member type represented as a string.
-
-        Returns:
-            bool: Whether or not the cell is a list with the expected members.
-        """
         type_map = {
             "int": int,
             "float": float,
@@ -57,11 +53,9 @@ class ColumnValuesListMembersOfType(ColumnMapMetricProvider):
         if not python_type:
             raise ValueError(f"member_type must be one of: {list(type_map.keys())}")
 
-        if not isinstance(cell, list):
-            return False
-        if not all(isinstance(item, python_type) for item in cell):
-            return False
-        return True
+        flattened = flatten_lists(column)
+        member_ok = members_are_instances(flattened.members, python_type)
+        return to_column_result(column, flattened, all_members(flattened, member_ok))
 
 
 # This class defines the Expectation itself
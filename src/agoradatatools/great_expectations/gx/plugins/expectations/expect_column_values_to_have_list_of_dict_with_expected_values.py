@@ -1,5 +1,6 @@
-from typing import Any, Optional
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 from great_expectations.core.expectation_configuration import ExpectationConfiguration
 from great_expectations.execution_engine import PandasExecutionEngine
@@ -9,6 +10,14 @@ from great_expectations.expectations.metrics import (
     column_condition_partial,
 )
 
+from expectations.list_utils import (
+    all_members,
+    flatten_lists,
+    members_are_in,
+    members_are_instances,
+    to_column_result,
+)
+
 
 # This class defines a Metric to support your Expectation.
 # For most ColumnMapExpectations, the main business logic for calculation will live in this class.
@@ -22,51 +31,56 @@ class ColumnValuesListOfDictWithExpectedValues(ColumnMapMetricProvider):
     # This method implements the core logic for the PandasExecutionEngine
     @column_condition_partial(engine=PandasExecutionEngine)
     def _pandas(
-        cls, column: pd.core.series.Series, list_dict_values: dict, **kwargs
+        _cls, column: pd.core.series.Series, list_dict_values: dict, **kwargs
     ) -> bool:
         """Core logic for list length checking metric on a
-        pandas execution engine.
+        pandas execution engine. A cell passes if it is a list of dicts whose value for the key
+        is one of the allowed values. Like checking the members of each list one by one, a dict
+        without the key raises a KeyError, unless an earlier member of its list already fails.
 
         Args:
             column (pd.core.series.Series): Pandas column to be evaluated.
             list_dict_values (dict): Dictionary containing the key to check
             and a list of the values it is allowed to have.
+        Raises:
+            KeyError: If a dict without the key is reached.
         Returns:
             bool: Whether or not the column values have the expected list length.
         """
-        return column.apply(
-            lambda x: cls._check_list_of_dict_has_expected_values(x, list_dict_values)
-        )
-
-    @staticmethod
-    def _check_list_of_dict_has_expected_values(
-        cell: Any, list_dict_values: dict
-    ) -> bool:
-        """Check if a cell is a list, and if it has the expected length.
-
-        Args:
-            cell (Any): Individual cell to be evaluated.
-            list_dict_values (dict): Dictionary containing the key to check
-            and a list of the values it is allowed to have.
-        Returns:
-            bool: Whether or not the cell is a list with the expected length.
-        """
-        if not isinstance(cell, list):
-            return False
+        flattened = flatten_lists(column)
         if (
-            not isinstance(list_dict_values, dict)
+            flattened.is_list.any()
+            and not isinstance(list_dict_values, dict)
             and "key" not in list_dict_values
             and "values" not in list_dict_values
         ):
             raise ValueError(
                 "list_dict_values must be a dict which contains 'key' (string) and 'values' (list)."
             )
-        for item in cell:
-            if not isinstance(item, dict):
-                return False
-            if item[list_dict_values["key"]] not in list_dict_values["values"]:
-                return False
-        return True
+        is_dict = members_are_instances(flattened.members, dict)
+        if not is_dict.any():
+            return to_column_result(column, flattened, all_members(flattened, is_dict))
+
+        key = list_dict_values["key"]
+        missing = object()
+        values = pd.Series(
+            [member.get(key, missing) for member in flattened.members[is_dict]],
+            dtype=object,
+        )
+        member_ok = is_dict.copy()
+        member_ok[is_dict] = members_are_in(values, list_dict_values["values"])
+
+        has_key = is_dict.copy()
+        has_key[is_dict] = np.fromiter(
+            (value is not missing for value in values), dtype=bool, count=len(values)
+        )
+        failed = np.flatnonzero(~member_ok)
+        # the first failing member of each list that has one
+        _, first = np.unique(flattened.positions[failed], return_index=True)
+        first_failed = failed[first]
+        if (is_dict[first_failed] & ~has_key[first_failed]).any():
+            raise KeyError(key)
+        return to_column_result(column, flattened, all_members(flattened, member_ok))
 
 
 # This class defines the Expectation itself
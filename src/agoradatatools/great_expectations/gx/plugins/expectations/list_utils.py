@@ -0,0 +1,123 @@
+"""Helpers shared by the list-valued custom expectations to evaluate a whole column at once
+instead of calling a Python function on every cell."""
+
+from itertools import chain
+from typing import Any, Collection, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class FlattenedLists(NamedTuple):
+    """The list cells of a column, flattened into a single array of members.
+
+    Attributes:
+        is_list: Boolean array, True for the cells of the column that are lists.
+        lengths: Length of each list cell.
+        positions: For each member, the position of its list cell among the list cells.
+        members: Members of all the list cells, in order.
+    """
+
+    is_list: np.ndarray
+    lengths: np.ndarray
+    positions: np.ndarray
+    members: pd.Series
+
+
+def flatten_lists(column: pd.Series) -> FlattenedLists:
+    """Flattens the list cells of a column in a single pass.
+
+    Args:
+        column (pd.Series): Pandas column to be evaluated.
+
+    Returns:
+        FlattenedLists: the list cells of the column and their members
+    """
+    cells = column.to_numpy(dtype=object)
+    is_list = np.fromiter(
+        (isinstance(cell, list) for cell in cells), dtype=bool, count=len(cells)
+    )
+    lists = cells[is_list]
+    lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+    positions = np.repeat(np.arange(len(lists)), lengths)
+    members = pd.Series(list(chain.from_iterable(lists)), dtype=object)
+    return FlattenedLists(is_list, lengths, positions, members)
+
+
+def all_members(flattened: FlattenedLists, member_ok: np.ndarray) -> np.ndarray:
+    """Checks, for every list cell, that all of its members pass a check.
+
+    Args:
+        flattened (FlattenedLists): the list cells of a column
+        member_ok (np.ndarray): Boolean array, the result of the check for each member
+
+    Returns:
+        np.ndarray: Boolean array, True for the list cells whose members all pass the check
+    """
+    failures = np.bincount(
+        flattened.positions[~member_ok], minlength=len(flattened.lengths)
+    )
+    return failures == 0
+
+
+def members_are_instances(members: pd.Series, python_type: type) -> np.ndarray:
+    """Checks whether each member is an instance of a type, testing each distinct member type once.
+
+    Args:
+        members (pd.Series): list members
+        python_type (type): expected type
+
+    Returns:
+        np.ndarray: Boolean array, True for the members that are instances of python_type
+    """
+    member_types = list(map(type, members))
+    type_ok = {
+        member_type: issubclass(member_type, python_type)
+        for member_type in set(member_types)
+    }
+    return np.fromiter(
+        map(type_ok.__getitem__, member_types), dtype=bool, count=len(member_types)
+    )
+
+
+def members_are_in(members: pd.Series, values: Collection[Any]) -> np.ndarray:
+    """Checks whether each member is one of the expected values with a hash-based lookup, with the
+    same result as `member in values`.
+
+    Args:
+        members (pd.Series): list members
+        values (Collection[Any]): expected values
+
+    Returns:
+        np.ndarray: Boolean array, True for the members that are in values
+    """
+    try:
+        member_in = members.isin(list(values)).to_numpy(dtype=bool)
+    except TypeError:
+        # unhashable members or values, like nested lists
+        return np.array([member in values for member in members], dtype=bool)
+    # isin matches any missing value with any other one, e.g. None with NaN or two different NaN
+    # objects, while `in` only matches the same object or an equal value
+    is_missing = members.isna().to_numpy(dtype=bool)
+    if is_missing.any():
+        member_in[is_missing] = [member in values for member in members[is_missing]]
+    return member_in
+
+
+def to_column_result(
+    column: pd.Series, flattened: FlattenedLists, list_ok: np.ndarray
+) -> pd.Series:
+    """Builds the result of a column condition from the result of each list cell. Cells that are not
+    lists fail the condition.
+
+    Args:
+        column (pd.Series): Pandas column that was evaluated.
+        flattened (FlattenedLists): the list cells of the column
+        list_ok (np.ndarray): Boolean array, the result for each list cell
+
+    Returns:
+        pd.Series: Boolean column, with the index of the evaluated column
+    """
+    result = np.zeros(len(column), dtype=bool)
+    result[flattened.is_list] = list_ok
+    return pd.Series(result, index=column.index)
@@ -1,20 +1,121 @@
+import copy
 import json
 import logging
 import os
 import shutil
+import threading
 import typing
 from typing import Optional
 
-import great_expectations as gx
+import numpy as np
 import pandas as pd
-from great_expectations.checkpoint.types.checkpoint_result import CheckpointResult
-from synapseclient import Activity, File, Synapse
 
+from agoradatatools.etl.load import NumpyEncoder
 from agoradatatools.reporter import DatasetReport
 
+# great_expectations and synapseclient take seconds to import, so they are imported when a dataset is
+# validated rather than when the CLI starts
+if typing.TYPE_CHECKING:
+    from great_expectations.checkpoint.types.checkpoint_result import CheckpointResult
+    from great_expectations.core import ExpectationSuite
+    from great_expectations.data_context import FileDataContext
+    from synapseclient import Synapse
+
 logger = logging.getLogger(__name__)
 logging.getLogger("great_expectations").setLevel(logging.WARNING)
 
+VALIDATION_POLICIES = ("full", "sampled")
+DEFAULT_SAMPLE_SIZE = 10000
+DEFAULT_SAMPLE_SEED = 0
+# expectations that parse or walk every nested value, which is most of the validation time of a large dataset
+SAMPLED_EXPECTATIONS = frozenset(
+    [
+        "expect_column_values_to_match_json_schema",
+        "expect_column_values_to_have_list_length",
+        "expect_column_values_to_have_list_length_in_range",
+        "expect_column_values_to_have_list_members",
+        "expect_column_values_to_have_list_members_of_type",
+        "expect_column_values_to_have_list_of_dict_with_expected_values",
+    ]
+)
+SAMPLE_COLUMN = "adt_gx_sample"
+
+
+def get_data_context_location() -> str:
+    """Gets the path to the great_expectations directory"""
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    gx_directory = os.path.join(script_dir, "great_expectations")
+    return gx_directory
+
+
+class GreatExpectationsContext:
+    """Great Expectations data context and expectation suites shared by the runners of a processing run.
+
+    Building the file data context and loading the custom expectations is a large fixed cost, so it is
+    done once, the first time a runner needs the context, and not at all if no dataset is validated.
+    Expectation suites are read from the project once and each runner gets its own copy.
+
+    Attributes:
+        project_root_dir (str): Path to the great_expectations directory.
+    """
+
+    def __init__(self, project_root_dir: str = None):
+        """Initialize the class"""
+        self.project_root_dir = project_root_dir or get_data_context_location()
+        self._context: Optional["FileDataContext"] = None
+        self._suite_names: Optional[typing.List[str]] = None
+        self._suites: typing.Dict[str, "ExpectationSuite"] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def context(self) -> "FileDataContext":
+        """The file data context, created the first time it is used"""
+        with self._lock:
+            if self._context is None:
+                import great_expectations as gx
+
+                self._context = gx.get_context(project_root_dir=self.project_root_dir)
+                # the plugins directory is only on the python path once the context exists
+                from expectations.expect_column_values_to_have_list_length import (
+                    ExpectColumnValuesToHaveListLength,
+                )
+                from expectations.expect_column_values_to_have_list_length_in_range import (
+                    ExpectColumnValuesToHaveListLengthInRange,
+                )
+                from expectations.expect_column_values_to_have_list_members import (
+                    ExpectColumnValuesToHaveListMembers,
+                )
+                from expectations.expect_column_values_to_have_list_members_of_type import (
+                    ExpectColumnValuesToHaveListMembersOfType,
+                )
+                from expectations.expect_column_values_to_have_list_of_dict_with_expected_values import (
+                    ExpectColumnValuesToHaveListOfDictWithExpectedValues,
+                )
+            return self._context
+
+    def list_expectation_suite_names(self) -> typing.List[str]:
+        """Lists the names of the expectation suites in the project"""
+        with self._lock:
+            if self._suite_names is None:
+                self._suite_names = self.context.list_expectation_suite_names()
+            return list(self._suite_names)
+
+    def get_expectation_suite(self, expectation_suite_name: str) -> "ExpectationSuite":
+        """Gets a copy of an expectation suite of the project
+
+        Args:
+            expectation_suite_name (str): Name of the expectation suite
+
+        Returns:
+            ExpectationSuite: a copy of the expectation suite, which the caller may modify
+        """
+        with self._lock:
+            if expectation_suite_name not in self._suites:
+                self._suites[
+                    expectation_suite_name
+                ] = self.context.get_expectation_suite(expectation_suite_name)
+            return copy.deepcopy(self._suites[expectation_suite_name])
+
 
 class GreatExpectationsRunner:
     """Class to run great expectations on a dataset and upload the HTML report to Synapse
@@ -27,6 +128,15 @@ class GreatExpectationsRunner:
         report_file (str): Synapse ID of the GX report file.
         report_version (int): Version number of the GX report file.
         report_link (str): URL of the specific version of the GX report file.
+        gx_context (GreatExpectationsContext): Data context and expectation suites, shared with the other
+            runners of a processing run when passed to the constructor.
+        df (pd.DataFrame): In-memory data frame to validate instead of the file at dataset_path, or None.
+        fidelity_check (bool): Whether to check that the file at dataset_path parses back to the in-memory
+            data frame, and to validate the file instead if it does not.
+        validation_policy (str): "full" to run every expectation on every row, or "sampled" to run the
+            expectations in SAMPLED_EXPECTATIONS on a seeded random sample of sample_size rows only.
+        sample_size (int): Number of rows validated by the sampled expectations.
+        sample_seed (int): Seed of the sample, so that a dataset is validated on the same rows on every run.
     """
 
     failures: bool = False
@@ -37,52 +147,65 @@ class GreatExpectationsRunner:
     report_version: Optional[int] = None
     report_link: Optional[str] = None
 
+    # the file data context is not thread-safe, so runners validate one dataset at a time
+    _run_lock = threading.Lock()
+
     def __init__(
         self,
-        syn: Synapse,
+        syn: "Synapse",
         dataset_path: str,
         dataset_name: str,
         upload_folder: str = None,
         nested_columns: typing.List[str] = None,
+        gx_context: GreatExpectationsContext = None,
+        df: Optional[pd.DataFrame] = None,
+        fidelity_check: bool = False,
+        validation_policy: str = "full",
+        sample_size: int = DEFAULT_SAMPLE_SIZE,
+        sample_seed: int = DEFAULT_SAMPLE_SEED,
     ):
         """Initialize the class"""
+        if validation_policy not in VALIDATION_POLICIES:
+            raise ValueError(
+                f"Unknown GX validation policy {validation_policy}, expected one of {', '.join(VALIDATION_POLICIES)}"
+            )
         self.syn = syn
         self.dataset_path = dataset_path
+        self.df = df
+        self.fidelity_check = fidelity_check
+        self.validation_policy = validation_policy
+        self.sample_size = sample_size
+        self.sample_seed = sample_seed
         self.expectation_suite_name = dataset_name
         self.upload_folder = upload_folder
         self.nested_columns = nested_columns
-        self.gx_project_dir = self._get_data_context_location()
+        self.gx_context = (
+            gx_context
+            if gx_context is not None
+            else GreatExpectationsContext(
+                project_root_dir=self._get_data_context_location()
+            )
+        )
+        self.gx_project_dir = self.gx_context.project_root_dir
 
-        self.context = gx.get_context(project_root_dir=self.gx_project_dir)
         self.validations_path = os.path.join(
             self.gx_project_dir, "gx/uncommitted/data_docs/local_site/validations"
         )
-        from expectations.expect_column_values_to_have_list_length import (
-            ExpectColumnValuesToHaveListLength,
-        )
-        from expectations.expect_column_values_to_have_list_length_in_range import (
-            ExpectColumnValuesToHaveListLengthInRange,
-        )
-        from expectations.expect_column_values_to_have_list_members import (
-            ExpectColumnValuesToHaveListMembers,
-        )
-        from expectations.expect_column_values_to_have_list_members_of_type import (
-            ExpectColumnValuesToHaveListMembersOfType,
-        )
-        from expectations.expect_column_values_to_have_list_of_dict_with_expected_values import (
-            ExpectColumnValuesToHaveListOfDictWithExpectedValues,
-        )
+
+    @property
+    def context(self) -> "FileDataContext":
+        """The file data context of the shared GreatExpectationsContext"""
+        return self.gx_context.context
 
     def _get_data_context_location(self) -> str:
         """Gets the path to the great_expectations directory"""
-        script_dir = os.path.dirname(os.path.realpath(__file__))
-        gx_directory = os.path.join(script_dir, "great_expectations")
-        return gx_directory
+        return get_data_context_location()
 
     def check_if_expectation_suite_exists(self) -> bool:
         """Checks if the expectation suite exists in the great_expectations workspace"""
         exists = (
-            self.expectation_suite_name in self.context.list_expectation_suite_names()
+            self.expectation_suite_name
+            in self.gx_context.list_expectation_suite_names()
         )
         if not exists:
             logger.info(
@@ -90,7 +213,7 @@ class GreatExpectationsRunner:
             )
         return exists
 
-    def get_results_path(self, checkpoint_result: CheckpointResult) -> str:
+    def get_results_path(self, checkpoint_result: "CheckpointResult") -> str:
         """Gets the path to the most recent HTML report for a checkpoint,
         copies it to a Synapse-API friendly name, and returns the new path
 
@@ -125,6 +248,8 @@ class GreatExpectationsRunner:
         Args:
             results_path (str): Path to the GX report file.
         """
+        from synapseclient import Activity, File
+
         file = self.syn.store(
             File(
                 results_path,
@@ -157,10 +282,143 @@ class GreatExpectationsRunner:
         """
         df = df.copy()
         for column in nested_columns:
-            df[column] = df[column].apply(json.dumps)
+            df[column] = df[column].apply(json.dumps, cls=NumpyEncoder)
         return df
 
-    def set_warnings_and_failures(self, checkpoint_result: CheckpointResult) -> None:
+    @staticmethod
+    def convert_arrays_to_lists(df: pd.DataFrame) -> pd.DataFrame:
+        """Converts the numpy arrays and tuples in the object columns of a DataFrame to lists,
+        which is how they are read back from the JSON file. Other columns are not copied.
+
+        Args:
+            df (pd.DataFrame): DataFrame
+
+        Returns:
+            df (pd.DataFrame): DataFrame without numpy arrays or tuples in its object columns
+        """
+        converted = {}
+        for column in df.columns[(df.dtypes == object).to_numpy()]:
+            is_array = df[column].map(
+                lambda value: isinstance(value, (np.ndarray, tuple))
+            )
+            if is_array.any():
+                converted[column] = df[column].where(
+                    ~is_array, df[column][is_array].map(list)
+                )
+        return df.assign(**converted) if converted else df
+
+    def read_dataset_file(self, precise_float: bool = False) -> pd.DataFrame:
+        """Reads the staged JSON file at dataset_path
+
+        Args:
+            precise_float (bool, optional): Whether to parse floats exactly. Defaults to False.
+
+        Returns:
+            pd.DataFrame: the dataset as it was written to the file
+        """
+        lines = self.dataset_path.endswith((".ndjson", ".ndjson.gz"))
+        if precise_float:
+            return pd.read_json(self.dataset_path, lines=lines, precise_float=True)
+        return pd.read_json(self.dataset_path, lines=lines)
+
+    @staticmethod
+    def frames_match(in_memory_df: pd.DataFrame, file_df: pd.DataFrame) -> bool:
+        """Checks whether a data frame read back from its JSON file holds the same values as the in-memory data frame.
+        Missing values (None and NaN) are equivalent and dtypes are not compared, since JSON does not preserve them.
+
+        Args:
+            in_memory_df (pd.DataFrame): the data frame that was written to the file
+            file_df (pd.DataFrame): the data frame read back from the file
+
+        Returns:
+            bool: whether the data frames hold the same values
+        """
+        try:
+            pd.testing.assert_frame_equal(
+                in_memory_df.reset_index(drop=True),
+                file_df,
+                check_dtype=False,
+                check_index_type=False,
+                check_column_type=False,
+                check_exact=False,
+            )
+        except AssertionError:
+            return False
+        return True
+
+    def get_validation_df(self) -> pd.DataFrame:
+        """Gets the data frame to validate. This is the staged JSON file, unless an in-memory data frame was
+        passed to the runner. With a fidelity check, the in-memory data frame is only validated if the file
+        parses back to the same values.
+
+        Returns:
+            pd.DataFrame: the data frame to validate, with nested columns converted to JSON strings
+        """
+        if self.df is None:
+            gx_df = self.read_dataset_file()
+        else:
+            gx_df = self.convert_arrays_to_lists(self.df)
+            if self.fidelity_check:
+                file_df = self.read_dataset_file(precise_float=True)
+                if not self.frames_match(gx_df, file_df):
+                    logger.warning(
+                        f"{self.dataset_path} does not parse back to the in-memory data for "
+                        f"{self.expectation_suite_name}. Validating the file instead."
+                    )
+                    gx_df = file_df
+
+        if self.nested_columns:
+            gx_df = self.convert_nested_columns_to_json(
+                df=gx_df, nested_columns=self.nested_columns
+            )
+        return gx_df
+
+    def apply_validation_policy(
+        self, gx_df: pd.DataFrame, expectation_suite: "ExpectationSuite"
+    ) -> typing.Tuple[pd.DataFrame, "ExpectationSuite"]:
+        """Restricts the expensive expectations of a suite to a seeded random sample of the rows when the
+        validation policy is "sampled". The other expectations still run on every row. The sample is marked
+        in a SAMPLE_COLUMN column and selected with a row condition, which is shown in the GX report.
+
+        Args:
+            gx_df (pd.DataFrame): the data frame to validate
+            expectation_suite (ExpectationSuite): a copy of the expectation suite of the dataset, modified in place
+
+        Returns:
+            typing.Tuple[pd.DataFrame, ExpectationSuite]: the data frame and expectation suite to validate
+        """
+        if self.validation_policy == "full" or len(gx_df) <= self.sample_size:
+            return gx_df, expectation_suite
+
+        sampled_expectations = [
+            expectation
+            for expectation in expectation_suite.expectations
+            if expectation.expectation_type in SAMPLED_EXPECTATIONS
+        ]
+        if not sampled_expectations:
+            return gx_df, expectation_suite
+
+        logger.info(
+            f"Validating {', '.join(sorted({e.expectation_type for e in sampled_expectations}))} "
+            f"on {self.sample_size} of {len(gx_df)} rows of {self.expectation_suite_name}"
+        )
+        rng = np.random.default_rng(self.sample_seed)
+        in_sample = np.zeros(len(gx_df), dtype=bool)
+        in_sample[rng.choice(len(gx_df), size=self.sample_size, replace=False)] = True
+        gx_df = gx_df.assign(**{SAMPLE_COLUMN: in_sample})
+
+        sample_condition = f"{SAMPLE_COLUMN} == True"
+        for expectation in sampled_expectations:
+            row_condition = expectation.kwargs.get("row_condition")
+            expectation.kwargs["row_condition"] = (
+                f"({row_condition}) and {sample_condition}"
+                if row_condition
+                else sample_condition
+            )
+            expectation.kwargs["condition_parser"] = "pandas"
+        return gx_df, expectation_suite
+
+    def set_warnings_and_failures(self, checkpoint_result: "CheckpointResult") -> None:
         """Sets class attributes for warnings and failures given a CheckpointResult
 
         Args:
@@ -219,27 +477,28 @@ class GreatExpectationsRunner:
 
         logger.info(f"Running data validation on {self.expectation_suite_name}")
 
-        gx_df = pd.read_json(self.dataset_path)
-        if self.nested_columns:
-            gx_df = self.convert_nested_columns_to_json(
-                df=gx_df, nested_columns=self.nested_columns
-            )
+        gx_df = self.get_validation_df()
 
-        validator = self.context.sources.pandas_default.read_dataframe(gx_df)
-        expectation_suite = self.context.get_expectation_suite(
+        expectation_suite = self.gx_context.get_expectation_suite(
             self.expectation_suite_name
         )
-        validator.expectation_suite = expectation_suite
-        validator.validate()
-        checkpoint = self.context.add_or_update_checkpoint(
-            name=self.expectation_suite_name,
-            validator=validator,
+        gx_df, expectation_suite = self.apply_validation_policy(
+            gx_df=gx_df, expectation_suite=expectation_suite
         )
-        checkpoint_result = checkpoint.run()
+
+        with self._run_lock:
+            validator = self.context.sources.pandas_default.read_dataframe(gx_df)
+            validator.expectation_suite = expectation_suite
+            validator.validate()
+            checkpoint = self.context.add_or_update_checkpoint(
+                name=self.expectation_suite_name,
+                validator=validator,
+            )
+            checkpoint_result = checkpoint.run()
+            latest_reults_path = self.get_results_path(checkpoint_result)
         logger.info(
             f"Data validation complete for {self.expectation_suite_name}. Uploading results to Synapse."
         )
-        latest_reults_path = self.get_results_path(checkpoint_result)
 
         self.set_warnings_and_failures(checkpoint_result)
 
@@ -1,5 +1,16 @@
+import json
 import logging
+import sys
+import threading
 import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # the resource module is not available on Windows
+    resource = None
 
 
 def format_seconds(seconds):
@@ -61,3 +72,125 @@ def log_time(func_name: str, logger: logging.Logger):
         return wrapped
 
     return log
+
+
+def get_process_peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident set size of the whole process since it started in MB, or None if the platform
+    does not report it."""
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return round(peak_rss / 1024**2, 1)
+    return round(peak_rss / 1024, 1)
+
+
+@dataclass
+class StageMetrics:
+    """
+    Resources used by one stage of processing a dataset.
+
+    Attributes:
+        stage: Name of the stage.
+        wall_seconds: Elapsed wall time of the stage.
+        cpu_seconds: CPU time used by the thread that ran the stage.
+        process_peak_rss_mb: Peak resident set size of the whole process at the end of the stage, in MB.
+                             This is a high-water mark of the run, not the memory used by the stage.
+                             None if the platform does not report it.
+    """
+
+    stage: str
+    wall_seconds: float
+    cpu_seconds: float
+    process_peak_rss_mb: Optional[float]
+
+
+class StageRecorder:
+    """Records the wall time, CPU time and process peak memory at the end of the stages of processing a dataset.
+
+    CPU time is measured for the current thread only, so the figures of a dataset are not affected
+    by datasets processed at the same time by other workers. The peak resident set size is a high-water
+    mark of the whole process: it shows whether a stage raised the peak memory of the run.
+    """
+
+    def __init__(self):
+        self.stages: List[StageMetrics] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Context manager that records the resources used by the code it wraps as a stage called `name`.
+        The stage is recorded even if the code raises an exception.
+
+        Args:
+            name (str): Name of the stage
+        """
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.stages.append(
+                StageMetrics(
+                    stage=name,
+                    wall_seconds=round(time.perf_counter() - start_wall, 3),
+                    cpu_seconds=round(time.thread_time() - start_cpu, 3),
+                    process_peak_rss_mb=get_process_peak_rss_mb(),
+                )
+            )
+
+    def to_records(self) -> List[dict]:
+        """Returns the recorded stages as a list of dictionaries, in the order they finished."""
+        return [asdict(stage) for stage in self.stages]
+
+    def to_json(self) -> str:
+        """Returns the recorded stages as a JSON list, in the order they finished."""
+        return json.dumps(self.to_records())
+
+    def format(self) -> str:
+        """Returns a one line summary of the recorded stages, for logging."""
+        return ", ".join(
+            f"{stage.stage} {stage.wall_seconds:.3f}s (cpu {stage.cpu_seconds:.3f}s)"
+            for stage in self.stages
+        )
+
+
+class RunMetrics:
+    """Stage recorders of the datasets of a run, keyed by dataset name. Every dataset gets a recorder,
+    whether or not it has GX enabled or succeeds, and an upload that runs in the background records its
+    stage in the recorder of its dataset when it completes.
+
+    Attributes:
+        recorders: StageRecorder of each dataset, in the order the datasets were started.
+    """
+
+    def __init__(self):
+        self.recorders: Dict[str, StageRecorder] = {}
+        self._lock = threading.Lock()
+
+    def get_recorder(self, dataset_name: str) -> StageRecorder:
+        """Returns the recorder of a dataset, creating it the first time
+
+        Args:
+            dataset_name (str): Name of the dataset
+
+        Returns:
+            StageRecorder: recorder of the stages of the dataset
+        """
+        with self._lock:
+            return self.recorders.setdefault(dataset_name, StageRecorder())
+
+    def write(self, path: str) -> None:
+        """Writes the stages of every dataset to a JSON file, as a mapping of each dataset name to the list
+        of its stages.
+
+        Args:
+            path (str): path of the JSON file
+        """
+        with self._lock:
+            metrics = {
+                dataset_name: recorder.to_records()
+                for dataset_name, recorder in self.recorders.items()
+            }
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            json.dump(metrics, metrics_file, indent=2)
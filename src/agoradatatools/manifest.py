@@ -0,0 +1,187 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional
+
+from agoradatatools.gx import get_data_context_location
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of the manifest file changes to ignore manifests written by older versions
+RUN_MANIFEST_VERSION = 1
+
+
+def get_package_version() -> str:
+    """Gets the installed version of agoradatatools"""
+    try:
+        return version("agoradatatools")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+@functools.lru_cache(maxsize=None)
+def get_package_source_hash() -> str:
+    """Hashes the source of every module of agoradatatools. The custom transformations depend on
+    code shared across the package, e.g. the extract and utils modules, so the whole package is
+    hashed rather than the module of each transformation. The hash is computed once per process.
+
+    Returns:
+        str: SHA-256 hex digest of the path and source of each module
+    """
+    package_path = os.path.dirname(os.path.abspath(__file__))
+    source_hash = hashlib.sha256()
+    for root, dirs, files in os.walk(package_path):
+        # walk the directories in a stable order
+        dirs.sort()
+        for file_name in sorted(files):
+            if not file_name.endswith(".py"):
+                continue
+            path = os.path.join(root, file_name)
+            source_hash.update(
+                os.path.relpath(path, package_path).replace(os.sep, "/").encode("utf-8")
+            )
+            with open(path, "rb") as source_file:
+                source_hash.update(source_file.read())
+    return source_hash.hexdigest()
+
+
+def get_expectation_suite_hash(dataset_name: str) -> Optional[str]:
+    """Hashes the JSON file of the expectation suite of a dataset
+
+    Args:
+        dataset_name (str): Name of the dataset, which is also the name of its expectation suite
+
+    Returns:
+        Optional[str]: SHA-256 hex digest of the suite file, or None if the dataset has no expectation suite
+    """
+    suite_path = os.path.join(
+        get_data_context_location(), "gx", "expectations", f"{dataset_name}.json"
+    )
+    if not os.path.exists(suite_path):
+        return None
+    with open(suite_path, "rb") as suite_file:
+        return hashlib.sha256(suite_file.read()).hexdigest()
+
+
+def get_dataset_fingerprint(dataset_obj: dict) -> Optional[str]:
+    """Fingerprints a dataset from its configuration block, which includes the Synapse ID and version
+    of each of its input files, the version and source of agoradatatools and its expectation suite.
+
+    Args:
+        dataset_obj (dict): A dataset defined in the configuration file
+
+    Returns:
+        Optional[str]: SHA-256 hex digest of the dataset, or None if any of its input files is not pinned
+            to a version (e.g. `syn27211942` instead of `syn27211942.1`), since its content can change
+            without the configuration changing
+    """
+    dataset_name = list(dataset_obj.keys())[0]
+    dataset_config = dataset_obj[dataset_name]
+    for entity in dataset_config.get("files", []):
+        if not re.fullmatch(r"syn\d+\.\d+", str(entity["id"])):
+            return None
+
+    fingerprint_source = {
+        "dataset": dataset_name,
+        "config": dataset_config,
+        "agoradatatools_version": get_package_version(),
+        # the code can change without the package version changing, e.g. in a checkout
+        "agoradatatools_source": get_package_source_hash(),
+    }
+    # the expectations can change without the package version changing
+    if dataset_config.get("gx_enabled", False):
+        suite_hash = get_expectation_suite_hash(dataset_name=dataset_name)
+        if suite_hash is not None:
+            fingerprint_source["expectation_suite"] = suite_hash
+    return hashlib.sha256(
+        json.dumps(fingerprint_source, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class RunManifest:
+    """Fingerprints and outputs of the datasets of the last successful run of each dataset, stored in a
+    JSON file. A dataset whose fingerprint matches its entry was already processed and uploaded with
+    the same inputs, configuration and code, so its previous output can be reused.
+
+    Attributes:
+        manifest_path (str): Path to the JSON file of the manifest.
+        entries (dict): Manifest entry of each dataset, keyed by dataset name.
+    """
+
+    def __init__(self, manifest_path: str):
+        """Initialize the class, reading the manifest file if it exists
+
+        Args:
+            manifest_path (str): Path to the JSON file of the manifest.
+        """
+        self.manifest_path = manifest_path
+        self.entries = self._read()
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        """Reads the entries of the manifest file, returns no entries if it does not exist or can not be used"""
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Unable to read the run manifest %s: %s", self.manifest_path, e
+            )
+            return {}
+        if manifest.get("manifest_version") != RUN_MANIFEST_VERSION:
+            return {}
+        return manifest.get("datasets", {})
+
+    def get_unchanged(self, dataset_name: str, fingerprint: str) -> Optional[dict]:
+        """Gets the manifest entry of a dataset if its fingerprint has not changed
+
+        Args:
+            dataset_name (str): Name of the dataset
+            fingerprint (str): Current fingerprint of the dataset, see get_dataset_fingerprint
+
+        Returns:
+            Optional[dict]: the manifest entry of the dataset, or None if the dataset must be processed
+        """
+        if fingerprint is None:
+            return None
+        with self._lock:
+            entry = self.entries.get(dataset_name)
+        if entry is None or entry.get("fingerprint") != fingerprint:
+            return None
+        return dict(entry)
+
+    def record(self, dataset_name: str, fingerprint: str, **outputs) -> None:
+        """Records a dataset that was processed and uploaded successfully
+
+        Args:
+            dataset_name (str): Name of the dataset
+            fingerprint (str): Fingerprint of the dataset, see get_dataset_fingerprint. Datasets without
+                a fingerprint are not recorded.
+            **outputs: Outputs of the dataset to reuse when it is unchanged, e.g. `adt_output_file`
+        """
+        if fingerprint is None:
+            return
+        with self._lock:
+            self.entries[dataset_name] = {"fingerprint": fingerprint, **outputs}
+
+    def save(self) -> None:
+        """Writes the manifest file"""
+        with self._lock:
+            manifest = {
+                "manifest_version": RUN_MANIFEST_VERSION,
+                "datasets": self.entries,
+            }
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
@@ -1,199 +1,573 @@
 import logging
-from typing import Union
+import os
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional, Set, Union
 
-import synapseclient
 from pandas import DataFrame
+from pandas.api.types import is_float_dtype, is_integer_dtype
+from pandas.core.dtypes.cast import find_common_type
 from typer import Argument, Option, Typer
 
 from agoradatatools.errors import ADTDataProcessingError, ADTDataValidationError
-from agoradatatools.etl import extract, load, transform, utils
-from agoradatatools.gx import GreatExpectationsRunner
-from agoradatatools.logs import log_time
+from agoradatatools.etl import extract, load, utils
+from agoradatatools.etl.transform.registry import (
+    get_transform,
+    get_transform_config_errors,
+)
+from agoradatatools.gx import (
+    DEFAULT_SAMPLE_SEED,
+    DEFAULT_SAMPLE_SIZE,
+    GreatExpectationsContext,
+    GreatExpectationsRunner,
+)
+from agoradatatools.logs import RunMetrics, StageRecorder, log_time
+from agoradatatools.manifest import RunManifest, get_dataset_fingerprint
 from agoradatatools.reporter import ADTGXReporter, DatasetReport
 from agoradatatools.constants import Platform
+from agoradatatools.scheduler import get_dataset_name, schedule_datasets
+
+if TYPE_CHECKING:
+    import synapseclient
 
 
 logger = logging.getLogger(__name__)
 
 
-# TODO refactor to avoid so many if's - maybe some sort of mapping to callables
 def apply_custom_transformations(
-    datasets: dict, dataset_name: str, dataset_obj: dict
+    datasets: dict,
+    dataset_name: str,
+    dataset_obj: dict,
 ) -> Union[DataFrame, dict, None]:
+    """Applies the custom transformation that a transform module registers for a dataset, see
+    transform.registry. Only the module of the dataset is imported, along with the modules of the other
+    transforms it calls.
+
+    Args:
+        datasets (dict): input files of the dataset, by name
+        dataset_name (str): Name of the dataset
+        dataset_obj (dict): Configuration of the dataset defined in the configuration file
+
+    Returns:
+        Union[DataFrame, dict, None]: the transformed dataset, or None if the dataset has no registered transformation
+    """
     if not isinstance(datasets, dict) or not isinstance(dataset_name, str):
         return None
-    if dataset_name == "biodomain_info":
-        return transform.transform_biodomain_info(datasets=datasets)
-    if dataset_name == "genes_biodomains":
-        return transform.transform_genes_biodomains(datasets=datasets)
-    if dataset_name == "overall_scores":
-        df = datasets["overall_scores"]
-        return transform.transform_overall_scores(df=df)
-    if dataset_name == "distribution_data":
-        return transform.transform_distribution_data(
-            datasets=datasets,
-            overall_max_score=dataset_obj["custom_transformations"][
-                "overall_max_score"
-            ],
-            genetics_max_score=dataset_obj["custom_transformations"][
-                "genetics_max_score"
-            ],
-            omics_max_score=dataset_obj["custom_transformations"]["omics_max_score"],
-        )
-    if dataset_name == "team_info":
-        return transform.transform_team_info(datasets=datasets)
-    if dataset_name == "rnaseq_differential_expression":
-        return transform.transform_rnaseq_differential_expression(datasets=datasets)
-    if dataset_name == "gene_info":
-        return transform.transform_gene_info(
-            datasets=datasets,
-            adjusted_p_value_threshold=dataset_obj["custom_transformations"][
-                "adjusted_p_value_threshold"
-            ],
-            protein_level_threshold=dataset_obj["custom_transformations"][
-                "protein_level_threshold"
-            ],
-        )
-    if dataset_name == "rna_distribution_data":
-        return transform.transform_rna_distribution_data(datasets=datasets)
-    if dataset_name == "proteomics_distribution_data":
-        return transform.transform_proteomics_distribution_data(datasets=datasets)
-    if dataset_name in ["proteomics", "proteomics_tmt", "proteomics_srm"]:
-        df = datasets[dataset_name]
-        return transform.transform_proteomics(df=df)
-    if dataset_name in ["biomarkers", "pathology"]:
-        return transform.immunohisto_transform(
-            datasets=datasets, dataset_name=dataset_name
-        )
-    else:
+    spec = get_transform(dataset_name=dataset_name)
+    if spec is None:
         return None
+    return spec.apply(
+        datasets=datasets,
+        dataset_name=dataset_name,
+        custom_transformations=dataset_obj.get("custom_transformations"),
+    )
 
 
-@log_time(func_name="process_dataset", logger=logger)
-def process_dataset(
+def extract_entity(
+    entity: dict,
+    syn: "synapseclient.Synapse",
+    entity_cache: extract.EntityCache = None,
+    recorder: StageRecorder = None,
+    prefetcher: extract.EntityPrefetcher = None,
+    dataset_name: str = None,
+) -> DataFrame:
+    """Extracts a source file defined in the configuration file and standardizes its column names and values
+
+    Args:
+        entity (dict): A source file defined in the configuration file, with `id` and `format` keys and
+            optional `columns`, `dtypes` and `engine` keys
+        syn (synapseclient.Synapse): synapseclient.Synapse session.
+        entity_cache (extract.EntityCache, optional): Cache shared by the datasets of a run. Defaults to None.
+        recorder (StageRecorder, optional): Records the "extract" and "standardize" stages of the source file.
+            Nothing is recorded when the file is taken from the cache. Defaults to None.
+        prefetcher (extract.EntityPrefetcher, optional): Downloads of source files started ahead of time. Defaults to None.
+        dataset_name (str, optional): Name of the dataset that uses the source file, whose use of the cached
+            file is given up. Defaults to None.
+
+    Returns:
+        DataFrame: the standardized data frame
+    """
+    if recorder is None:
+        recorder = StageRecorder()
+
+    def load_entity() -> DataFrame:
+        with recorder.stage(f"extract:{entity['name']}"):
+            df = extract.get_entity_as_df(
+                syn_id=entity["id"],
+                source=entity["format"],
+                syn=syn,
+                prefetcher=prefetcher,
+                columns=entity.get("columns"),
+                dtypes=entity.get("dtypes"),
+                engine=entity.get("engine", "c"),
+            )
+        with recorder.stage(f"standardize:{entity['name']}"):
+            df = utils.standardize_column_names(df=df)
+            df = utils.standardize_values(df=df)
+        return df
+
+    if entity_cache is None:
+        return load_entity()
+
+    return entity_cache.get_or_load(
+        syn_id=entity["id"],
+        source=entity["format"],
+        loader=load_entity,
+        read_options=extract.get_read_options(entity),
+        dataset_name=dataset_name,
+    )
+
+
+def transform_dataset(
     dataset_obj: dict,
-    staging_path: str,
-    gx_folder: str,
-    syn: synapseclient.Synapse,
-    upload: bool = True,
-) -> Union[DatasetReport, None]:
-    """Takes in a dataset from the configuration file and passes it through the ETL process
+    syn: "synapseclient.Synapse",
+    entity_cache: extract.EntityCache = None,
+    recorder: StageRecorder = None,
+    prefetcher: extract.EntityPrefetcher = None,
+) -> Union[DataFrame, dict]:
+    """Extracts the source files of a dataset, renames their columns and applies the custom transformations
+    of the dataset.
 
     Args:
         dataset_obj (dict): A dataset defined in the configuration file
-        staging_path (str): Staging path
-        gx_folder (str): Synapse ID of the folder where Great Expectations reports should be uploaded
         syn (synapseclient.Synapse): synapseclient.Synapse session.
-        upload (bool, optional): Whether or not to upload the data to Synapse. Defaults to True.
+        entity_cache (extract.EntityCache, optional): Cache of source files shared by the datasets of a run. Defaults to None.
+        recorder (StageRecorder, optional): Records the stages of the dataset. Defaults to None.
+        prefetcher (extract.EntityPrefetcher, optional): Downloads of source files started ahead of time. Defaults to None.
 
     Returns:
-        None if GX is not enabled. Otherwise, a DatasetReport object.
+        Union[DataFrame, dict]: the transformed dataset, before its `agora_rename`
     """
     dataset_name = list(dataset_obj.keys())[0]
-    dataset_report = DatasetReport(data_set=dataset_name)
+    dataset_config = dataset_obj[dataset_name]
+    if recorder is None:
+        recorder = StageRecorder()
 
     entities_as_df = {}
-    for entity in dataset_obj[dataset_name]["files"]:
-        entity_id = entity["id"]
-        entity_format = entity["format"]
+    for entity in dataset_config["files"]:
         entity_name = entity["name"]
 
-        df = extract.get_entity_as_df(syn_id=entity_id, source=entity_format, syn=syn)
-        df = utils.standardize_column_names(df=df)
-        df = utils.standardize_values(df=df)
+        df = extract_entity(
+            entity=entity,
+            syn=syn,
+            entity_cache=entity_cache,
+            recorder=recorder,
+            prefetcher=prefetcher,
+            dataset_name=dataset_name,
+        )
 
-        if "column_rename" in dataset_obj[dataset_name].keys():
-            df = utils.rename_columns(
-                df=df, column_map=dataset_obj[dataset_name]["column_rename"]
-            )
+        if "column_rename" in dataset_config.keys():
+            with recorder.stage(f"rename:{entity_name}"):
+                df = utils.rename_columns(
+                    df=df, column_map=dataset_config["column_rename"]
+                )
 
         entities_as_df[entity_name] = df
 
-    if "custom_transformations" in dataset_obj[dataset_name].keys():
-        df = apply_custom_transformations(
-            datasets=entities_as_df,
-            dataset_name=dataset_name,
-            dataset_obj=dataset_obj[dataset_name],
-        )
-    else:
-        df = entities_as_df[list(entities_as_df)[0]]
+    if "custom_transformations" in dataset_config.keys():
+        with recorder.stage("transform"):
+            return apply_custom_transformations(
+                datasets=entities_as_df,
+                dataset_name=dataset_name,
+                dataset_obj=dataset_config,
+            )
+    return entities_as_df[list(entities_as_df)[0]]
+
+
+def stream_dataset(
+    dataset_obj: dict,
+    staging_path: str,
+    syn: "synapseclient.Synapse",
+    chunk_size: int,
+    prefetcher: extract.EntityPrefetcher = None,
+) -> str:
+    """Streams a dataset without custom transformations from its csv or tsv source file to its staged JSON
+    file. The file is read `chunk_size` rows at a time, and the column names and values of each chunk are
+    standardized, renamed and appended to the JSON file, so peak memory is bounded by the chunk size
+    rather than the size of the file.
+
+    The output is the same as that of the regular path: like the pandas parser does when it concatenates
+    the chunks of a file, integer columns with a float chunk, e.g. a chunk with missing values, are written
+    as floats. If such a chunk comes after integer chunks that were already written, the file is
+    streamed a second time with these columns read as floats from the start.
+
+    Args:
+        dataset_obj (dict): A dataset defined in the configuration file, with a single csv or tsv file
+        staging_path (str): Staging path
+        syn (synapseclient.Synapse): synapseclient.Synapse session.
+        chunk_size (int): number of rows read at a time
+        prefetcher (extract.EntityPrefetcher, optional): Downloads of source files started ahead of time. Defaults to None.
 
-    if "agora_rename" in dataset_obj[dataset_name].keys():
-        df = utils.rename_columns(
-            df=df, column_map=dataset_obj[dataset_name]["agora_rename"]
+    Raises:
+        ValueError: If the dataset has custom transformations or more than one source file
+
+    Returns:
+        str: path of the staged JSON file
+    """
+    dataset_name = list(dataset_obj.keys())[0]
+    dataset_config = dataset_obj[dataset_name]
+    if (
+        "custom_transformations" in dataset_config.keys()
+        or len(dataset_config["files"]) != 1
+    ):
+        raise ValueError(
+            "Only datasets with a single source file and without custom transformations "
+            + f"can be streamed: {dataset_name}"
         )
 
-    if isinstance(df, dict):
-        json_path = load.dict_to_json(
-            df=df,
-            staging_path=staging_path,
-            filename=dataset_name + "." + dataset_obj[dataset_name]["final_format"],
+    entity = dataset_config["files"][0]
+    if entity.get("engine", "c") != "c":
+        logger.info(
+            "Streaming %s with the C parser instead of the %s engine",
+            dataset_name,
+            entity["engine"],
         )
-    else:
-        json_path = load.df_to_json(
-            df=df,
-            staging_path=staging_path,
-            filename=dataset_name + "." + dataset_obj[dataset_name]["final_format"],
+    path = extract.get_entity(syn_id=entity["id"], syn=syn, prefetcher=prefetcher).path
+    final_format = dataset_config["final_format"]
+    options = load.get_final_format(final_format)
+    json_path = os.path.join(staging_path, dataset_name + "." + final_format)
+
+    def write_chunks(float_columns: Optional[Set[str]]) -> tuple:
+        chunk_dtypes = {}
+        written_as_float = {}
+        with load.open_output_file(json_path) as json_file:
+            writer = load.JsonRecordsWriter(
+                file=json_file,
+                indent=options["indent"],
+                lines=options["lines"],
+            )
+            for chunk in extract.read_delimited_in_chunks(
+                path=path,
+                source=entity["format"],
+                chunk_size=chunk_size,
+                columns=entity.get("columns"),
+                dtypes=entity.get("dtypes"),
+            ):
+                chunk = utils.standardize_column_names(df=chunk)
+                chunk = utils.standardize_values(df=chunk)
+                for column_map in ["column_rename", "agora_rename"]:
+                    if column_map in dataset_config.keys():
+                        chunk = utils.rename_columns(
+                            df=chunk, column_map=dataset_config[column_map]
+                        )
+
+                for column, dtype in chunk.dtypes.items():
+                    chunk_dtypes.setdefault(column, set()).add(dtype)
+                    if not is_integer_dtype(dtype):
+                        continue
+                    if float_columns is None:
+                        # the best guess from the chunks read so far
+                        as_float = is_float_dtype(
+                            find_common_type(list(chunk_dtypes[column]))
+                        )
+                    else:
+                        as_float = column in float_columns
+                    written_as_float.setdefault(column, set()).add(as_float)
+                    if as_float:
+                        chunk[column] = chunk[column].astype(float)
+                writer.write(chunk)
+            writer.close()
+        return chunk_dtypes, written_as_float
+
+    chunk_dtypes, written_as_float = write_chunks(float_columns=None)
+    float_columns = {
+        column
+        for column, dtypes in chunk_dtypes.items()
+        if is_float_dtype(find_common_type(list(dtypes)))
+    }
+    if any(
+        choices != {column in float_columns}
+        for column, choices in written_as_float.items()
+    ):
+        logger.info(
+            "Integer columns of %s are floats in later chunks, streaming it again",
+            dataset_name,
         )
+        write_chunks(float_columns=float_columns)
+    return json_path
 
-    gx_enabled = dataset_obj[dataset_name].get("gx_enabled", False)
 
-    if gx_enabled:
-        gx_runner = GreatExpectationsRunner(
-            syn=syn,
-            dataset_path=json_path,
-            dataset_name=dataset_name,
-            upload_folder=gx_folder if upload else None,
-            nested_columns=(
-                dataset_obj[dataset_name]["gx_nested_columns"]
-                if "gx_nested_columns" in dataset_obj[dataset_name].keys()
-                else None
-            ),
-        )
-        gx_runner.run()
+def release_dataset_inputs(
+    dataset_name: str,
+    entity_cache: extract.EntityCache = None,
+) -> None:
+    """Gives up the uses of the source files that a dataset has not taken, so that they are evicted
+    from the cache of the run once no other dataset needs them. Called once a dataset
+    is processed, whether it succeeded or not, and for datasets that are not processed at all.
 
-        dataset_report.set_attributes(
-            gx_report_file=gx_runner.report_file,
-            gx_report_version=gx_runner.report_version,
-            gx_report_link=DatasetReport.format_link(
-                syn_id=gx_runner.report_file, version=gx_runner.report_version
-            ),
-            gx_failures=gx_runner.failures,
-            gx_failure_message=gx_runner.failure_message,
-            gx_warnings=gx_runner.warnings,
-            gx_warning_message=gx_runner.warning_message,
+    Args:
+        dataset_name (str): Name of the dataset
+        entity_cache (extract.EntityCache, optional): Cache of source files shared by the datasets of a run. Defaults to None.
+    """
+    if entity_cache is not None:
+        entity_cache.release_dataset(dataset_name=dataset_name)
+
+
+def reuse_previous_run(
+    dataset_obj: dict, previous_run: dict
+) -> Union[DatasetReport, None]:
+    """Reports a dataset that is unchanged since its last successful run with the outputs of that run,
+    instead of processing it again.
+
+    Args:
+        dataset_obj (dict): A dataset defined in the configuration file
+        previous_run (dict): Manifest entry of the last successful run of the dataset
+
+    Returns:
+        None if GX is not enabled. Otherwise, a DatasetReport object.
+    """
+    dataset_name = list(dataset_obj.keys())[0]
+    logger.info(
+        "Skipping %s dataset, its inputs and configuration are unchanged since %s.%s was uploaded",
+        dataset_name,
+        previous_run["adt_output_file"],
+        previous_run["adt_output_version"],
+    )
+
+    if not dataset_obj[dataset_name].get("gx_enabled", False):
+        return None
+
+    dataset_report = DatasetReport(data_set=dataset_name)
+    dataset_report.set_attributes(
+        gx_report_file=previous_run.get("gx_report_file"),
+        gx_report_version=previous_run.get("gx_report_version"),
+        gx_report_link=DatasetReport.format_link(
+            syn_id=previous_run.get("gx_report_file"),
+            version=previous_run.get("gx_report_version"),
+        ),
+        gx_failures=False,
+        gx_warnings=previous_run.get("gx_warnings", False),
+        gx_warning_message=previous_run.get("gx_warning_message"),
+        adt_output_file=previous_run["adt_output_file"],
+        adt_output_version=previous_run["adt_output_version"],
+        adt_output_link=DatasetReport.format_link(
+            syn_id=previous_run["adt_output_file"],
+            version=previous_run["adt_output_version"],
+        ),
+    )
+    return dataset_report
+
+
+@log_time(func_name="process_dataset", logger=logger)
+def process_dataset(
+    dataset_obj: dict,
+    staging_path: str,
+    gx_folder: str,
+    syn: "synapseclient.Synapse",
+    upload: bool = True,
+    entity_cache: extract.EntityCache = None,
+    gx_context: GreatExpectationsContext = None,
+    gx_in_memory: bool = False,
+    gx_fidelity_check: bool = False,
+    gx_full_validation: bool = False,
+    run_manifest: RunManifest = None,
+    prefetcher: extract.EntityPrefetcher = None,
+    upload_queue: load.UploadQueue = None,
+    run_metrics: RunMetrics = None,
+) -> Union[DatasetReport, None]:
+    """Takes in a dataset from the configuration file and passes it through the ETL process.
+    The wall time, CPU time and peak memory of each stage are logged, and recorded in `run_metrics` if provided.
+
+    Args:
+        dataset_obj (dict): A dataset defined in the configuration file
+        staging_path (str): Staging path
+        gx_folder (str): Synapse ID of the folder where Great Expectations reports should be uploaded
+        syn (synapseclient.Synapse): synapseclient.Synapse session.
+        upload (bool, optional): Whether or not to upload the data to Synapse. Defaults to True.
+        entity_cache (extract.EntityCache, optional): Cache of source files shared by the datasets of a run. Defaults to None.
+        gx_context (GreatExpectationsContext, optional): Great Expectations context shared by the datasets of a run. Defaults to None.
+        gx_in_memory (bool, optional): Whether GX validates the transformed data frame instead of reading back the staged file.
+            Datasets transformed into a dictionary are always validated from the file. Defaults to False.
+        gx_fidelity_check (bool, optional): With gx_in_memory, whether to check that the staged file parses back to the
+            transformed data frame, and to validate the file if it does not. Defaults to False.
+        gx_full_validation (bool, optional): Whether to run every expectation on every row, ignoring the
+            `gx_validation_policy` of the dataset. Defaults to False.
+        run_manifest (RunManifest, optional): Manifest of the previous runs. When uploading, a dataset that is
+            unchanged since its last successful run is not processed again, and uploaded datasets are
+            recorded in the manifest. Defaults to None.
+        prefetcher (extract.EntityPrefetcher, optional): Bounded pool that downloads all the source files of the dataset
+            concurrently before they are extracted one by one. Defaults to None.
+        upload_queue (load.UploadQueue, optional): Queue that uploads the file in the background. The output
+            file attributes of the DatasetReport are only set once the upload is complete, and the `upload`
+            stage is only recorded then. Defaults to None, in which case the file is uploaded before returning.
+        run_metrics (RunMetrics, optional): Stage recorders of the datasets of the run, which the stages of the
+            dataset are recorded in. Defaults to None.
+
+    Returns:
+        None if GX is not enabled. Otherwise, a DatasetReport object.
+    """
+    dataset_name = list(dataset_obj.keys())[0]
+    try:
+        fingerprint = None
+        if run_manifest is not None and upload:
+            fingerprint = get_dataset_fingerprint(dataset_obj=dataset_obj)
+            previous_run = run_manifest.get_unchanged(
+                dataset_name=dataset_name, fingerprint=fingerprint
+            )
+            if previous_run is not None:
+                return reuse_previous_run(
+                    dataset_obj=dataset_obj, previous_run=previous_run
+                )
+
+        dataset_report = DatasetReport(data_set=dataset_name)
+        recorder = (
+            run_metrics.get_recorder(dataset_name=dataset_name)
+            if run_metrics is not None
+            else StageRecorder()
         )
 
-        if upload and not gx_runner.failures:
-            file_id, file_version = load.load(
-                file_path=json_path,
-                provenance=dataset_obj[dataset_name]["provenance"],
-                destination=dataset_obj[dataset_name]["destination"],
+        if prefetcher is not None:
+            prefetcher.prefetch(
+                syn_ids=[
+                    entity["id"]
+                    for entity in dataset_obj[dataset_name]["files"]
+                    if entity_cache is None
+                    or not entity_cache.is_cached(
+                        syn_id=entity["id"],
+                        source=entity["format"],
+                        read_options=extract.get_read_options(entity),
+                    )
+                ]
+            )
+
+        stream_chunk_size = dataset_obj[dataset_name].get("stream_chunk_size")
+        if stream_chunk_size:
+            # the source file is read in chunks instead of being taken from the cache, its use is given up
+            # once the dataset is processed
+            with recorder.stage("stream"):
+                json_path = stream_dataset(
+                    dataset_obj=dataset_obj,
+                    staging_path=staging_path,
+                    syn=syn,
+                    chunk_size=stream_chunk_size,
+                    prefetcher=prefetcher,
+                )
+            df = None
+        else:
+            df = transform_dataset(
+                dataset_obj=dataset_obj,
                 syn=syn,
+                entity_cache=entity_cache,
+                recorder=recorder,
+                prefetcher=prefetcher,
             )
 
-            dataset_report.set_attributes(
-                adt_output_file=file_id,
-                adt_output_version=file_version,
-                adt_output_link=DatasetReport.format_link(
-                    syn_id=file_id, version=file_version
+            if "agora_rename" in dataset_obj[dataset_name].keys():
+                with recorder.stage("rename"):
+                    df = utils.rename_columns(
+                        df=df, column_map=dataset_obj[dataset_name]["agora_rename"]
+                    )
+
+            final_format = dataset_obj[dataset_name]["final_format"]
+            with recorder.stage("serialize"):
+                if isinstance(df, dict):
+                    json_path = load.dict_to_json(
+                        df=df,
+                        staging_path=staging_path,
+                        filename=dataset_name + "." + final_format,
+                        final_format=final_format,
+                    )
+                else:
+                    json_path = load.df_to_json(
+                        df=df,
+                        staging_path=staging_path,
+                        filename=dataset_name + "." + final_format,
+                        final_format=final_format,
+                    )
+
+        gx_enabled = dataset_obj[dataset_name].get("gx_enabled", False)
+
+        if gx_enabled:
+            gx_runner = GreatExpectationsRunner(
+                syn=syn,
+                dataset_path=json_path,
+                dataset_name=dataset_name,
+                upload_folder=gx_folder if upload else None,
+                nested_columns=(
+                    dataset_obj[dataset_name]["gx_nested_columns"]
+                    if "gx_nested_columns" in dataset_obj[dataset_name].keys()
+                    else None
+                ),
+                gx_context=gx_context,
+                df=df if gx_in_memory and isinstance(df, DataFrame) else None,
+                fidelity_check=gx_fidelity_check,
+                validation_policy=(
+                    "full"
+                    if gx_full_validation
+                    else dataset_obj[dataset_name].get("gx_validation_policy", "full")
+                ),
+                sample_size=dataset_obj[dataset_name].get(
+                    "gx_sample_size", DEFAULT_SAMPLE_SIZE
+                ),
+                sample_seed=dataset_obj[dataset_name].get(
+                    "gx_sample_seed", DEFAULT_SAMPLE_SEED
                 ),
             )
-        return dataset_report
+            with recorder.stage("gx"):
+                gx_runner.run()
 
-    else:
-        if upload:
-            file_id, file_version = load.load(
-                file_path=json_path,
-                provenance=dataset_obj[dataset_name]["provenance"],
-                destination=dataset_obj[dataset_name]["destination"],
-                syn=syn,
+            dataset_report.set_attributes(
+                gx_report_file=gx_runner.report_file,
+                gx_report_version=gx_runner.report_version,
+                gx_report_link=DatasetReport.format_link(
+                    syn_id=gx_runner.report_file, version=gx_runner.report_version
+                ),
+                gx_failures=gx_runner.failures,
+                gx_failure_message=gx_runner.failure_message,
+                gx_warnings=gx_runner.warnings,
+                gx_warning_message=gx_runner.warning_message,
             )
-        return None
+
+        def upload_dataset() -> None:
+            with recorder.stage("upload"):
+                file_id, file_version = load.load(
+                    file_path=json_path,
+                    provenance=dataset_obj[dataset_name]["provenance"],
+                    destination=dataset_obj[dataset_name]["destination"],
+                    syn=syn,
+                )
+            gx_outputs = {}
+            if gx_enabled:
+                dataset_report.set_attributes(
+                    adt_output_file=file_id,
+                    adt_output_version=file_version,
+                    adt_output_link=DatasetReport.format_link(
+                        syn_id=file_id, version=file_version
+                    ),
+                )
+                gx_outputs = dict(
+                    gx_report_file=gx_runner.report_file,
+                    gx_report_version=gx_runner.report_version,
+                    gx_warnings=gx_runner.warnings,
+                    gx_warning_message=gx_runner.warning_message,
+                )
+            if run_manifest is not None:
+                run_manifest.record(
+                    dataset_name=dataset_name,
+                    fingerprint=fingerprint,
+                    adt_output_file=file_id,
+                    adt_output_version=file_version,
+                    **gx_outputs,
+                )
+
+        if upload and not (gx_enabled and gx_runner.failures):
+            if upload_queue is not None:
+                # the report is completed by the upload, process_all_files waits for it before reporting
+                upload_queue.submit(name=dataset_name, upload_func=upload_dataset)
+            else:
+                upload_dataset()
+
+        logger.info("Stage metrics for %s dataset: %s", dataset_name, recorder.format())
+        if not gx_enabled:
+            return None
+
+        return dataset_report
+    finally:
+        # a dataset that fails gives up the source files it has not taken yet
+        release_dataset_inputs(dataset_name=dataset_name, entity_cache=entity_cache)
 
 
 def create_data_manifest(
-    syn: synapseclient.Synapse, parent: synapseclient.Folder = None
+    syn: "synapseclient.Synapse", parent: "synapseclient.Folder" = None
 ) -> Union[DataFrame, None]:
     """Creates data manifest (dataframe) that has the IDs and version numbers of child synapse folders
 
@@ -218,13 +592,16 @@ def create_data_manifest(
 
 @log_time(func_name="process_all_files", logger=logger)
 def process_all_files(
-    syn: synapseclient.Synapse,
+    syn: "synapseclient.Synapse",
     config_path: str = None,
     platform: Platform = Platform.LOCAL,
     run_id: str = None,
     upload: bool = True,
+    workers: int = 1,
 ):
     """This function will read through the entire configuration and process each file listed.
+    Datasets are processed by a pool of `workers` threads; a dataset that lists other datasets
+    in its `depends_on` key is only processed once those have been processed successfully.
 
     Args:
         syn (synapseclient.Session): Synapse client session
@@ -232,6 +609,7 @@ def process_all_files(
         platform (Platform, optional): Platform where the process is being run. One of LOCAL, GITHUB, NEXTFLOW. Defaults to LOCAL.
         run_id (str, optional): Unique identifier for the processing run. Defaults to None.
         upload (bool, optional): Whether or not to upload the data to Synapse. Defaults to True.
+        workers (int, optional): Number of datasets to process at the same time. Defaults to 1.
     """
     if platform == Platform.LOCAL and upload is True:
         logger.warning(
@@ -244,6 +622,10 @@ def process_all_files(
     datasets = config["datasets"]
     destination = config["destination"]
     gx_table = config["gx_table"]
+    # fail before processing any dataset if a transformation is missing input files or parameters
+    transform_errors = get_transform_config_errors(datasets=datasets)
+    if transform_errors:
+        raise ValueError("\n".join(transform_errors))
 
     staging_path = config.get("staging_path", None)
     load.create_temp_location(staging_path=staging_path or "./staging")
@@ -255,22 +637,91 @@ def process_all_files(
         table_id=gx_table,
     )
 
-    error_list = []
-    for dataset in datasets:
-        try:
-            dataset_report = process_dataset(
+    entity_cache = extract.EntityCache(
+        datasets=datasets, cache_path=config.get("cache_path", None)
+    )
+    # created lazily, the first time a dataset is validated
+    gx_context = GreatExpectationsContext()
+    run_manifest_path = config.get("run_manifest_path", None)
+    run_manifest = (
+        RunManifest(manifest_path=run_manifest_path) if run_manifest_path else None
+    )
+    prefetcher = extract.EntityPrefetcher(
+        syn=syn, max_workers=config.get("download_workers", 4)
+    )
+    upload_workers = config.get("upload_workers", 0)
+    upload_queue = (
+        load.UploadQueue(max_workers=upload_workers)
+        if upload and upload_workers > 0
+        else None
+    )
+    run_metrics = RunMetrics()
+    upload_errors = {}
+    try:
+        results = schedule_datasets(
+            datasets=datasets,
+            process_func=lambda dataset: process_dataset(
                 dataset_obj=dataset,
                 staging_path=staging_path,
                 gx_folder=config["gx_folder"],
                 syn=syn,
                 upload=upload,
+                entity_cache=entity_cache,
+                gx_context=gx_context,
+                gx_in_memory=config.get("gx_in_memory", False),
+                gx_fidelity_check=config.get("gx_fidelity_check", False),
+                gx_full_validation=config.get("gx_full_validation", False),
+                run_manifest=run_manifest,
+                prefetcher=prefetcher,
+                upload_queue=upload_queue,
+                run_metrics=run_metrics,
+            ),
+            workers=workers,
+            skip_func=lambda dataset: release_dataset_inputs(
+                dataset_name=get_dataset_name(dataset),
+                entity_cache=entity_cache,
+            ),
+        )
+    finally:
+        prefetcher.shutdown()
+        if upload_queue is not None:
+            upload_errors = upload_queue.wait()
+
+    if run_manifest is not None:
+        # datasets that failed keep the entry of their last successful run
+        run_manifest.save()
+    # written once the uploads are complete, so that their stage is included. Failed runs are recorded too.
+    metrics_path = os.path.join(
+        staging_path or "./staging",
+        f"stage_metrics_{run_id or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}.json",
+    )
+    run_metrics.write(path=metrics_path)
+    if upload and config["gx_folder"]:
+        # uploaded next to the GX reports rather than to the destination, which is listed in the data manifest
+        try:
+            load.load(
+                file_path=metrics_path,
+                provenance=[],
+                destination=config["gx_folder"],
+                syn=syn,
             )
+        except Exception as e:
+            logger.warning(f"Could not upload the stage metrics of the run: {e}")
+
+    error_list = []
+    for dataset, (dataset_report, error) in zip(datasets, results):
+        try:
+            error = error or upload_errors.get(get_dataset_name(dataset))
+            if error:
+                raise error
             if dataset_report:
                 reporter.add_report(dataset_report)
                 if dataset_report.gx_failures:
                     raise ADTDataValidationError(dataset_report.gx_failure_message)
         except Exception as e:
-            error_list.append(f"{list(dataset.keys())[0]}: " + str(e).replace("\n", ""))
+            error_list.append(
+                f"{get_dataset_name(dataset)}: " + str(e).replace("\n", "")
+            )
 
     if error_list:
         reporter.update_table()
@@ -330,6 +781,14 @@ upload_opt = Option(
     "`--upload` in the command will cause both to be uploaded. (Optional, defaults to False)",
     show_default=True,
 )
+workers_opt = Option(
+    1,
+    "--workers",
+    "-w",
+    help="Number of datasets to process at the same time. Datasets that declare `depends_on` in the configuration "
+    "file wait for the datasets they depend on. (Optional, defaults to 1)",
+    show_default=True,
+)
 synapse_auth_opt = Option(
     None,
     "--token",
@@ -347,6 +806,7 @@ def process(
     run_id: str = run_id_opt,
     upload: bool = upload_opt,
     auth_token: str = synapse_auth_opt,
+    workers: int = workers_opt,
 ):
     syn = utils._login_to_synapse(token=auth_token)
     platform_enum = Platform(platform)
@@ -356,6 +816,7 @@ def process(
         platform=platform_enum,
         run_id=run_id,
         upload=upload,
+        workers=workers,
     )
 
 
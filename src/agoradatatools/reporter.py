@@ -1,8 +1,9 @@
 import datetime
 from dataclasses import dataclass, field, asdict
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
-import synapseclient
+if TYPE_CHECKING:
+    import synapseclient
 
 from agoradatatools.constants import Platform
 
@@ -60,7 +61,7 @@ class DatasetReport:
             setattr(self, key, value)
 
     @classmethod
-    def format_link(cls, syn_id: str, version: int) -> str:
+    def format_link(_cls, syn_id: str, version: int) -> str:
         """Generates a link to a specific version of a synapse entity
 
         Args:
@@ -91,7 +92,7 @@ class ADTGXReporter:
         reports: List of DatasetReport objects to be added to the table.
     """
 
-    syn: synapseclient.Synapse
+    syn: "synapseclient.Synapse"
     platform: Platform
     run_id: str
     table_id: str
@@ -124,6 +125,8 @@ class ADTGXReporter:
     def update_table(self) -> None:
         """Updates the Synapse table adding one new row for each DatasetReport object if the platform is not LOCAL."""
         if self.platform != Platform.LOCAL and self.reports:
+            import synapseclient
+
             self._update_reports_before_upload()
             self.syn.store(
                 synapseclient.Table(
@@ -0,0 +1,156 @@
+"""Dependency-aware scheduling of dataset processing."""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agoradatatools.errors import ADTDataProcessingError
+
+logger = logging.getLogger(__name__)
+
+
+def get_dataset_name(dataset_obj: dict) -> str:
+    """Returns the name of a dataset defined in the configuration file
+
+    Args:
+        dataset_obj (dict): A dataset defined in the configuration file
+
+    Returns:
+        str: Name of the dataset
+    """
+    return list(dataset_obj.keys())[0]
+
+
+def get_dataset_dependencies(datasets: List[dict]) -> Dict[str, List[str]]:
+    """Builds the dependency graph of the datasets in a configuration file. A dataset depends on
+    every dataset listed in its optional `depends_on` key.
+
+    Args:
+        datasets (List[dict]): List of datasets defined in the configuration file
+
+    Raises:
+        ValueError: If a dataset depends on a dataset that is not in the configuration,
+        or if the dependencies contain a cycle.
+
+    Returns:
+        Dict[str, List[str]]: Mapping of each dataset name to the names of the datasets it depends on
+    """
+    dependencies = {}
+    for dataset in datasets:
+        dataset_name = get_dataset_name(dataset)
+        dataset_config = dataset[dataset_name]
+        depends_on = (
+            dataset_config.get("depends_on", [])
+            if isinstance(dataset_config, dict)
+            else []
+        )
+        dependencies[dataset_name] = list(depends_on)
+
+    for dataset_name, depends_on in dependencies.items():
+        unknown = [name for name in depends_on if name not in dependencies]
+        if unknown:
+            raise ValueError(
+                f"Dataset {dataset_name} depends on datasets that are not in the configuration: "
+                + ", ".join(unknown)
+            )
+
+    # depth-first search for cycles
+    visiting, visited = set(), set()
+
+    def visit(dataset_name: str, path: List[str]):
+        if dataset_name in visited:
+            return
+        if dataset_name in visiting:
+            raise ValueError(
+                "Dataset dependencies contain a cycle: "
+                + " -> ".join(path + [dataset_name])
+            )
+        visiting.add(dataset_name)
+        for dependency in dependencies[dataset_name]:
+            visit(dependency, path + [dataset_name])
+        visiting.remove(dataset_name)
+        visited.add(dataset_name)
+
+    for dataset_name in dependencies:
+        visit(dataset_name, [])
+
+    return dependencies
+
+
+def schedule_datasets(
+    datasets: List[dict],
+    process_func: Callable[[dict], Any],
+    workers: int = 1,
+    skip_func: Optional[Callable[[dict], None]] = None,
+) -> List[Tuple[Any, Optional[Exception]]]:
+    """Runs `process_func` on every dataset using a pool of worker threads. A dataset is only
+    started once all of the datasets it depends on have finished successfully; if one of them fails,
+    the dataset is not processed and fails as well. Datasets that are ready at the same time are
+    started in the order they appear in the configuration, so a single worker processes the datasets
+    one after another exactly in configuration order.
+
+    Args:
+        datasets (List[dict]): List of datasets defined in the configuration file
+        process_func (Callable[[dict], Any]): Function called with each dataset object
+        workers (int, optional): Maximum number of datasets processed at the same time. Defaults to 1.
+        skip_func (Optional[Callable[[dict], None]], optional): Function called with each dataset that is not
+            processed because one of its dependencies failed. Defaults to None.
+
+    Raises:
+        ValueError: If `workers` is smaller than 1 or the dataset dependencies are invalid.
+
+    Returns:
+        List[Tuple[Any, Optional[Exception]]]: One `(result, error)` tuple per dataset, in configuration order.
+            `error` is None if the dataset was processed successfully.
+    """
+    if workers < 1:
+        raise ValueError("The number of workers must be at least 1.")
+
+    dependencies = get_dataset_dependencies(datasets)
+    names = [get_dataset_name(dataset) for dataset in datasets]
+
+    results: Dict[str, Tuple[Any, Optional[Exception]]] = {}
+    pending = list(range(len(datasets)))
+    running: Dict[Future, int] = {}
+    completed: Dict[int, Tuple[Any, Optional[Exception]]] = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            for index in list(pending):
+                if len(running) >= workers:
+                    break
+                depends_on = dependencies[names[index]]
+                if any(dep not in results for dep in depends_on):
+                    continue
+                pending.remove(index)
+                failed = [dep for dep in depends_on if results[dep][1] is not None]
+                if failed:
+                    completed[index] = (
+                        None,
+                        ADTDataProcessingError(
+                            "Dataset was not processed because the following dependencies failed: "
+                            + ", ".join(failed)
+                        ),
+                    )
+                    results[names[index]] = completed[index]
+                    if skip_func is not None:
+                        skip_func(datasets[index])
+                    continue
+                future = executor.submit(process_func, datasets[index])
+                running[future] = index
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                error = future.exception()
+                if error is not None:
+                    logger.error("Processing failed for %s dataset", names[index])
+                    completed[index] = (None, error)
+                else:
+                    completed[index] = (future.result(), None)
+                results[names[index]] = completed[index]
+
+    return [completed[index] for index in range(len(datasets))]
@@ -1,5 +1,8 @@
+import gzip
+import io
 import json
 import os
+import threading
 from unittest import mock
 from unittest.mock import ANY, patch
 
@@ -73,33 +76,209 @@ class TestLoad:
         assert test_tuple == ("syn1111114", 1)
 
 
+class TestUploadQueue:
+    def test_uploads_run_in_the_background(self):
+        release = threading.Event()
+        uploaded = []
+
+        def upload(name):
+            release.wait(timeout=5)
+            uploaded.append(name)
+
+        upload_queue = load.UploadQueue(max_workers=2)
+        upload_queue.submit(name="a", upload_func=lambda: upload("a"))
+        upload_queue.submit(name="b", upload_func=lambda: upload("b"))
+        # submit does not wait for the uploads
+        assert uploaded == []
+        release.set()
+        assert upload_queue.wait() == {}
+        assert sorted(uploaded) == ["a", "b"]
+
+    def test_wait_returns_upload_errors(self):
+        error = ValueError("upload failed")
+
+        def fail():
+            raise error
+
+        upload_queue = load.UploadQueue(max_workers=1)
+        upload_queue.submit(name="a", upload_func=lambda: None)
+        upload_queue.submit(name="b", upload_func=fail)
+        assert upload_queue.wait() == {"b": error}
+
+    def test_names_must_be_unique(self):
+        upload_queue = load.UploadQueue(max_workers=1)
+        upload_queue.submit(name="a", upload_func=lambda: None)
+        with pytest.raises(ValueError, match="An upload named a is already queued"):
+            upload_queue.submit(name="a", upload_func=lambda: None)
+        upload_queue.wait()
+
+    def test_max_workers_must_be_positive(self):
+        with pytest.raises(ValueError, match="max_workers must be at least 1"):
+            load.UploadQueue(max_workers=0)
+
+
 class TestDFToJSON:
-    def setup_method(self):
-        self.patch_replace = patch.object(
-            pd.DataFrame, "replace", return_value=pd.DataFrame()
-        ).start()
-        self.patch_to_dict = patch.object(
-            pd.DataFrame, "to_dict", return_value=dict()
-        ).start()
-        self.patch_json_dump = patch.object(json, "dump", return_value=None).start()
-        self.patch_NumpyEncoder = patch.object(load, "NumpyEncoder").start()
+    df = pd.DataFrame(
+        {
+            "a": [1, 2, 3, 4, 5],
+            "b": [1.5, np.nan, 0.00000003, 4.0, np.nan],
+            "c": ["x", None, np.nan, "y\nz", "\u00e9"],
+            "d": [
+                np.array(["a", "b"], dtype=object),
+                np.array([], dtype=object),
+                [{"e": 1, "f": None}],
+                {"g": [1, 2]},
+                None,
+            ],
+        }
+    )
 
-    def teardown_method(self):
-        mock.patch.stopall()
+    @staticmethod
+    def expected_json(df: pd.DataFrame) -> str:
+        """The output of the original, non-streaming implementation of df_to_json"""
+        return json.dumps(
+            df.replace({np.nan: None}).to_dict(orient="records"),
+            cls=load.NumpyEncoder,
+            indent=2,
+        )
 
-    def test_df_to_json_success(self):
+    @pytest.mark.parametrize("chunk_size", [1, 2, 5, 10000])
+    def test_df_to_json_success(self, tmp_path, chunk_size):
         json_name = load.df_to_json(
-            df=pd.DataFrame(), staging_path="./staging", filename="test.json"
+            df=self.df,
+            staging_path=str(tmp_path),
+            filename="test.json",
+            chunk_size=chunk_size,
         )
-        self.patch_replace.assert_called_once_with({np.nan: None})
-        self.patch_to_dict.assert_called_once_with(orient="records")
-        self.patch_json_dump.assert_called_once_with(
-            self.patch_to_dict.return_value,
-            ANY,  # without mocking open() I was unable to get anything equating to `temp_json` to go here, it was failing even when the 'Expected call' and the 'Actual call' appeared to match perfectly
-            cls=self.patch_NumpyEncoder,
-            indent=2,
+        assert json_name == os.path.join(str(tmp_path), "test.json")
+        with open(json_name) as f:
+            assert f.read() == self.expected_json(self.df)
+
+    def test_df_to_json_empty_data_frame(self, tmp_path):
+        json_name = load.df_to_json(
+            df=pd.DataFrame(columns=["a"]),
+            staging_path=str(tmp_path),
+            filename="test.json",
+        )
+        with open(json_name) as f:
+            assert f.read() == "[]"
+
+    @pytest.mark.parametrize("final_format", ["json", "min.json", "ndjson"])
+    def test_json_records_writer_appends_data_frames(self, final_format):
+        options = load.get_final_format(final_format)
+        expected = io.StringIO()
+        load.write_json_records(
+            df=self.df,
+            file=expected,
+            indent=options["indent"],
+            lines=options["lines"],
+        )
+
+        output = io.StringIO()
+        writer = load.JsonRecordsWriter(
+            file=output, indent=options["indent"], lines=options["lines"]
+        )
+        for start in range(0, len(self.df), 2):
+            writer.write(self.df.iloc[start : start + 2])
+        writer.write(self.df.iloc[:0])
+        writer.close()
+        assert writer.records_written == len(self.df)
+        assert output.getvalue() == expected.getvalue()
+
+    def test_df_to_json_does_not_modify_data_frame(self, tmp_path):
+        df = self.df.copy()
+        load.df_to_json(df=df, staging_path=str(tmp_path), filename="test.json")
+        assert df["b"].dtype == np.float64
+        assert df["c"][2] is np.nan
+
+
+class TestFinalFormats:
+    df = TestDFToJSON.df
+    records = json.loads(TestDFToJSON.expected_json(TestDFToJSON.df))
+
+    @staticmethod
+    def read(path: str) -> str:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return f.read()
+
+    def test_get_final_format_not_supported(self):
+        with pytest.raises(ValueError, match="Final format csv not supported"):
+            load.get_final_format("csv")
+
+    @pytest.mark.parametrize("final_format", ["min.json", "json.gz"])
+    @pytest.mark.parametrize("chunk_size", [1, 2, 10000])
+    def test_df_to_json_compact(self, tmp_path, final_format, chunk_size):
+        json_name = load.df_to_json(
+            df=self.df,
+            staging_path=str(tmp_path),
+            filename="test." + final_format,
+            chunk_size=chunk_size,
+            final_format=final_format,
+        )
+        assert json_name == os.path.join(str(tmp_path), "test." + final_format)
+        assert self.read(json_name) == json.dumps(self.records, separators=(",", ":"))
+
+    @pytest.mark.parametrize("final_format", ["ndjson", "ndjson.gz"])
+    def test_df_to_json_ndjson(self, tmp_path, final_format):
+        json_name = load.df_to_json(
+            df=self.df,
+            staging_path=str(tmp_path),
+            filename="test." + final_format,
+            chunk_size=2,
+            final_format=final_format,
         )
-        assert json_name == "./staging/test.json"
+        lines = self.read(json_name).splitlines()
+        assert [json.loads(line) for line in lines] == self.records
+
+    def test_df_to_json_ndjson_empty_data_frame(self, tmp_path):
+        json_name = load.df_to_json(
+            df=pd.DataFrame(),
+            staging_path=str(tmp_path),
+            filename="test.ndjson",
+            final_format="ndjson",
+        )
+        assert self.read(json_name) == ""
+
+    def test_df_to_json_gzip_output_is_reproducible(self, tmp_path):
+        contents = []
+        for _ in range(2):
+            json_name = load.df_to_json(
+                df=self.df,
+                staging_path=str(tmp_path),
+                filename="test.json.gz",
+                final_format="json.gz",
+            )
+            with open(json_name, "rb") as f:
+                contents.append(f.read())
+        assert contents[0] == contents[1]
+
+    @pytest.mark.parametrize("final_format", list(load.FINAL_FORMATS))
+    def test_df_to_json_can_be_read_by_pandas(self, tmp_path, final_format):
+        json_name = load.df_to_json(
+            df=self.df[["a", "b"]],
+            staging_path=str(tmp_path),
+            filename="test." + final_format,
+            final_format=final_format,
+        )
+        result = pd.read_json(json_name, lines=final_format.startswith("ndjson"))
+        pd.testing.assert_frame_equal(result, self.df[["a", "b"]])
+
+    @pytest.mark.parametrize(
+        "final_format, expected",
+        [
+            ("min.json", '[{"a":"b","c":{"d":"e"}}]'),
+            ("ndjson", '{"a":"b","c":{"d":"e"}}\n'),
+        ],
+    )
+    def test_dict_to_json(self, tmp_path, final_format, expected):
+        json_name = load.dict_to_json(
+            df={"a": "b", "c": {"d": "e", "f": None}},
+            staging_path=str(tmp_path),
+            filename="test." + final_format,
+            final_format=final_format,
+        )
+        assert self.read(json_name) == expected
 
 
 class TestDFToCSV:
@@ -123,27 +302,53 @@ class TestDFToCSV:
 
 
 class TestDictToJSON:
-    df_dict = {"a": "b", "c": {"d": "e"}}
+    df_dict = {"a": "b", "c": {"d": "e", "f": None}, "g": np.int64(1)}
 
-    def setup_method(self):
-        self.patch_remove_non_values = patch.object(
+    def test_dict_to_json_success(self, tmp_path):
+        json_name = load.dict_to_json(
+            df=self.df_dict, staging_path=str(tmp_path), filename="test.json"
+        )
+        assert json_name == os.path.join(str(tmp_path), "test.json")
+        with open(json_name) as f:
+            assert f.read() == json.dumps(
+                [{"a": "b", "c": {"d": "e"}, "g": 1}], indent=2
+            )
+
+    def test_dict_to_json_calls_remove_non_values(self, tmp_path):
+        with patch.object(
             load, "remove_non_values", return_value=dict()
-        ).start()
-        self.patch_json_dump = patch.object(json, "dump", return_value=None).start()
-        self.patch_NumpyEncoder = patch.object(load, "NumpyEncoder").start()
+        ) as patch_remove_non_values:
+            load.dict_to_json(
+                df=self.df_dict, staging_path=str(tmp_path), filename="test.json"
+            )
+            patch_remove_non_values.assert_called_once_with({"d": "e", "f": None})
 
-    def teardown_method(self):
-        mock.patch.stopall()
 
-    def test_dict_to_json_success(self):
-        json_name = load.dict_to_json(
-            df=self.df_dict, staging_path="./staging", filename="test.json"
-        )
-        self.patch_remove_non_values.assert_called_once_with({"d": "e"})
-        self.patch_json_dump.assert_called_once_with(
-            [{"a": "b", "c": {}}],
-            ANY,  # without mocking open() I was unable to get anything equating to `temp_json` to go here
-            cls=self.patch_NumpyEncoder,
-            indent=2,
+class TestGetJSONEncoder:
+    data = [
+        {
+            "int": np.int64(1),
+            "float": np.float64(0.00000003),
+            "float32": np.float32(0.1),
+            "array": np.array([1, 2, 3]),
+            "object_array": np.array(["a", "b"], dtype=object),
+            "empty_array": np.array([], dtype=object),
+            "none": None,
+            "nested": [{"a": np.int32(2), "b": [np.float64(1.5)]}],
+            "text": "caf\u00e9",
+        }
+    ]
+
+    def test_default_output(self):
+        encode = load.get_json_encoder()
+        assert encode(self.data) == json.dumps(
+            self.data, cls=load.NumpyEncoder, indent=2
         )
-        assert json_name == "./staging/test.json"
+
+    def test_compact_output(self):
+        encode = load.get_json_encoder(indent=None)
+        assert encode([{"a": 1, "b": [1, 2]}]) == '[{"a":1,"b":[1,2]}]'
+
+    def test_unsupported_indent(self):
+        with pytest.raises(ValueError, match="indented by 2 spaces or compact"):
+            load.get_json_encoder(indent=4)
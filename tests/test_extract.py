@@ -1,10 +1,15 @@
-from unittest.mock import patch
+import glob
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
 
+import numpy as np
 import pandas as pd
 import pytest
 import synapseclient
 
-from agoradatatools.etl import extract
+from agoradatatools.etl import extract, load, utils
 
 
 class MockAsDF:
@@ -42,6 +47,294 @@ def test_read_tsv_into_df():
         assert isinstance(df, pd.DataFrame)
 
 
+class TestReadOptions:
+    df = pd.DataFrame(
+        {
+            "Gene ID": ["ENSG1", "ENSG2", "ENSG3"],
+            "Tissue": ["DLPFC", "CBE", "DLPFC"],
+            "logFC": [0.1 + 0.2, -1.5, 2.25],
+            "Unused": [1, 2, 3],
+        }
+    )
+    columns = ["gene_id", "tissue", "logfc"]
+    dtypes = {"tissue": "category"}
+
+    def expected(self) -> pd.DataFrame:
+        return self.df[["Gene ID", "Tissue", "logFC"]].astype({"Tissue": "category"})
+
+    def test_get_read_options(self):
+        assert extract.get_read_options({"id": "syn1", "format": "csv"}) is None
+        assert extract.get_read_options(
+            {"id": "syn1", "format": "csv", "columns": ["a"], "dtypes": {}}
+        ) == {"columns": ["a"]}
+
+    def test_resolve_read_options(self):
+        assert extract.resolve_read_options(
+            file_columns=list(self.df.columns),
+            columns=self.columns,
+            dtypes=self.dtypes,
+        ) == {
+            "usecols": ["Gene ID", "Tissue", "logFC"],
+            "dtype": {"Tissue": "category"},
+        }
+        assert extract.resolve_read_options(file_columns=list(self.df.columns)) == {}
+
+    def test_resolve_read_options_missing_column(self):
+        with pytest.raises(
+            ValueError, match="Columns not found in the source file: sex, age"
+        ):
+            extract.resolve_read_options(
+                file_columns=list(self.df.columns),
+                columns=["gene_id", "sex"],
+                dtypes={"sex": "category", "age": "float64"},
+            )
+
+    def test_read_csv_into_df(self, tmp_path):
+        path = str(tmp_path / "file.csv")
+        self.df.to_csv(path, index=False)
+        df = extract.read_csv_into_df(
+            csv_path=path, columns=self.columns, dtypes=self.dtypes
+        )
+        pd.testing.assert_frame_equal(df, self.expected())
+
+    def test_read_tsv_into_df(self, tmp_path):
+        path = str(tmp_path / "file.tsv")
+        self.df.to_csv(path, index=False, sep="\t")
+        df = extract.read_tsv_into_df(
+            tsv_path=path, columns=self.columns, dtypes=self.dtypes
+        )
+        pd.testing.assert_frame_equal(df, self.expected())
+
+    def test_read_feather_into_df(self, tmp_path):
+        path = str(tmp_path / "file.feather")
+        self.df.to_feather(path)
+        df = extract.read_feather_into_df(
+            feather_path=path, columns=self.columns, dtypes=self.dtypes
+        )
+        pd.testing.assert_frame_equal(df, self.expected())
+
+    def test_select_columns(self):
+        pd.testing.assert_frame_equal(
+            extract.select_columns(
+                df=self.df, columns=self.columns, dtypes=self.dtypes
+            ),
+            self.expected(),
+        )
+        assert extract.select_columns(df=self.df) is self.df
+
+
+CSV_ASSETS = sorted(
+    glob.glob("./tests/test_assets/**/*.csv", recursive=True)
+    + glob.glob("./tests/test_assets/**/*.tsv", recursive=True)
+)
+
+
+class TestArrowEngine:
+    @staticmethod
+    def read(path: str, engine: str) -> pd.DataFrame:
+        if path.endswith(".tsv"):
+            return extract.read_tsv_into_df(tsv_path=path, engine=engine)
+        return extract.read_csv_into_df(csv_path=path, engine=engine)
+
+    @staticmethod
+    def to_json(df: pd.DataFrame, staging_path: str, filename: str) -> str:
+        df = utils.standardize_values(df=utils.standardize_column_names(df=df))
+        path = load.df_to_json(df=df, staging_path=staging_path, filename=filename)
+        with open(path) as json_file:
+            return json_file.read()
+
+    @pytest.mark.parametrize("path", CSV_ASSETS)
+    def test_csv_assets_give_the_same_json(self, tmp_path, path):
+        c_df = self.read(path=path, engine="c")
+        arrow_df = self.read(path=path, engine="arrow")
+        pd.testing.assert_frame_equal(c_df, arrow_df, check_exact=True)
+        assert arrow_df.applymap(type).equals(c_df.applymap(type))
+        assert self.to_json(
+            df=arrow_df, staging_path=str(tmp_path), filename="arrow.json"
+        ) == self.to_json(df=c_df, staging_path=str(tmp_path), filename="c.json")
+
+    @pytest.mark.parametrize(
+        "sep, extension, float_precision",
+        [(",", "csv", "round_trip"), ("\t", "tsv", None)],
+    )
+    def test_floats_are_parsed_like_the_c_parser(
+        self, tmp_path, sep, extension, float_precision
+    ):
+        rng = np.random.default_rng(0)
+        floats = np.concatenate(
+            [
+                rng.random(5000) * 10.0 ** rng.integers(-300, 300, 5000),
+                rng.standard_normal(5000),
+                [0.1 + 0.2, 5e-324, 1.7976931348623157e308, -0.0, 1e-7, 123456789.125],
+            ]
+        )
+        path = str(tmp_path / f"floats.{extension}")
+        with open(path, "w") as file:
+            file.write("x" + sep + "y\n")
+            file.writelines(f"{value!r}{sep}{-value!r}\n" for value in floats)
+
+        arrow_df = self.read(path=path, engine="arrow")
+        c_df = pd.read_csv(path, sep=sep, float_precision=float_precision)
+        pd.testing.assert_frame_equal(arrow_df, c_df, check_exact=True)
+        if float_precision == "round_trip":
+            np.testing.assert_array_equal(arrow_df["x"].to_numpy(), floats)
+        assert self.to_json(
+            df=arrow_df, staging_path=str(tmp_path), filename="arrow.json"
+        ) == self.to_json(df=c_df, staging_path=str(tmp_path), filename="c.json")
+
+    def test_values_are_parsed_like_the_c_parser(self, tmp_path):
+        path = str(tmp_path / "values.csv")
+        with open(path, "w") as file:
+            file.write(
+                ",a,a,empty,flag,count,text,date\n"
+                "0,1,x,,True,1,n/a,2021-01-01\n"
+                "3,1,x,,,1,n/a,2021-01-01\n"
+                '1,NA,y,,false,,"quoted, text",2021-02-01\n'
+                "2,3.5,NULL,,TRUE,3,None,\n"
+            )
+        arrow_df = self.read(path=path, engine="arrow")
+        c_df = self.read(path=path, engine="c")
+        pd.testing.assert_frame_equal(arrow_df, c_df, check_exact=True)
+        # the same kind of missing values
+        assert arrow_df.applymap(type).equals(c_df.applymap(type))
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            # integers that overflow int64 and uint64
+            "a,b\n99999999999999999999,1\n2,3\n",
+            "a,b\n18446744073709551615,1\n2,3\n",
+            "a,b\n99999999999999999999,1\nNA,3\n",
+            # hexadecimal integers
+            "a,b\n0x1A,1\n0x2,3\n",
+            # no rows
+            "a,b\n",
+            # floats that overflow to infinity, and infinity
+            "a,b\n1e400,1\n2.5,3\n",
+            "a,b\ninf,1\n-Infinity,3\n",
+            # integers with a sign or spaces, with and without missing values
+            "a,b\n+1,1\n2,3\n",
+            "a,b\n+1,1\n,3\n",
+            "a,b\n 1,1\n2 ,3\n",
+            "a,b\n-0.0,1\n.5,3\n",
+            "a,b\n0.12345678901234567890,1\n1.7976931348623157e308,3\n",
+        ],
+    )
+    @pytest.mark.parametrize("sep, extension", [(",", "csv"), ("\t", "tsv")])
+    def test_numbers_are_read_like_the_c_parser(
+        self, tmp_path, content, sep, extension
+    ):
+        path = str(tmp_path / f"numbers.{extension}")
+        with open(path, "w") as file:
+            file.write(content.replace(",", sep))
+        arrow_df = self.read(path=path, engine="arrow")
+        c_df = self.read(path=path, engine="c")
+        pd.testing.assert_frame_equal(arrow_df, c_df, check_exact=True)
+        assert arrow_df.applymap(type).equals(c_df.applymap(type))
+
+    @pytest.mark.parametrize(
+        "dtype", ["category", "str", "object", "string", "float64"]
+    )
+    def test_dtypes_are_read_like_the_c_parser(self, tmp_path, dtype):
+        path = str(tmp_path / "dtypes.tsv")
+        with open(path, "w") as file:
+            file.write("Code\tValue\n007\t0.1\nNA\t0.12345678901234567890\n0x1A\t3\n")
+        dtypes = {"code": dtype if dtype != "float64" else "str", "value": dtype}
+        arrow_df = extract.read_tsv_into_df(
+            tsv_path=path, dtypes=dtypes, engine="arrow"
+        )
+        c_df = extract.read_tsv_into_df(tsv_path=path, dtypes=dtypes, engine="c")
+        pd.testing.assert_frame_equal(arrow_df, c_df, check_exact=True)
+        assert arrow_df.applymap(type).equals(c_df.applymap(type))
+
+    def test_columns_and_dtypes(self, tmp_path):
+        path = str(tmp_path / "file.csv")
+        pd.DataFrame(
+            {"Tissue": ["CBE", "DLPFC"], "logFC": [0.5, 1.5], "Unused": [1, 2]}
+        ).to_csv(path, index=False)
+        df = extract.read_csv_into_df(
+            csv_path=path,
+            columns=["logfc", "tissue"],
+            dtypes={"tissue": "category"},
+            engine="arrow",
+        )
+        pd.testing.assert_frame_equal(
+            df,
+            pd.DataFrame(
+                {"Tissue": pd.Categorical(["CBE", "DLPFC"]), "logFC": [0.5, 1.5]}
+            ),
+        )
+
+    def test_falls_back_to_the_c_parser(self, tmp_path):
+        # the C parser uses the first column as the index when the header is short
+        path = str(tmp_path / "short_header.csv")
+        with open(path, "w") as file:
+            file.write("a,b\n1,2,3\n4,5,6\n")
+        assert extract.read_delimited_with_arrow(path=path, sep=",") is None
+        pd.testing.assert_frame_equal(
+            self.read(path=path, engine="arrow"), self.read(path=path, engine="c")
+        )
+
+    def test_unsupported_engine(self):
+        with pytest.raises(ValueError, match="CSV engine python not supported"):
+            extract.read_csv_into_df(
+                csv_path="./tests/test_assets/test_file.csv", engine="python"
+            )
+
+
+class TestReadDelimitedInChunks:
+    @pytest.mark.parametrize("source, sep", [("csv", ","), ("tsv", "\t")])
+    def test_chunks_add_up_to_the_file(self, tmp_path, source, sep):
+        path = str(tmp_path / f"test_file.{source}")
+        pd.DataFrame({"Gene": ["a", "b", "c", "d", "e"], "logFC": range(5)}).to_csv(
+            path, sep=sep, index=False
+        )
+        chunks = list(
+            extract.read_delimited_in_chunks(path=path, source=source, chunk_size=2)
+        )
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks), pd.read_csv(path, sep=sep), check_exact=True
+        )
+
+    def test_columns_and_dtypes(self, tmp_path):
+        path = str(tmp_path / "test_file.csv")
+        pd.DataFrame(
+            {"Gene": ["a", "b", "c"], "logFC": [0.5, 1.5, 2.5], "Tissue": ["x"] * 3}
+        ).to_csv(path, index=False)
+        chunks = list(
+            extract.read_delimited_in_chunks(
+                path=path,
+                source="csv",
+                chunk_size=2,
+                columns=["logfc", "tissue"],
+                dtypes={"tissue": "category"},
+            )
+        )
+        assert list(chunks[0].columns) == ["logFC", "Tissue"]
+        assert chunks[1]["Tissue"].dtype == "category"
+
+    def test_unsupported_source(self):
+        with pytest.raises(ValueError, match="Only csv and tsv files"):
+            next(
+                extract.read_delimited_in_chunks(
+                    path="./tests/test_assets/test_file.feather",
+                    source="feather",
+                    chunk_size=2,
+                )
+            )
+
+    def test_source_does_not_match_the_extension(self):
+        with pytest.raises(ValueError, match="Please make sure *"):
+            next(
+                extract.read_delimited_in_chunks(
+                    path="./tests/test_assets/test_file.csv",
+                    source="tsv",
+                    chunk_size=2,
+                )
+            )
+
+
 def test_read_table_into_df(syn):
     mock_df = MockAsDF()
     with patch.object(syn, "tableQuery", return_value=mock_df) as patch_syn_tablequery:
@@ -100,7 +393,9 @@ def test_get_entity_as_df_with_version(syn, syn_id, version):
     ) as patch_read_csv_into_df:
         extract.get_entity_as_df(syn_id=syn_id, source="csv", syn=syn)
         patch_syn_get.assert_called_once_with(syn_id.split(".")[0], version=version)
-        patch_read_csv_into_df.assert_called_once_with(csv_path="fake/path.csv")
+        patch_read_csv_into_df.assert_called_once_with(
+            csv_path="fake/path.csv", columns=None, dtypes=None, engine="c"
+        )
 
 
 # test raise if  is not supported
@@ -127,3 +422,341 @@ def test_get_entity_as_df_supported_formats(syn, source, callable):
         df = extract.get_entity_as_df(syn_id="syn1111111", source=source, syn=syn)
         patch_source_to_df.assert_called_once()
         assert isinstance(df, pd.DataFrame)
+
+
+def test_get_entity_as_df_with_prefetcher(syn):
+    entity = synapseclient.File("fake/path.csv", parent="syn1111111")
+    prefetcher = Mock(spec=extract.EntityPrefetcher)
+    prefetcher.get.return_value = entity
+    with patch.object(syn, "get") as patch_syn_get, patch.object(
+        extract, "read_csv_into_df", return_value=pd.DataFrame()
+    ) as patch_read_csv_into_df:
+        extract.get_entity_as_df(
+            syn_id="syn1111111.2", source="csv", syn=syn, prefetcher=prefetcher
+        )
+        prefetcher.get.assert_called_once_with("syn1111111.2")
+        patch_syn_get.assert_not_called()
+        patch_read_csv_into_df.assert_called_once_with(
+            csv_path="fake/path.csv", columns=None, dtypes=None, engine="c"
+        )
+
+
+class FakeSynapse:
+    """Local stand-in for the Synapse client that takes some time to download each entity
+    and records how many downloads run at the same time"""
+
+    def __init__(self, delay: float = 0.05, fail_ids: tuple = ()):
+        self.delay = delay
+        self.fail_ids = fail_ids
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get(self, synapse_id, version=None):
+        with self._lock:
+            self.calls.append((synapse_id, version))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if synapse_id in self.fail_ids:
+                raise synapseclient.core.exceptions.SynapseHTTPError("not found")
+            return synapseclient.File(f"{synapse_id}.{version}.csv", parent="syn1")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class TestEntityPrefetcher:
+    @pytest.mark.parametrize(
+        "syn_id, expected",
+        [("syn1", ("syn1", None)), ("syn1.2", ("syn1", "2"))],
+    )
+    def test_split_syn_id(self, syn_id, expected):
+        assert extract.EntityPrefetcher.split_syn_id(syn_id) == expected
+
+    def test_prefetch_downloads_concurrently_within_the_bound(self):
+        fake_syn = FakeSynapse()
+        prefetcher = extract.EntityPrefetcher(syn=fake_syn, max_workers=3)
+        syn_ids = [f"syn{i}.1" for i in range(9)]
+        try:
+            start = time.perf_counter()
+            prefetcher.prefetch(syn_ids=syn_ids + ["syn0.1"])
+            entities = [prefetcher.get(syn_id) for syn_id in syn_ids]
+            elapsed = time.perf_counter() - start
+        finally:
+            prefetcher.shutdown()
+
+        assert [entity.path for entity in entities] == [
+            f"syn{i}.1.csv" for i in range(9)
+        ]
+        # each entity is downloaded once, at most 3 at a time
+        assert sorted(fake_syn.calls) == sorted((f"syn{i}", "1") for i in range(9))
+        assert fake_syn.max_active == 3
+        assert elapsed < 9 * fake_syn.delay
+
+    def test_get_downloads_entities_that_were_not_prefetched(self):
+        fake_syn = FakeSynapse(delay=0)
+        prefetcher = extract.EntityPrefetcher(syn=fake_syn, max_workers=2)
+        try:
+            entity = prefetcher.get("syn5")
+        finally:
+            prefetcher.shutdown()
+        assert entity.path == "syn5.None.csv"
+        assert fake_syn.calls == [("syn5", None)]
+
+    def test_get_raises_download_errors(self):
+        fake_syn = FakeSynapse(delay=0, fail_ids=("syn2",))
+        prefetcher = extract.EntityPrefetcher(syn=fake_syn, max_workers=2)
+        try:
+            prefetcher.prefetch(syn_ids=["syn1.1", "syn2.1"])
+            prefetcher.get("syn1.1")
+            with pytest.raises(synapseclient.core.exceptions.SynapseHTTPError):
+                prefetcher.get("syn2.1")
+        finally:
+            prefetcher.shutdown()
+
+    def test_max_workers_must_be_positive(self):
+        with pytest.raises(ValueError, match="max_workers must be at least 1"):
+            extract.EntityPrefetcher(syn=FakeSynapse(), max_workers=0)
+
+
+class TestEntityCache:
+    datasets = [
+        {
+            "proteomics": {
+                "files": [{"name": "proteomics", "id": "syn1.1", "format": "csv"}]
+            }
+        },
+        {
+            "gene_info": {
+                "files": [
+                    {"name": "proteomics", "id": "syn1.1", "format": "csv"},
+                    {"name": "igap", "id": "syn2.1", "format": "csv"},
+                ]
+            }
+        },
+        {"no_files": 1},
+    ]
+
+    def test_entity_cache_counts_uses(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        assert cache.uses == {("syn1.1", "csv"): 2, ("syn2.1", "csv"): 1}
+
+    def test_get_or_load_loads_once_and_returns_copies(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+
+        first = cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        first.loc[0, "a"] = 100
+        second = cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+
+        loader.assert_called_once()
+        assert second["a"].to_list() == [1, 2]
+        assert first is not second
+
+    def test_get_or_load_evicts_after_last_use(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        df = pd.DataFrame({"a": [1, 2]})
+        loader = Mock(return_value=df)
+
+        result = cache.get_or_load(syn_id="syn2.1", source="csv", loader=loader)
+
+        # a single use does not need a copy and is not kept in the cache
+        assert result is df
+        assert ("syn2.1", "csv") not in cache.uses
+        cache.get_or_load(syn_id="syn2.1", source="csv", loader=loader)
+        assert loader.call_count == 2
+
+    def test_get_or_load_key_includes_source(self):
+        cache = extract.EntityCache()
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        cache.get_or_load(syn_id="syn1.1", source="tsv", loader=loader)
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        assert loader.call_count == 2
+
+    def test_is_cached(self, tmp_path):
+        cache = extract.EntityCache(cache_path=str(tmp_path))
+        assert not cache.is_cached(syn_id="syn1.1", source="csv")
+        cache.get_or_load(
+            syn_id="syn1.1",
+            source="csv",
+            loader=Mock(return_value=pd.DataFrame({"a": [1, 2]})),
+        )
+        assert cache.is_cached(syn_id="syn1.1", source="csv")
+        cache.clear()
+        # still in the persistent cache
+        assert cache.is_cached(syn_id="syn1.1", source="csv")
+        assert not cache.is_cached(syn_id="syn1", source="csv")
+
+    def test_key_includes_read_options(self):
+        read_options = {"columns": ["a"]}
+        cache = extract.EntityCache(
+            datasets=[
+                {"a": {"files": [{"name": "a", "id": "syn1.1", "format": "csv"}]}},
+                {
+                    "b": {
+                        "files": [
+                            {
+                                "name": "a",
+                                "id": "syn1.1",
+                                "format": "csv",
+                                **read_options,
+                            }
+                        ]
+                    }
+                },
+            ]
+        )
+        assert cache.uses == {
+            ("syn1.1", "csv"): 1,
+            ("syn1.1", "csv", '{"columns": ["a"]}'): 1,
+        }
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        cache.get_or_load(
+            syn_id="syn1.1", source="csv", loader=loader, read_options=read_options
+        )
+        assert loader.call_count == 2
+
+    def test_release_evicts_after_last_use(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        cache.release(syn_id="syn1.1", source="csv")
+        assert ("syn1.1", "csv") not in cache.uses
+        assert not cache._frames
+
+    def test_release_dataset_gives_up_the_uses_it_has_not_taken(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(
+            syn_id="syn1.1", source="csv", loader=loader, dataset_name="proteomics"
+        )
+        assert ("syn1.1", "csv") in cache._frames
+        # gene_info fails before taking its files
+        cache.release_dataset(dataset_name="gene_info")
+        assert not cache.uses
+        assert not cache._frames
+        # releasing again, or after taking every use, changes nothing
+        cache.release_dataset(dataset_name="gene_info")
+        cache.release_dataset(dataset_name="proteomics")
+        assert not cache.uses
+
+    def test_a_dataset_only_gives_up_its_own_uses(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(
+            syn_id="syn1.1", source="csv", loader=loader, dataset_name="proteomics"
+        )
+        cache.release(syn_id="syn1.1", source="csv", dataset_name="proteomics")
+        assert cache.uses == {("syn1.1", "csv"): 1, ("syn2.1", "csv"): 1}
+        cache.get_or_load(
+            syn_id="syn1.1", source="csv", loader=loader, dataset_name="gene_info"
+        )
+        loader.assert_called_once()
+        assert not cache._frames
+
+    def test_clear(self):
+        cache = extract.EntityCache(datasets=self.datasets)
+        loader = Mock(return_value=pd.DataFrame({"a": [1, 2]}))
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        cache.clear()
+        assert not cache.uses
+        cache.get_or_load(syn_id="syn1.1", source="csv", loader=loader)
+        assert loader.call_count == 2
+
+
+class TestPersistentEntityCache:
+    df = pd.DataFrame(
+        {
+            "string_with_nan": ["a", np.nan, "c"],
+            "string_with_none": [None, "b", "c"],
+            "float": [1.5, np.nan, 0.1 + 0.2],
+            "int": [1, 2, 3],
+            "bool_with_nan": [True, np.nan, False],
+        }
+    )
+
+    def test_get_persistent_path(self, tmp_path):
+        cache = extract.EntityCache(cache_path=str(tmp_path))
+        assert cache.get_persistent_path(syn_id="syn1.2", source="csv") == str(
+            tmp_path / f"v{extract.ENTITY_CACHE_VERSION}" / "syn1.2.csv.feather"
+        )
+
+    def test_get_persistent_path_with_read_options(self, tmp_path):
+        cache = extract.EntityCache(cache_path=str(tmp_path))
+        path = cache.get_persistent_path(
+            syn_id="syn1.2", source="csv", read_options={"columns": ["a"]}
+        )
+        assert path != cache.get_persistent_path(syn_id="syn1.2", source="csv")
+        assert path != cache.get_persistent_path(
+            syn_id="syn1.2", source="csv", read_options={"columns": ["b"]}
+        )
+        assert os.path.basename(path).startswith("syn1.2.csv.")
+
+    def test_get_persistent_path_unversioned_entity(self, tmp_path):
+        cache = extract.EntityCache(cache_path=str(tmp_path))
+        assert cache.get_persistent_path(syn_id="syn1", source="csv") is None
+
+    def test_get_persistent_path_no_cache_path(self):
+        cache = extract.EntityCache()
+        assert cache.get_persistent_path(syn_id="syn1.2", source="csv") is None
+
+    def test_entity_is_read_from_persistent_cache_in_a_later_run(self, tmp_path):
+        loader = Mock(return_value=self.df.copy())
+        first_run = extract.EntityCache(cache_path=str(tmp_path))
+        first_run.get_or_load(syn_id="syn1.2", source="csv", loader=loader)
+        assert os.path.exists(
+            first_run.get_persistent_path(syn_id="syn1.2", source="csv")
+        )
+
+        second_run = extract.EntityCache(cache_path=str(tmp_path))
+        result = second_run.get_or_load(syn_id="syn1.2", source="csv", loader=loader)
+
+        loader.assert_called_once()
+        pd.testing.assert_frame_equal(result, self.df, check_exact=True)
+        assert result["string_with_nan"][1] is not None
+        assert result["string_with_none"][0] is None
+
+    def test_unversioned_entity_is_not_persisted(self, tmp_path):
+        loader = Mock(return_value=self.df.copy())
+        extract.EntityCache(cache_path=str(tmp_path)).get_or_load(
+            syn_id="syn1", source="csv", loader=loader
+        )
+        extract.EntityCache(cache_path=str(tmp_path)).get_or_load(
+            syn_id="syn1", source="csv", loader=loader
+        )
+        assert loader.call_count == 2
+        assert not os.listdir(tmp_path)
+
+    @pytest.mark.parametrize(
+        "left, right",
+        [
+            (
+                pd.DataFrame({"a": ["a", None]}),
+                pd.DataFrame({"a": ["a", np.nan]}),
+            ),
+            (
+                pd.DataFrame({"a": [True, 1]}, dtype=object),
+                pd.DataFrame({"a": [1, 1]}, dtype=object),
+            ),
+            (pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": [1.0, 2.0]})),
+            (pd.DataFrame({"a": [0.1 + 0.2]}), pd.DataFrame({"a": [0.3]})),
+        ],
+    )
+    def test_frames_are_identical_detects_changes(self, left, right):
+        assert not extract._frames_are_identical(left, right)
+        assert extract._frames_are_identical(left, left.copy())
+
+    def test_entity_that_changes_in_arrow_is_not_persisted(self, tmp_path):
+        mixed = pd.DataFrame({"a": [1, "b", 2.5]})
+        loader = Mock(return_value=mixed)
+        cache = extract.EntityCache(cache_path=str(tmp_path))
+        result = cache.get_or_load(syn_id="syn1.2", source="csv", loader=loader)
+        assert result.equals(mixed)
+        assert not os.path.exists(
+            cache.get_persistent_path(syn_id="syn1.2", source="csv")
+        )
@@ -4,6 +4,7 @@ import json
 from unittest import mock
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 
 from agoradatatools.reporter import DatasetReport
@@ -11,13 +12,18 @@ from agoradatatools.reporter import DatasetReport
 import pytest
 from great_expectations.checkpoint.types.checkpoint_result import CheckpointResult
 from great_expectations.checkpoint import Checkpoint
+from great_expectations.core import ExpectationConfiguration, ExpectationSuite
 from great_expectations.data_context import FileDataContext
 from great_expectations.data_context.types.resource_identifiers import (
     ValidationResultIdentifier,
 )
 from synapseclient import Activity, File
 
-from agoradatatools.gx import GreatExpectationsRunner
+from agoradatatools.gx import (
+    SAMPLE_COLUMN,
+    GreatExpectationsContext,
+    GreatExpectationsRunner,
+)
 
 
 class TestGreatExpectationsRunner:
@@ -155,6 +161,77 @@ class TestGreatExpectationsRunner:
         result = self.good_runner.convert_nested_columns_to_json(df, [])
         pd.testing.assert_frame_equal(result, df)
 
+    def test_that_convert_nested_columns_to_json_converts_numpy_types(self):
+        df = pd.DataFrame({"a": [[{"b": np.array(["c"]), "d": np.int64(1)}]]})
+        result = self.good_runner.convert_nested_columns_to_json(df, ["a"])
+        assert result["a"][0] == '[{"b": ["c"], "d": 1}]'
+
+    def test_that_convert_arrays_to_lists_converts_arrays_and_tuples(self):
+        df = pd.DataFrame(
+            {
+                "a": [np.array(["x", "y"]), ("z",), None, ["w"]],
+                "b": ["x", "y", "z", "w"],
+                "c": [1.0, 2.0, 3.0, 4.0],
+            }
+        )
+        result = self.good_runner.convert_arrays_to_lists(df)
+        assert list(result["a"]) == [["x", "y"], ["z"], None, ["w"]]
+        assert isinstance(result["a"][0], list)
+        pd.testing.assert_frame_equal(result[["b", "c"]], df[["b", "c"]])
+
+    def test_that_convert_arrays_to_lists_returns_the_data_frame_without_arrays(
+        self,
+    ):
+        df = pd.DataFrame({"a": [["x"], None], "b": [1, 2]})
+        assert self.good_runner.convert_arrays_to_lists(df) is df
+
+    def test_frames_match(self):
+        in_memory_df = pd.DataFrame(
+            {"a": ["x", np.nan], "b": [1, 2], "c": [[1], [2]]}, index=[3, 5]
+        )
+        file_df = pd.DataFrame({"a": ["x", None], "b": [1.0, 2.0], "c": [[1], [2]]})
+        assert self.good_runner.frames_match(in_memory_df, file_df) is True
+
+    def test_frames_match_returns_false_when_values_differ(self):
+        in_memory_df = pd.DataFrame({"a": ["111"]})
+        file_df = pd.DataFrame({"a": [111]})
+        assert self.good_runner.frames_match(in_memory_df, file_df) is False
+
+    def test_get_validation_df_reads_the_file_without_in_memory_data(self):
+        expected = pd.read_json(self.good_runner.dataset_path)
+        pd.testing.assert_frame_equal(self.good_runner.get_validation_df(), expected)
+
+    def test_get_validation_df_uses_the_in_memory_data(self):
+        df = pd.DataFrame({"a": [np.array([1, 2])], "b": [[{"c": 1}]]})
+        self.good_runner.df = df
+        self.good_runner.nested_columns = ["b"]
+        with patch.object(pd, "read_json") as patch_read_json:
+            result = self.good_runner.get_validation_df()
+            patch_read_json.assert_not_called()
+        assert result["a"][0] == [1, 2]
+        assert result["b"][0] == '[{"c": 1}]'
+
+    def test_get_validation_df_uses_the_in_memory_data_when_fidelity_check_passes(
+        self,
+    ):
+        df = pd.read_json(self.good_runner.dataset_path)
+        self.good_runner.df = df
+        self.good_runner.fidelity_check = True
+        with patch.object(
+            self.good_runner, "read_dataset_file", return_value=df.copy()
+        ) as patch_read_dataset_file:
+            result = self.good_runner.get_validation_df()
+            patch_read_dataset_file.assert_called_once_with(precise_float=True)
+        assert result is df
+
+    def test_get_validation_df_uses_the_file_when_fidelity_check_fails(self):
+        file_df = pd.DataFrame({"a": [111]})
+        self.good_runner.df = pd.DataFrame({"a": ["111"]})
+        self.good_runner.fidelity_check = True
+        with patch.object(self.good_runner, "read_dataset_file", return_value=file_df):
+            result = self.good_runner.get_validation_df()
+        assert result is file_df
+
     def test_generate_message_returns_formatted_strings_as_expected(self):
         result_dict = {
             "test_suite": {"test_column": ["expect_column_values_to_be_unique"]}
@@ -246,7 +323,7 @@ class TestGreatExpectationsRunner:
             self.good_runner.run()
             patch_check_if_expectation_suite_exists.assert_called_once()
             patch_read_json.assert_called_once_with(
-                self.good_runner.dataset_path,
+                self.good_runner.dataset_path, lines=False
             )
             patch_convert_nested_columns_to_json.assert_called_once()
             patch_checkpoint_run.assert_called_once()
@@ -281,7 +358,7 @@ class TestGreatExpectationsRunner:
             self.good_runner.run()
             patch_check_if_expectation_suite_exists.assert_called_once()
             patch_read_json.assert_called_once_with(
-                self.good_runner.dataset_path,
+                self.good_runner.dataset_path, lines=False
             )
             patch_convert_nested_columns_to_json.assert_not_called()
             patch_checkpoint_run.assert_called_once()
@@ -345,7 +422,9 @@ class TestGreatExpectationsRunner:
         ) as patch_set_warnings_and_failures:
             self.good_runner.run()
             patch_check_if_expectation_suite_exists.assert_called_once()
-            patch_read_json.assert_called_once_with(self.good_runner.dataset_path)
+            patch_read_json.assert_called_once_with(
+                self.good_runner.dataset_path, lines=False
+            )
             patch_convert_nested_columns_to_json.assert_not_called()
             patch_checkpoint_run.assert_called_once()
             patch_get_results_path.assert_called_once()
@@ -379,7 +458,9 @@ class TestGreatExpectationsRunner:
             self.good_runner.upload_folder = None
             self.good_runner.run()
             patch_check_if_expectation_suite_exists.assert_called_once()
-            patch_read_json.assert_called_once_with(self.good_runner.dataset_path)
+            patch_read_json.assert_called_once_with(
+                self.good_runner.dataset_path, lines=False
+            )
             patch_convert_nested_columns_to_json.assert_not_called()
             patch_checkpoint_run.assert_called_once()
             patch_get_results_path.assert_called_once()
@@ -387,3 +468,143 @@ class TestGreatExpectationsRunner:
             patch_set_warnings_and_failures.assert_called_once_with(
                 self.passed_checkpoint_result
             )
+
+    def test_that_an_unknown_validation_policy_raises_ValueError(self, syn):
+        with pytest.raises(ValueError, match="Unknown GX validation policy partial"):
+            GreatExpectationsRunner(
+                syn=syn,
+                dataset_path="./tests/test_assets/gx/metabolomics.json",
+                dataset_name="metabolomics",
+                validation_policy="partial",
+            )
+
+    def test_apply_validation_policy_full_changes_nothing(self):
+        gx_df = pd.DataFrame({"a": range(10)})
+        suite = ExpectationSuite(
+            expectation_suite_name="metabolomics",
+            expectations=[
+                ExpectationConfiguration(
+                    expectation_type="expect_column_values_to_have_list_length",
+                    kwargs={"column": "a", "list_length": 1},
+                )
+            ],
+        )
+        self.good_runner.sample_size = 2
+        result_df, result_suite = self.good_runner.apply_validation_policy(
+            gx_df=gx_df, expectation_suite=suite
+        )
+        assert result_df is gx_df
+        assert "row_condition" not in result_suite.expectations[0].kwargs
+
+    def test_apply_validation_policy_sampled(self):
+        gx_df = pd.DataFrame({"a": range(100)})
+        suite = ExpectationSuite(
+            expectation_suite_name="metabolomics",
+            expectations=[
+                ExpectationConfiguration(
+                    expectation_type="expect_column_values_to_not_be_null",
+                    kwargs={"column": "a"},
+                ),
+                ExpectationConfiguration(
+                    expectation_type="expect_column_values_to_match_json_schema",
+                    kwargs={"column": "a", "json_schema": {}},
+                ),
+                ExpectationConfiguration(
+                    expectation_type="expect_column_values_to_have_list_members",
+                    kwargs={
+                        "column": "a",
+                        "list_members": [1],
+                        "row_condition": "a > 5",
+                        "condition_parser": "pandas",
+                    },
+                ),
+            ],
+        )
+        self.good_runner.validation_policy = "sampled"
+        self.good_runner.sample_size = 10
+        result_df, result_suite = self.good_runner.apply_validation_policy(
+            gx_df=gx_df, expectation_suite=suite
+        )
+        assert SAMPLE_COLUMN not in gx_df.columns
+        assert result_df[SAMPLE_COLUMN].sum() == 10
+        assert "row_condition" not in result_suite.expectations[0].kwargs
+        assert result_suite.expectations[1].kwargs["row_condition"] == (
+            f"{SAMPLE_COLUMN} == True"
+        )
+        assert result_suite.expectations[1].kwargs["condition_parser"] == "pandas"
+        assert result_suite.expectations[2].kwargs["row_condition"] == (
+            f"(a > 5) and {SAMPLE_COLUMN} == True"
+        )
+
+        # the same seed selects the same rows
+        same_df, _ = self.good_runner.apply_validation_policy(
+            gx_df=gx_df, expectation_suite=suite
+        )
+        assert same_df[SAMPLE_COLUMN].equals(result_df[SAMPLE_COLUMN])
+
+    def test_apply_validation_policy_sampled_small_dataset(self):
+        gx_df = pd.DataFrame({"a": range(5)})
+        suite = ExpectationSuite(
+            expectation_suite_name="metabolomics",
+            expectations=[
+                ExpectationConfiguration(
+                    expectation_type="expect_column_values_to_have_list_length",
+                    kwargs={"column": "a", "list_length": 1},
+                )
+            ],
+        )
+        self.good_runner.validation_policy = "sampled"
+        self.good_runner.sample_size = 10
+        result_df, result_suite = self.good_runner.apply_validation_policy(
+            gx_df=gx_df, expectation_suite=suite
+        )
+        assert result_df is gx_df
+        assert "row_condition" not in result_suite.expectations[0].kwargs
+
+
+class TestGreatExpectationsContext:
+    def test_context_is_created_lazily_and_once(self):
+        gx_context = GreatExpectationsContext()
+        assert gx_context._context is None
+
+        context = gx_context.context
+        assert isinstance(context, FileDataContext)
+        assert gx_context.context is context
+
+    def test_runners_share_the_context(self, syn):
+        gx_context = GreatExpectationsContext()
+        runners = [
+            GreatExpectationsRunner(
+                syn=syn,
+                dataset_path="./tests/test_assets/gx/metabolomics.json",
+                dataset_name="metabolomics",
+                gx_context=gx_context,
+            )
+            for _ in range(2)
+        ]
+        assert runners[0].context is runners[1].context
+        assert runners[0].gx_project_dir == gx_context.project_root_dir
+
+    def test_expectation_suites_are_read_once(self):
+        gx_context = GreatExpectationsContext()
+        with patch.object(
+            gx_context.context,
+            "list_expectation_suite_names",
+            wraps=gx_context.context.list_expectation_suite_names,
+        ) as patch_list_expectation_suite_names, patch.object(
+            gx_context.context,
+            "get_expectation_suite",
+            wraps=gx_context.context.get_expectation_suite,
+        ) as patch_get_expectation_suite:
+            for _ in range(2):
+                assert "metabolomics" in gx_context.list_expectation_suite_names()
+                suite = gx_context.get_expectation_suite("metabolomics")
+            patch_list_expectation_suite_names.assert_called_once()
+            patch_get_expectation_suite.assert_called_once_with("metabolomics")
+        assert suite.expectation_suite_name == "metabolomics"
+
+    def test_get_expectation_suite_returns_a_copy(self):
+        gx_context = GreatExpectationsContext()
+        suite = gx_context.get_expectation_suite("metabolomics")
+        suite.expectations.clear()
+        assert gx_context.get_expectation_suite("metabolomics").expectations
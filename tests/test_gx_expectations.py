@@ -0,0 +1,171 @@
+"""Checks the custom list-valued expectations against a cell by cell reference implementation."""
+
+import functools
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from great_expectations.exceptions import MetricResolutionError
+
+from agoradatatools.gx import GreatExpectationsContext
+
+
+@pytest.fixture(scope="module")
+def context():
+    return GreatExpectationsContext().context
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = random.Random(0)
+    letters = ["a", "b", "c", "d"]
+    cells = []
+    for _ in range(300):
+        kind = rng.randrange(6)
+        if kind == 0:
+            cells.append([rng.choice(letters) for _ in range(rng.randrange(4))])
+        elif kind == 1:
+            cells.append(
+                [{"k": rng.choice(letters)} for _ in range(rng.randrange(1, 4))]
+            )
+        elif kind == 2:
+            cells.append([rng.choice(letters), 1, 2.5, {"x": "a"}][: rng.randrange(5)])
+        elif kind == 3:
+            cells.append(rng.choice(letters))
+        elif kind == 4:
+            cells.append(["a", {"j": "a"}])
+        else:
+            cells.append(None)
+    return pd.DataFrame({"a": cells})
+
+
+def unexpected_indices(df: pd.DataFrame, check) -> list:
+    """Indices of the non-null cells that fail a cell by cell check"""
+    return [
+        index for index, cell in df["a"].items() if cell is not None and not check(cell)
+    ]
+
+
+def validate(context, df: pd.DataFrame, expectation: str, **kwargs) -> list:
+    validator = context.sources.pandas_default.read_dataframe(df)
+    result = getattr(validator, expectation)(
+        column="a", result_format="COMPLETE", **kwargs
+    )
+    return result.result["unexpected_index_list"]
+
+
+def test_list_length(context, df):
+    expected = unexpected_indices(
+        df, lambda cell: isinstance(cell, list) and len(cell) == 2
+    )
+    assert expected
+    assert (
+        validate(context, df, "expect_column_values_to_have_list_length", list_length=2)
+        == expected
+    )
+
+
+def test_list_length_in_range(context, df):
+    expected = unexpected_indices(
+        df, lambda cell: isinstance(cell, list) and 1 <= len(cell) <= 2
+    )
+    assert (
+        validate(
+            context,
+            df,
+            "expect_column_values_to_have_list_length_in_range",
+            list_length_range=[2, 1],
+        )
+        == expected
+    )
+
+
+def test_list_members(context, df):
+    members = ["a", "b", 1]
+    expected = unexpected_indices(
+        df,
+        lambda cell: isinstance(cell, list) and all(item in members for item in cell),
+    )
+    assert (
+        validate(
+            context,
+            df,
+            "expect_column_values_to_have_list_members",
+            list_members=members,
+        )
+        == expected
+    )
+
+
+def test_list_members_of_type(context, df):
+    expected = unexpected_indices(
+        df,
+        lambda cell: isinstance(cell, list)
+        and all(isinstance(item, str) for item in cell),
+    )
+    assert (
+        validate(
+            context,
+            df,
+            "expect_column_values_to_have_list_members_of_type",
+            member_type="str",
+        )
+        == expected
+    )
+
+
+def test_list_of_dict_with_expected_values(context, df):
+    values = ["a", "b"]
+    expected = unexpected_indices(
+        df,
+        lambda cell: isinstance(cell, list)
+        and all(isinstance(item, dict) and item["k"] in values for item in cell),
+    )
+    assert (
+        validate(
+            context,
+            df,
+            "expect_column_values_to_have_list_of_dict_with_expected_values",
+            list_dict_values={"key": "k", "values": values},
+        )
+        == expected
+    )
+
+
+@pytest.mark.parametrize(
+    "cells, raises",
+    [
+        ([[{"k": "a"}, {"j": "a"}]], True),
+        ([[{"k": "a"}], [{"j": "a"}, "a"]], True),
+        ([[{"k": "c"}, {"j": "a"}]], False),
+        ([["a", {"j": "a"}]], False),
+        ([[{"k": "a"}], "a", None], False),
+    ],
+)
+def test_list_of_dict_without_the_key(context, cells, raises):
+    """A dict without the key raises a KeyError unless an earlier member of its list fails"""
+    validator = context.sources.pandas_default.read_dataframe(
+        pd.DataFrame({"a": cells})
+    )
+    expect = functools.partial(
+        validator.expect_column_values_to_have_list_of_dict_with_expected_values,
+        column="a",
+        list_dict_values={"key": "k", "values": ["a", "b"]},
+    )
+    if raises:
+        with pytest.raises(MetricResolutionError, match="'k'"):
+            expect()
+    else:
+        expect()
+
+
+def test_members_are_in_matches_missing_values_like_in(context):
+    from expectations.list_utils import members_are_in
+
+    nan = float("nan")
+    members = pd.Series([nan, np.nan, float("nan"), None, "a", 1], dtype=object)
+    for values in ([np.nan], [nan, None], [None, "a"], ["b", 1]):
+        assert list(members_are_in(members, values)) == [
+            member in values for member in members
+        ]
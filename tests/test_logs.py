@@ -0,0 +1,104 @@
+import json
+import logging
+
+import pytest
+
+from agoradatatools import logs
+
+
+class TestStageRecorder:
+    def test_stage_records_metrics(self):
+        recorder = logs.StageRecorder()
+        with recorder.stage("extract"):
+            sum(range(100000))
+        with recorder.stage("transform"):
+            pass
+
+        assert [stage.stage for stage in recorder.stages] == ["extract", "transform"]
+        assert recorder.stages[0].wall_seconds >= 0
+        assert recorder.stages[0].cpu_seconds >= 0
+
+    def test_stage_records_metrics_when_stage_fails(self):
+        recorder = logs.StageRecorder()
+        with pytest.raises(ValueError):
+            with recorder.stage("transform"):
+                raise ValueError("test")
+
+        assert [stage.stage for stage in recorder.stages] == ["transform"]
+
+    def test_to_json(self):
+        recorder = logs.StageRecorder()
+        recorder.stages = [
+            logs.StageMetrics(
+                stage="gx", wall_seconds=1.5, cpu_seconds=1.0, process_peak_rss_mb=100.0
+            )
+        ]
+
+        assert json.loads(recorder.to_json()) == [
+            {
+                "stage": "gx",
+                "wall_seconds": 1.5,
+                "cpu_seconds": 1.0,
+                "process_peak_rss_mb": 100.0,
+            }
+        ]
+
+    def test_format(self):
+        recorder = logs.StageRecorder()
+        recorder.stages = [
+            logs.StageMetrics(
+                stage="gx", wall_seconds=1.5, cpu_seconds=1.0, process_peak_rss_mb=None
+            ),
+            logs.StageMetrics(
+                stage="upload",
+                wall_seconds=2.0,
+                cpu_seconds=0.25,
+                process_peak_rss_mb=None,
+            ),
+        ]
+
+        assert recorder.format() == "gx 1.500s (cpu 1.000s), upload 2.000s (cpu 0.250s)"
+
+
+class TestRunMetrics:
+    def test_get_recorder(self):
+        run_metrics = logs.RunMetrics()
+        recorder = run_metrics.get_recorder(dataset_name="gene_info")
+        assert run_metrics.get_recorder(dataset_name="gene_info") is recorder
+        assert run_metrics.get_recorder(dataset_name="team_info") is not recorder
+
+    def test_write(self, tmp_path):
+        run_metrics = logs.RunMetrics()
+        run_metrics.get_recorder(dataset_name="gene_info").stages = [
+            logs.StageMetrics(
+                stage="gx", wall_seconds=1.5, cpu_seconds=1.0, process_peak_rss_mb=None
+            )
+        ]
+        run_metrics.get_recorder(dataset_name="team_info")
+        run_metrics.write(path=str(tmp_path / "stage_metrics.json"))
+
+        with open(tmp_path / "stage_metrics.json") as metrics_file:
+            assert json.load(metrics_file) == {
+                "gene_info": [
+                    {
+                        "stage": "gx",
+                        "wall_seconds": 1.5,
+                        "cpu_seconds": 1.0,
+                        "process_peak_rss_mb": None,
+                    }
+                ],
+                "team_info": [],
+            }
+
+
+def test_get_process_peak_rss_mb():
+    peak_rss_mb = logs.get_process_peak_rss_mb()
+    if logs.resource is None:
+        assert peak_rss_mb is None
+    else:
+        assert peak_rss_mb > 0
+
+
+def test_log_time_unsupported_function():
+    with pytest.raises(ValueError, match="not supported"):
+        logs.log_time(func_name="test", logger=logging.getLogger(__name__))
@@ -0,0 +1,160 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from agoradatatools import manifest
+from agoradatatools.manifest import RunManifest, get_dataset_fingerprint
+
+DATASET = {
+    "genes_biodomains": {
+        "files": [{"name": "genes_biodomains", "id": "syn44151254.1", "format": "csv"}],
+        "final_format": "json",
+        "destination": "syn1111113",
+    }
+}
+
+
+class TestGetPackageSourceHash:
+    def test_hash_is_cached(self):
+        assert manifest.get_package_source_hash() is manifest.get_package_source_hash()
+
+    def test_hash_changes_with_any_module(self, tmp_path):
+        (tmp_path / "etl").mkdir()
+        (tmp_path / "etl" / "utils.py").write_text("a = 1\n")
+        (tmp_path / "notes.txt").write_text("not a module\n")
+        with patch.object(manifest, "__file__", str(tmp_path / "manifest.py")):
+            manifest.get_package_source_hash.cache_clear()
+            source_hash = manifest.get_package_source_hash()
+            (tmp_path / "notes.txt").write_text("changed\n")
+            manifest.get_package_source_hash.cache_clear()
+            assert manifest.get_package_source_hash() == source_hash
+            (tmp_path / "etl" / "utils.py").write_text("a = 2\n")
+            manifest.get_package_source_hash.cache_clear()
+            assert manifest.get_package_source_hash() != source_hash
+        manifest.get_package_source_hash.cache_clear()
+
+
+class TestGetDatasetFingerprint:
+    def test_fingerprint_is_stable(self):
+        assert get_dataset_fingerprint(DATASET) == get_dataset_fingerprint(
+            json.loads(json.dumps(DATASET))
+        )
+
+    @pytest.mark.parametrize(
+        "changed_dataset",
+        [
+            {
+                "genes_biodomains": {
+                    **DATASET["genes_biodomains"],
+                    "files": [
+                        {
+                            "name": "genes_biodomains",
+                            "id": "syn44151254.2",
+                            "format": "csv",
+                        }
+                    ],
+                }
+            },
+            {"genes_biodomains": {**DATASET["genes_biodomains"], "gx_enabled": True}},
+            {"biodomains": DATASET["genes_biodomains"]},
+        ],
+    )
+    def test_fingerprint_changes_with_the_config(self, changed_dataset):
+        assert get_dataset_fingerprint(changed_dataset) != get_dataset_fingerprint(
+            DATASET
+        )
+
+    def test_fingerprint_changes_with_the_package_version(self):
+        fingerprint = get_dataset_fingerprint(DATASET)
+        with patch.object(manifest, "get_package_version", return_value="99.0.0"):
+            assert get_dataset_fingerprint(DATASET) != fingerprint
+
+    def test_fingerprint_changes_with_the_package_source(self):
+        fingerprint = get_dataset_fingerprint(DATASET)
+        with patch.object(manifest, "get_package_source_hash", return_value="changed"):
+            assert get_dataset_fingerprint(DATASET) != fingerprint
+
+    def test_fingerprint_changes_with_the_expectation_suite(self):
+        dataset = {
+            "genes_biodomains": {**DATASET["genes_biodomains"], "gx_enabled": True}
+        }
+        fingerprint = get_dataset_fingerprint(dataset)
+        assert manifest.get_expectation_suite_hash("genes_biodomains") is not None
+        with patch.object(
+            manifest, "get_expectation_suite_hash", return_value="changed"
+        ) as patch_get_expectation_suite_hash:
+            assert get_dataset_fingerprint(dataset) != fingerprint
+        patch_get_expectation_suite_hash.assert_called_once_with(
+            dataset_name="genes_biodomains"
+        )
+
+    def test_suite_is_only_hashed_when_used(self):
+        with patch.object(
+            manifest, "get_expectation_suite_hash"
+        ) as patch_get_expectation_suite_hash:
+            get_dataset_fingerprint(DATASET)
+        patch_get_expectation_suite_hash.assert_not_called()
+
+    def test_datasets_without_a_suite_have_no_hash(self):
+        assert manifest.get_expectation_suite_hash("not_a_dataset") is None
+
+    def test_unpinned_files_have_no_fingerprint(self):
+        dataset = {
+            "genes_biodomains": {
+                **DATASET["genes_biodomains"],
+                "files": [
+                    {"name": "genes_biodomains", "id": "syn44151254", "format": "csv"}
+                ],
+            }
+        }
+        assert get_dataset_fingerprint(dataset) is None
+
+
+class TestRunManifest:
+    def test_missing_manifest_has_no_entries(self, tmp_path):
+        run_manifest = RunManifest(manifest_path=str(tmp_path / "manifest.json"))
+        assert run_manifest.entries == {}
+        assert (
+            run_manifest.get_unchanged(dataset_name="genes_biodomains", fingerprint="a")
+            is None
+        )
+
+    def test_record_save_and_read(self, tmp_path):
+        manifest_path = str(tmp_path / "runs" / "manifest.json")
+        run_manifest = RunManifest(manifest_path=manifest_path)
+        run_manifest.record(
+            dataset_name="genes_biodomains",
+            fingerprint="a",
+            adt_output_file="syn123",
+            adt_output_version=2,
+        )
+        run_manifest.record(
+            dataset_name="unpinned", fingerprint=None, adt_output_file="syn456"
+        )
+        run_manifest.save()
+
+        run_manifest = RunManifest(manifest_path=manifest_path)
+        assert run_manifest.get_unchanged(
+            dataset_name="genes_biodomains", fingerprint="a"
+        ) == {"fingerprint": "a", "adt_output_file": "syn123", "adt_output_version": 2}
+        assert (
+            run_manifest.get_unchanged(dataset_name="genes_biodomains", fingerprint="b")
+            is None
+        )
+        assert (
+            run_manifest.get_unchanged(
+                dataset_name="genes_biodomains", fingerprint=None
+            )
+            is None
+        )
+        assert "unpinned" not in run_manifest.entries
+
+    @pytest.mark.parametrize(
+        "content",
+        ["not json", json.dumps({"manifest_version": 0, "datasets": {"a": {}}})],
+    )
+    def test_unusable_manifest_has_no_entries(self, tmp_path, content):
+        manifest_path = tmp_path / "manifest.json"
+        manifest_path.write_text(content)
+        assert RunManifest(manifest_path=str(manifest_path)).entries == {}
@@ -1,16 +1,25 @@
+import dataclasses
+import json
+import logging
+import re
+import subprocess
+import sys
 from typing import Any
 from unittest import mock
-from unittest.mock import patch
+from unittest.mock import ANY, Mock, patch
 
 import pandas as pd
 import pytest
 
 from agoradatatools import process
 from agoradatatools.errors import ADTDataProcessingError
-from agoradatatools.etl import load, utils, extract
+from agoradatatools.etl import load, utils, extract, transform
+from agoradatatools.etl.transform import registry
 from agoradatatools.reporter import DatasetReport, ADTGXReporter
 from agoradatatools.constants import Platform
 from agoradatatools.gx import GreatExpectationsRunner
+from agoradatatools.logs import RunMetrics
+from agoradatatools.manifest import RunManifest, get_dataset_fingerprint
 
 STAGING_PATH = "./staging"
 GX_FOLDER = "test_folder"
@@ -133,7 +142,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -144,7 +159,10 @@ class TestProcessDataset:
         self.patch_rename_columns.assert_not_called()
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_not_called()
@@ -163,7 +181,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -176,7 +200,10 @@ class TestProcessDataset:
         )
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_not_called()
@@ -195,7 +222,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -216,7 +249,10 @@ class TestProcessDataset:
             },
         )
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_not_called()
@@ -237,7 +273,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -250,7 +292,10 @@ class TestProcessDataset:
         )
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_not_called()
@@ -268,7 +313,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -280,7 +331,10 @@ class TestProcessDataset:
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_not_called()
         self.patch_dict_to_json.assert_called_once_with(
-            df={}, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df={},
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_gx_runner_run.assert_not_called()
         self.patch_set_attributes.assert_not_called()
@@ -296,7 +350,13 @@ class TestProcessDataset:
             upload=True,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -307,7 +367,10 @@ class TestProcessDataset:
         self.patch_rename_columns.assert_not_called()
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_not_called()
@@ -329,7 +392,13 @@ class TestProcessDataset:
             upload=True,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -340,7 +409,10 @@ class TestProcessDataset:
         self.patch_rename_columns.assert_not_called()
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_called_once()
@@ -362,7 +434,13 @@ class TestProcessDataset:
             upload=False,
         )
         self.patch_get_entity_as_df.assert_called_once_with(
-            syn_id="syn1111111", source="csv", syn=syn
+            syn_id="syn1111111",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
         )
         self.patch_standardize_column_names.assert_called_once_with(
             df=self.patch_get_entity_as_df.return_value
@@ -373,7 +451,10 @@ class TestProcessDataset:
         self.patch_rename_columns.assert_not_called()
         self.patch_custom_transform.assert_not_called()
         self.patch_df_to_json.assert_called_once_with(
-            df=pd.DataFrame, staging_path=STAGING_PATH, filename="neuropath_corr.json"
+            df=pd.DataFrame,
+            staging_path=STAGING_PATH,
+            filename="neuropath_corr.json",
+            final_format="json",
         )
         self.patch_dict_to_json.assert_not_called()
         self.patch_gx_runner_run.assert_called_once()
@@ -381,6 +462,451 @@ class TestProcessDataset:
         self.patch_format_link.assert_called()
         self.patch_load.assert_not_called()
 
+    def test_process_dataset_records_stage_metrics(self, syn: Any):
+        run_metrics = RunMetrics()
+        process.process_dataset(
+            dataset_obj=self.dataset_object_gx_enabled,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=True,
+            run_metrics=run_metrics,
+        )
+        stage_metrics = run_metrics.recorders["neuropath_corr"].to_records()
+        assert [stage["stage"] for stage in stage_metrics] == [
+            "extract:test_file_1",
+            "standardize:test_file_1",
+            "serialize",
+            "gx",
+            "upload",
+        ]
+        assert set(stage_metrics[0]) == {
+            "stage",
+            "wall_seconds",
+            "cpu_seconds",
+            "process_peak_rss_mb",
+        }
+        # the figures are not written to the GX reporting table
+        for call in self.patch_set_attributes.call_args_list:
+            assert "stage_metrics" not in call.kwargs
+
+    def test_process_dataset_records_stage_metrics_without_gx(self, syn: Any):
+        run_metrics = RunMetrics()
+        process.process_dataset(
+            dataset_obj=self.dataset_object,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=True,
+            run_metrics=run_metrics,
+        )
+        assert [
+            stage.stage for stage in run_metrics.recorders["neuropath_corr"].stages
+        ] == ["extract:test_file_1", "standardize:test_file_1", "serialize", "upload"]
+
+    def test_process_dataset_records_queued_upload(self, syn: Any):
+        run_metrics = RunMetrics()
+        upload_queue = load.UploadQueue(max_workers=1)
+        process.process_dataset(
+            dataset_obj=self.dataset_object,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=True,
+            upload_queue=upload_queue,
+            run_metrics=run_metrics,
+        )
+        assert upload_queue.wait() == {}
+        assert run_metrics.recorders["neuropath_corr"].stages[-1].stage == "upload"
+
+    def test_process_dataset_gx_in_memory(self, syn: Any):
+        df = pd.DataFrame({"a": [1]})
+        self.patch_standardize_values.return_value = df
+        with patch.object(process, "GreatExpectationsRunner") as patch_gx_runner:
+            patch_gx_runner.return_value.failures = False
+            process.process_dataset(
+                dataset_obj=self.dataset_object_gx_enabled,
+                staging_path=STAGING_PATH,
+                gx_folder=GX_FOLDER,
+                syn=syn,
+                upload=False,
+                gx_in_memory=True,
+                gx_fidelity_check=True,
+            )
+            patch_gx_runner.assert_called_once_with(
+                syn=syn,
+                dataset_path=self.patch_df_to_json.return_value,
+                dataset_name="neuropath_corr",
+                upload_folder=None,
+                nested_columns=None,
+                gx_context=None,
+                df=df,
+                fidelity_check=True,
+                validation_policy="full",
+                sample_size=10000,
+                sample_seed=0,
+            )
+
+    @pytest.mark.parametrize(
+        "gx_full_validation, expected_policy", [(False, "sampled"), (True, "full")]
+    )
+    def test_process_dataset_gx_validation_policy(
+        self, syn: Any, gx_full_validation: bool, expected_policy: str
+    ):
+        dataset_obj = {
+            "neuropath_corr": {
+                **self.dataset_object_gx_enabled["neuropath_corr"],
+                "gx_validation_policy": "sampled",
+                "gx_sample_size": 50,
+                "gx_sample_seed": 7,
+            }
+        }
+        with patch.object(process, "GreatExpectationsRunner") as patch_gx_runner:
+            patch_gx_runner.return_value.failures = False
+            process.process_dataset(
+                dataset_obj=dataset_obj,
+                staging_path=STAGING_PATH,
+                gx_folder=GX_FOLDER,
+                syn=syn,
+                upload=False,
+                gx_full_validation=gx_full_validation,
+            )
+            assert patch_gx_runner.call_args.kwargs["validation_policy"] == (
+                expected_policy
+            )
+            assert patch_gx_runner.call_args.kwargs["sample_size"] == 50
+            assert patch_gx_runner.call_args.kwargs["sample_seed"] == 7
+
+    def test_process_dataset_records_uploads_in_the_run_manifest(
+        self, syn: Any, tmp_path
+    ):
+        dataset_obj = {
+            "neuropath_corr": {
+                **self.dataset_object_gx_disabled["neuropath_corr"],
+                "files": [
+                    {"name": "test_file_1", "id": "syn1111111.2", "format": "csv"}
+                ],
+            }
+        }
+        run_manifest = RunManifest(manifest_path=str(tmp_path / "manifest.json"))
+        process.process_dataset(
+            dataset_obj=dataset_obj,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=True,
+            run_manifest=run_manifest,
+        )
+        assert run_manifest.get_unchanged(
+            dataset_name="neuropath_corr",
+            fingerprint=get_dataset_fingerprint(dataset_obj),
+        ) == {
+            "fingerprint": get_dataset_fingerprint(dataset_obj),
+            "adt_output_file": "syn123",
+            "adt_output_version": 1,
+        }
+
+    def test_process_dataset_skips_unchanged_datasets(self, syn: Any, tmp_path):
+        dataset_obj = {
+            "neuropath_corr": {
+                **self.dataset_object_gx_enabled["neuropath_corr"],
+                "files": [
+                    {"name": "test_file_1", "id": "syn1111111.2", "format": "csv"}
+                ],
+            }
+        }
+        run_manifest = RunManifest(manifest_path=str(tmp_path / "manifest.json"))
+        run_manifest.record(
+            dataset_name="neuropath_corr",
+            fingerprint=get_dataset_fingerprint(dataset_obj),
+            adt_output_file="syn999",
+            adt_output_version=3,
+            gx_report_file="syn888",
+            gx_report_version=4,
+            gx_warnings=False,
+            gx_warning_message=None,
+        )
+        entity_cache = extract.EntityCache(datasets=[dataset_obj])
+        dataset_report = process.process_dataset(
+            dataset_obj=dataset_obj,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=True,
+            entity_cache=entity_cache,
+            run_manifest=run_manifest,
+        )
+        self.patch_get_entity_as_df.assert_not_called()
+        self.patch_df_to_json.assert_not_called()
+        self.patch_gx_runner_run.assert_not_called()
+        self.patch_load.assert_not_called()
+        assert not entity_cache.uses
+        assert dataset_report.data_set == "neuropath_corr"
+        self.patch_set_attributes.assert_called_once_with(
+            gx_report_file="syn888",
+            gx_report_version=4,
+            gx_report_link="test_link",
+            gx_failures=False,
+            gx_warnings=False,
+            gx_warning_message=None,
+            adt_output_file="syn999",
+            adt_output_version=3,
+            adt_output_link="test_link",
+        )
+
+    def test_process_dataset_does_not_skip_without_upload(self, syn: Any, tmp_path):
+        dataset_obj = {
+            "neuropath_corr": {
+                **self.dataset_object["neuropath_corr"],
+                "files": [
+                    {"name": "test_file_1", "id": "syn1111111.2", "format": "csv"}
+                ],
+            }
+        }
+        run_manifest = RunManifest(manifest_path=str(tmp_path / "manifest.json"))
+        run_manifest.record(
+            dataset_name="neuropath_corr",
+            fingerprint=get_dataset_fingerprint(dataset_obj),
+            adt_output_file="syn999",
+            adt_output_version=3,
+        )
+        process.process_dataset(
+            dataset_obj=dataset_obj,
+            staging_path=STAGING_PATH,
+            gx_folder=GX_FOLDER,
+            syn=syn,
+            upload=False,
+            run_manifest=run_manifest,
+        )
+        self.patch_get_entity_as_df.assert_called_once()
+        self.patch_load.assert_not_called()
+
+    def test_process_dataset_prefetches_files_that_are_not_cached(self, syn: Any):
+        dataset_obj = {
+            "neuropath_corr": {
+                **self.dataset_object["neuropath_corr"],
+                "files": [
+                    {"name": "test_file_1", "id": "syn1111111.1", "format": "csv"},
+                    {"name": "test_file_2", "id": "syn1111112.1", "format": "csv"},
+                ],
+                "custom_transformations": "test_transformation",
+            }
+        }
+        entity_cache = extract.EntityCache(datasets=[dataset_obj])
+        prefetcher = mock.create_autospec(extract.EntityPrefetcher, instance=True)
+        with patch.object(
+            entity_cache,
+            "is_cached",
+            side_effect=lambda syn_id, source, read_options: syn_id == "syn1111112.1",
+        ):
+            process.process_dataset(
+                dataset_obj=dataset_obj,
+                staging_path=STAGING_PATH,
+                gx_folder=GX_FOLDER,
+                syn=syn,
+                upload=False,
+                entity_cache=entity_cache,
+                prefetcher=prefetcher,
+            )
+        prefetcher.prefetch.assert_called_once_with(syn_ids=["syn1111111.1"])
+        self.patch_get_entity_as_df.assert_any_call(
+            syn_id="syn1111111.1",
+            source="csv",
+            syn=syn,
+            prefetcher=prefetcher,
+            columns=None,
+            dtypes=None,
+            engine="c",
+        )
+
+    def test_process_dataset_with_upload_queue(self, syn: Any):
+        upload_queue = load.UploadQueue(max_workers=1)
+        with patch.object(upload_queue, "submit") as patch_submit:
+            process.process_dataset(
+                dataset_obj=self.dataset_object_gx_enabled,
+                staging_path=STAGING_PATH,
+                gx_folder=GX_FOLDER,
+                syn=syn,
+                upload=True,
+                upload_queue=upload_queue,
+            )
+        self.patch_load.assert_not_called()
+        patch_submit.assert_called_once_with(name="neuropath_corr", upload_func=ANY)
+
+        # the queued upload completes the report
+        patch_submit.call_args.kwargs["upload_func"]()
+        upload_queue.wait()
+        self.patch_load.assert_called_once_with(
+            file_path=self.patch_df_to_json.return_value,
+            provenance=self.dataset_object_gx_enabled["neuropath_corr"]["provenance"],
+            destination=self.dataset_object_gx_enabled["neuropath_corr"]["destination"],
+            syn=syn,
+        )
+        self.patch_set_attributes.assert_any_call(
+            adt_output_file="syn123",
+            adt_output_version=1,
+            adt_output_link="test_link",
+        )
+
+
+class TestStreamDataset:
+    @staticmethod
+    def dataset_object(source: str, final_format: str = "json") -> dict:
+        return {
+            "neuropath_corr": {
+                "files": [
+                    {"name": "test_file_1", "id": "syn1111111.1", "format": source}
+                ],
+                "final_format": final_format,
+                "provenance": ["syn1111111.1"],
+                "destination": "syn1111113",
+                "column_rename": {"gene_id": "ensembl_gene_id"},
+                "agora_rename": {"log_fc": "logfc"},
+            }
+        }
+
+    @staticmethod
+    def write_source_file(tmp_path, source: str) -> str:
+        # the integer column has its only missing value in the last rows
+        path = str(tmp_path / f"source_file.{source}")
+        pd.DataFrame(
+            {
+                "Gene ID": [f"ENSG{i}" for i in range(10)],
+                "log.FC": [0.1 * i for i in range(10)],
+                "count": list(range(9)) + [None],
+                "Tissue": ["n/a", "CBE"] * 5,
+            }
+        ).to_csv(path, sep="," if source == "csv" else "\t", index=False)
+        return path
+
+    def regular_path(self, tmp_path, syn, dataset_obj) -> str:
+        dataset_config = dataset_obj["neuropath_corr"]
+        df = process.extract_entity(entity=dataset_config["files"][0], syn=syn)
+        df = utils.rename_columns(df=df, column_map=dataset_config["column_rename"])
+        df = utils.rename_columns(df=df, column_map=dataset_config["agora_rename"])
+        staging_path = tmp_path / "regular"
+        staging_path.mkdir()
+        return load.df_to_json(
+            df=df,
+            staging_path=str(staging_path),
+            filename="neuropath_corr." + dataset_config["final_format"],
+            final_format=dataset_config["final_format"],
+        )
+
+    @pytest.mark.parametrize("source", ["csv", "tsv"])
+    @pytest.mark.parametrize("final_format", ["json", "ndjson"])
+    @pytest.mark.parametrize("chunk_size", [1, 3, 100])
+    def test_output_is_the_same_as_the_regular_path(
+        self, tmp_path, source, final_format, chunk_size
+    ):
+        syn = Mock()
+        syn.get.return_value = Mock(path=self.write_source_file(tmp_path, source))
+        dataset_obj = self.dataset_object(source=source, final_format=final_format)
+        expected_path = self.regular_path(tmp_path, syn, dataset_obj)
+
+        json_path = process.stream_dataset(
+            dataset_obj=dataset_obj,
+            staging_path=str(tmp_path),
+            syn=syn,
+            chunk_size=chunk_size,
+        )
+        assert json_path == str(tmp_path / f"neuropath_corr.{final_format}")
+        with open(json_path) as streamed, open(expected_path) as expected:
+            assert streamed.read() == expected.read()
+        syn.get.assert_called_with("syn1111111", version="1")
+
+    def test_custom_transformations_can_not_be_streamed(self, tmp_path):
+        dataset_obj = self.dataset_object(source="csv")
+        dataset_obj["neuropath_corr"]["custom_transformations"] = 1
+        with pytest.raises(ValueError, match="can be streamed: neuropath_corr"):
+            process.stream_dataset(
+                dataset_obj=dataset_obj,
+                staging_path=str(tmp_path),
+                syn=Mock(),
+                chunk_size=2,
+            )
+
+    def test_process_dataset_streams_the_dataset(self, tmp_path):
+        dataset_obj = self.dataset_object(source="csv")
+        dataset_obj["neuropath_corr"]["stream_chunk_size"] = 2
+        entity_cache = extract.EntityCache(datasets=[dataset_obj])
+        with patch.object(
+            process, "stream_dataset", return_value="path/to/json"
+        ) as patch_stream_dataset, patch.object(
+            process, "extract_entity"
+        ) as patch_extract_entity, patch.object(
+            load, "load", return_value=("syn123", 1)
+        ) as patch_load:
+            process.process_dataset(
+                dataset_obj=dataset_obj,
+                staging_path=str(tmp_path),
+                gx_folder=GX_FOLDER,
+                syn=Mock(),
+                entity_cache=entity_cache,
+            )
+        patch_stream_dataset.assert_called_once_with(
+            dataset_obj=dataset_obj,
+            staging_path=str(tmp_path),
+            syn=ANY,
+            chunk_size=2,
+            prefetcher=None,
+        )
+        patch_extract_entity.assert_not_called()
+        patch_load.assert_called_once_with(
+            file_path="path/to/json",
+            provenance=["syn1111111.1"],
+            destination="syn1111113",
+            syn=ANY,
+        )
+        assert not entity_cache.uses
+
+
+class TestExtractEntity:
+    entity = {"name": "test_file_1", "id": "syn1111111.1", "format": "csv"}
+
+    def setup_method(self):
+        self.patch_get_entity_as_df = patch.object(
+            extract, "get_entity_as_df", return_value=pd.DataFrame({"a": [1]})
+        ).start()
+        self.patch_standardize_column_names = patch.object(
+            utils, "standardize_column_names", side_effect=lambda df: df
+        ).start()
+        self.patch_standardize_values = patch.object(
+            utils, "standardize_values", side_effect=lambda df: df
+        ).start()
+
+    def teardown_method(self):
+        mock.patch.stopall()
+
+    def test_extract_entity_without_cache(self, syn: Any):
+        df = process.extract_entity(entity=self.entity, syn=syn)
+        self.patch_get_entity_as_df.assert_called_once_with(
+            syn_id="syn1111111.1",
+            source="csv",
+            syn=syn,
+            prefetcher=None,
+            columns=None,
+            dtypes=None,
+            engine="c",
+        )
+        self.patch_standardize_column_names.assert_called_once()
+        self.patch_standardize_values.assert_called_once()
+        assert df is self.patch_get_entity_as_df.return_value
+
+    def test_extract_entity_with_cache(self, syn: Any):
+        entity_cache = extract.EntityCache()
+        first = process.extract_entity(
+            entity=self.entity, syn=syn, entity_cache=entity_cache
+        )
+        second = process.extract_entity(
+            entity=self.entity, syn=syn, entity_cache=entity_cache
+        )
+        self.patch_get_entity_as_df.assert_called_once()
+        self.patch_standardize_column_names.assert_called_once()
+        self.patch_standardize_values.assert_called_once()
+        assert first.equals(second)
+        assert first is not second
+
 
 class TestCreateDataManifest:
     @pytest.fixture(scope="function", autouse=True)
@@ -459,10 +985,53 @@ class TestProcessAllFiles:
             ADTGXReporter,
             "update_table",
         ).start()
+        self.patch_write_run_metrics = patch.object(RunMetrics, "write").start()
 
     def teardown_method(self):
         mock.patch.stopall()
 
+    def test_process_all_files_writes_stage_metrics(self, syn: Any):
+        process.process_all_files(
+            syn=syn,
+            config_path=self.config_path,
+            platform=Platform.LOCAL,
+            run_id="123",
+            upload=False,
+        )
+        self.patch_write_run_metrics.assert_called_once_with(
+            path=f"{STAGING_PATH}/stage_metrics_123.json"
+        )
+        self.patch_load.assert_not_called()
+
+    def test_process_all_files_names_stage_metrics_without_run_id(self, syn: Any):
+        process.process_all_files(
+            syn=syn,
+            config_path=self.config_path,
+            platform=Platform.LOCAL,
+            upload=False,
+        )
+        path = self.patch_write_run_metrics.call_args.kwargs["path"]
+        assert re.fullmatch(
+            rf"{re.escape(STAGING_PATH)}/stage_metrics_\d{{8}}T\d{{6}}Z\.json", path
+        )
+
+    def test_process_all_files_stage_metrics_upload_failure_is_logged(
+        self, syn: Any, caplog
+    ):
+        self.patch_load.side_effect = [Exception("upload failed"), ("syn123", 1)]
+        with caplog.at_level(logging.WARNING):
+            process.process_all_files(
+                syn=syn,
+                config_path=self.config_path,
+                platform=Platform.LOCAL,
+                run_id="123",
+                upload=True,
+            )
+        assert "Could not upload the stage metrics of the run: upload failed" in (
+            caplog.text
+        )
+        self.patch_format_link.assert_called_once_with(syn_id="syn123", version=1)
+
     def test_process_all_files_upload_false(self, syn: Any):
         process.process_all_files(
             syn=syn,
@@ -481,6 +1050,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=False,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_process_dataset.assert_any_call(
             dataset_obj={"d": {"e": "f"}},
@@ -488,6 +1066,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=False,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_process_dataset.assert_any_call(
             dataset_obj={"g": {"h": "i"}},
@@ -495,6 +1082,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=False,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_add_report.assert_any_call(self.patch_process_dataset.return_value)
         self.patch_create_data_manifest.assert_called_once_with(
@@ -527,6 +1123,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=True,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_process_dataset.assert_any_call(
             dataset_obj={"d": {"e": "f"}},
@@ -534,6 +1139,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=True,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_process_dataset.assert_any_call(
             dataset_obj={"g": {"h": "i"}},
@@ -541,6 +1155,15 @@ class TestProcessAllFiles:
             gx_folder=GX_FOLDER,
             syn=syn,
             upload=True,
+            entity_cache=ANY,
+            gx_context=ANY,
+            gx_in_memory=False,
+            gx_fidelity_check=False,
+            gx_full_validation=False,
+            run_manifest=None,
+            prefetcher=ANY,
+            upload_queue=ANY,
+            run_metrics=ANY,
         )
         self.patch_add_report.assert_any_call(self.patch_process_dataset.return_value)
         self.patch_create_data_manifest.assert_called_once_with(
@@ -551,7 +1174,13 @@ class TestProcessAllFiles:
             staging_path=STAGING_PATH,
             filename="data_manifest.csv",
         )
-        self.patch_load.assert_called_once_with(
+        self.patch_load.assert_any_call(
+            file_path=f"{STAGING_PATH}/stage_metrics_123.json",
+            provenance=[],
+            destination=GX_FOLDER,
+            syn=syn,
+        )
+        self.patch_load.assert_called_with(
             file_path="path/to/csv",
             provenance=["a", "b", "c"],
             destination="destination",
@@ -583,6 +1212,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_process_dataset.assert_any_call(
                 dataset_obj={"d": {"e": "f"}},
@@ -590,6 +1228,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_process_dataset.assert_any_call(
                 dataset_obj={"g": {"h": "i"}},
@@ -597,6 +1244,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_add_report.assert_any_call(
                 self.patch_process_dataset.return_value
@@ -627,6 +1283,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_process_dataset.assert_any_call(
                 dataset_obj={"d": {"e": "f"}},
@@ -634,6 +1299,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_process_dataset.assert_any_call(
                 dataset_obj={"g": {"h": "i"}},
@@ -641,6 +1315,15 @@ class TestProcessAllFiles:
                 gx_folder=GX_FOLDER,
                 syn=syn,
                 upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
             )
             self.patch_add_report.assert_any_call(
                 self.patch_process_dataset.return_value
@@ -650,3 +1333,151 @@ class TestProcessAllFiles:
             self.patch_load.assert_not_called()
             self.patch_format_link.assert_not_called()
             self.patch_update_table.assert_called_once()
+
+    def test_process_all_files_with_workers(self, syn: Any):
+        self.patch_process_dataset.return_value = DatasetReport(data_set="test")
+        process.process_all_files(
+            syn=syn,
+            config_path=self.config_path,
+            platform=Platform.LOCAL,
+            run_id="123",
+            upload=False,
+            workers=3,
+        )
+        assert self.patch_process_dataset.call_count == 3
+        for dataset_obj in [{"a": {"b": "c"}}, {"d": {"e": "f"}}, {"g": {"h": "i"}}]:
+            self.patch_process_dataset.assert_any_call(
+                dataset_obj=dataset_obj,
+                staging_path=STAGING_PATH,
+                gx_folder=GX_FOLDER,
+                syn=syn,
+                upload=False,
+                entity_cache=ANY,
+                gx_context=ANY,
+                gx_in_memory=False,
+                gx_fidelity_check=False,
+                gx_full_validation=False,
+                run_manifest=None,
+                prefetcher=ANY,
+                upload_queue=ANY,
+                run_metrics=ANY,
+            )
+        assert self.patch_add_report.call_count == 3
+        self.patch_create_data_manifest.assert_called_once_with(
+            parent="destination", syn=syn
+        )
+        self.patch_update_table.assert_called_once()
+
+    def test_process_all_files_with_workers_process_dataset_fail(self, syn: Any):
+        self.patch_process_dataset.side_effect = [
+            DatasetReport(data_set="a"),
+            Exception("test\nerror"),
+            DatasetReport(data_set="g"),
+        ]
+        with pytest.raises(
+            ADTDataProcessingError,
+            match="Refer to the list of errors below to address issues:\nd: testerror$",
+        ):
+            process.process_all_files(
+                syn=syn,
+                config_path=self.config_path,
+                platform=Platform.LOCAL,
+                run_id="123",
+                upload=False,
+                workers=1,
+            )
+        self.patch_create_data_manifest.assert_not_called()
+        self.patch_update_table.assert_called_once()
+
+    def test_process_all_files_saves_the_run_manifest(self, syn: Any, tmp_path):
+        manifest_path = str(tmp_path / "manifest.json")
+        self.patch_get_config.return_value["run_manifest_path"] = manifest_path
+        self.patch_process_dataset.return_value = None
+        process.process_all_files(
+            syn=syn,
+            config_path=self.config_path,
+            platform=Platform.LOCAL,
+            run_id="123",
+            upload=True,
+        )
+        run_manifest = self.patch_process_dataset.call_args.kwargs["run_manifest"]
+        assert run_manifest.manifest_path == manifest_path
+        with open(manifest_path) as manifest_file:
+            assert json.load(manifest_file)["datasets"] == {}
+
+    def test_process_all_files_uploads_in_the_foreground_by_default(self, syn: Any):
+        self.patch_process_dataset.return_value = None
+        process.process_all_files(
+            syn=syn,
+            config_path=self.config_path,
+            platform=Platform.LOCAL,
+            run_id="123",
+            upload=True,
+        )
+        for call in self.patch_process_dataset.call_args_list:
+            assert call.kwargs["upload_queue"] is None
+
+    def test_process_all_files_checks_the_transformations_first(self, syn: Any):
+        self.patch_get_config.return_value["datasets"].append(
+            {
+                "team_info": {
+                    "files": [{"name": "team_info", "id": "syn1", "format": "csv"}],
+                    "custom_transformations": 1,
+                }
+            }
+        )
+        with pytest.raises(
+            ValueError,
+            match="dataset team_info requires the following files: team_member_info",
+        ):
+            process.process_all_files(
+                syn=syn,
+                config_path=self.config_path,
+                platform=Platform.LOCAL,
+                run_id="123",
+                upload=False,
+            )
+        self.patch_process_dataset.assert_not_called()
+
+    def test_process_all_files_upload_errors(self, syn: Any):
+        self.patch_get_config.return_value["upload_workers"] = 2
+
+        def process_dataset(dataset_obj, upload_queue, **kwargs):
+            if "d" in dataset_obj:
+                upload_queue.submit(
+                    name="d", upload_func=Mock(side_effect=Exception("upload failed"))
+                )
+            return None
+
+        self.patch_process_dataset.side_effect = process_dataset
+        with pytest.raises(ADTDataProcessingError, match="d: upload failed"):
+            process.process_all_files(
+                syn=syn,
+                config_path=self.config_path,
+                platform=Platform.LOCAL,
+                run_id="123",
+                upload=True,
+            )
+        self.patch_create_data_manifest.assert_not_called()
+
+
+class TestImports:
+    def test_process_does_not_import_great_expectations_or_synapseclient(self):
+        code = (
+            "import sys\n"
+            "import agoradatatools.process\n"
+            "heavy = [name for name in ('great_expectations', 'synapseclient') if name in sys.modules]\n"
+            "assert not heavy, heavy\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_great_expectations_is_imported_with_the_context(self):
+        code = (
+            "import sys\n"
+            "from agoradatatools.gx import GreatExpectationsContext\n"
+            "gx_context = GreatExpectationsContext()\n"
+            "assert 'great_expectations' not in sys.modules\n"
+            "gx_context.context\n"
+            "assert 'great_expectations' in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
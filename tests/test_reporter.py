@@ -1,5 +1,6 @@
 import pytest
 import datetime
+from dataclasses import asdict
 
 from unittest.mock import patch
 
@@ -20,6 +21,28 @@ class TestDatasetReport:
         assert self.test_report.run_id == "test"
         assert self.test_report.data_set == "test"
 
+    def test_fields_match_the_gx_table_columns(self):
+        # update_table writes the fields by position, so they must match the columns of the table
+        assert list(asdict(self.test_report)) == [
+            "timestamp",
+            "platform",
+            "run_id",
+            "data_set",
+            "gx_report_file",
+            "gx_report_version",
+            "gx_report_link",
+            "gx_failures",
+            "gx_failure_message",
+            "gx_warnings",
+            "gx_warning_message",
+            "adt_output_file",
+            "adt_output_version",
+            "adt_output_link",
+            "data_manifest_file",
+            "data_manifest_version",
+            "data_manifest_link",
+        ]
+
     def test_format_link(self):
         expected = "https://www.synapse.org/Synapse:syn123.1"
         result = self.test_report.format_link("syn123", 1)
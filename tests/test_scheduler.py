@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from agoradatatools.errors import ADTDataProcessingError
+from agoradatatools.scheduler import (
+    get_dataset_dependencies,
+    get_dataset_name,
+    schedule_datasets,
+)
+
+
+def test_get_dataset_name():
+    assert get_dataset_name({"gene_info": {"files": []}}) == "gene_info"
+
+
+class TestGetDatasetDependencies:
+    def test_get_dataset_dependencies(self):
+        datasets = [
+            {"a": {"files": []}},
+            {"b": {"depends_on": ["a"]}},
+            {"c": {"depends_on": ["a", "b"]}},
+        ]
+        assert get_dataset_dependencies(datasets) == {
+            "a": [],
+            "b": ["a"],
+            "c": ["a", "b"],
+        }
+
+    def test_get_dataset_dependencies_unknown_dataset(self):
+        with pytest.raises(ValueError, match="not in the configuration: z"):
+            get_dataset_dependencies([{"a": {"depends_on": ["z"]}}])
+
+    def test_get_dataset_dependencies_cycle(self):
+        datasets = [
+            {"a": {"depends_on": ["c"]}},
+            {"b": {"depends_on": ["a"]}},
+            {"c": {"depends_on": ["b"]}},
+        ]
+        with pytest.raises(ValueError, match="cycle: a -> c -> b -> a"):
+            get_dataset_dependencies(datasets)
+
+
+class TestScheduleDatasets:
+    datasets = [{"a": {"b": "c"}}, {"d": {"e": "f"}}, {"g": {"h": "i"}}]
+
+    def test_schedule_datasets_single_worker_runs_in_config_order(self):
+        order = []
+
+        def process_func(dataset):
+            order.append(get_dataset_name(dataset))
+            return get_dataset_name(dataset).upper()
+
+        results = schedule_datasets(
+            datasets=self.datasets, process_func=process_func, workers=1
+        )
+        assert order == ["a", "d", "g"]
+        assert results == [("A", None), ("D", None), ("G", None)]
+
+    def test_schedule_datasets_runs_datasets_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def process_func(dataset):
+            # only succeeds if all three datasets are running at the same time
+            barrier.wait()
+            return get_dataset_name(dataset)
+
+        results = schedule_datasets(
+            datasets=self.datasets, process_func=process_func, workers=3
+        )
+        assert results == [("a", None), ("d", None), ("g", None)]
+
+    def test_schedule_datasets_collects_errors_in_config_order(self):
+        def process_func(dataset):
+            if get_dataset_name(dataset) == "d":
+                raise ValueError("test")
+            return get_dataset_name(dataset)
+
+        results = schedule_datasets(
+            datasets=self.datasets, process_func=process_func, workers=2
+        )
+        assert results[0] == ("a", None)
+        assert results[1][0] is None
+        assert isinstance(results[1][1], ValueError)
+        assert results[2] == ("g", None)
+
+    def test_schedule_datasets_waits_for_dependencies(self):
+        datasets = [
+            {"a": {"depends_on": ["b"]}},
+            {"b": {}},
+            {"c": {"depends_on": ["a"]}},
+        ]
+        finished = []
+
+        def process_func(dataset):
+            name = get_dataset_name(dataset)
+            for dependency in dataset[name].get("depends_on", []):
+                assert dependency in finished
+            finished.append(name)
+            return name
+
+        results = schedule_datasets(
+            datasets=datasets, process_func=process_func, workers=3
+        )
+        assert finished == ["b", "a", "c"]
+        assert results == [("a", None), ("b", None), ("c", None)]
+
+    def test_schedule_datasets_skips_datasets_with_failed_dependencies(self):
+        datasets = [{"a": {}}, {"b": {"depends_on": ["a"]}}, {"c": {}}]
+        processed = []
+
+        def process_func(dataset):
+            processed.append(get_dataset_name(dataset))
+            if get_dataset_name(dataset) == "a":
+                raise ValueError("test")
+
+        results = schedule_datasets(
+            datasets=datasets, process_func=process_func, workers=1
+        )
+        assert processed == ["a", "c"]
+        assert isinstance(results[1][1], ADTDataProcessingError)
+        assert "dependencies failed: a" in str(results[1][1])
+
+    def test_schedule_datasets_calls_skip_func_for_skipped_datasets(self):
+        datasets = [{"a": {}}, {"b": {"depends_on": ["a"]}}, {"c": {}}]
+        skipped = []
+
+        def process_func(dataset):
+            if get_dataset_name(dataset) == "a":
+                raise ValueError("test")
+
+        schedule_datasets(
+            datasets=datasets,
+            process_func=process_func,
+            workers=1,
+            skip_func=skipped.append,
+        )
+        assert skipped == [{"b": {"depends_on": ["a"]}}]
+
+    def test_schedule_datasets_invalid_workers(self):
+        with pytest.raises(ValueError, match="at least 1"):
+            schedule_datasets(
+                datasets=self.datasets, process_func=lambda dataset: None, workers=0
+            )
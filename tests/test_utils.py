@@ -107,6 +107,14 @@ def test_standardize_column_names():
     ]
 
 
+def test_standardize_column_name_matches_standardize_column_names():
+    columns = ["Gene ID", "logFC", "p-value", "Fold.Change (%)", "a/b#c", "A_B"]
+    df = utils.standardize_column_names(df=pd.DataFrame(columns=columns))
+    assert [utils.standardize_column_name(column) for column in columns] == list(
+        df.columns
+    )
+
+
 class TestStandardizeValues:
     df = pd.DataFrame(
         {
@@ -122,14 +130,49 @@ class TestStandardizeValues:
         for value in standard_df.iloc[0].tolist():
             assert np.isnan(value)
 
-    def test_standardize_values_TypeError(self):
-        with patch.object(pd.DataFrame, "replace") as patch_replace:
-            patch_replace.side_effect = TypeError
-            captured_output = StringIO()
-            sys.stdout = captured_output
-            standard_df = utils.standardize_values(df=self.df.copy())
-            assert "Error comparing types." in captured_output.getvalue()
-            assert standard_df.equals(self.df)
+    def test_standardize_values_matches_substrings_in_any_case(self):
+        df = pd.DataFrame(
+            {
+                "a": ["not measured (N/a)", "ann/abc", "n/ a", "na", None],
+                "b": [["n/a"], {"n/a": 1}, b"n/a", "x", "N/A"],
+            }
+        )
+        standard_df = utils.standardize_values(df=df)
+        assert standard_df["a"].isna().tolist() == [True, True, False, False, True]
+        assert standard_df["b"].isna().tolist() == [False, False, False, False, True]
+        assert standard_df["b"][0] == ["n/a"]
+
+    def test_standardize_values_converts_object_columns(self):
+        # like the original DataFrame.replace implementation
+        df = pd.DataFrame(
+            {
+                "a": [1, "N/A"],
+                "b": pd.Series([1, 2], dtype=object),
+                "c": [None, None],
+            }
+        )
+        standard_df = utils.standardize_values(df=df)
+        assert standard_df["a"].dtype == np.float64
+        assert standard_df["b"].dtype == np.int64
+        assert standard_df["c"].isna().all()
+
+    def test_standardize_values_skips_non_text_columns(self):
+        df = pd.DataFrame({"a": [1.5, np.nan], "b": [1, 2], "c": [True, False]})
+        standard_df = utils.standardize_values(df=df.copy())
+        pd.testing.assert_frame_equal(standard_df, df)
+
+    def test_standardize_values_categorical_and_string_columns(self):
+        df = pd.DataFrame(
+            {
+                "a": pd.Categorical(["CBE", "N/A", "x n/a"]),
+                "b": pd.array(["CBE", "N/a", None], dtype="string"),
+            }
+        )
+        standard_df = utils.standardize_values(df=df)
+        assert standard_df["a"].isna().tolist() == [False, True, True]
+        assert list(standard_df["a"].cat.categories) == ["CBE"]
+        assert standard_df["b"].isna().tolist() == [False, True, True]
+        assert standard_df["b"].dtype == "string"
 
 
 class TestRenameColumns:
@@ -160,6 +203,88 @@ class TestRenameColumns:
         assert list(bad_renamed_df.columns) == list(self.good_column_map.keys())
 
 
+class TestMergeOneToOne:
+    frames = [
+        pd.DataFrame(
+            {
+                "name": ["c", "a", "b"],
+                "ensembl_gene_id": ["ENSG3", "ENSG1", np.nan],
+                "score": [1, 2, 3],
+            }
+        ),
+        pd.DataFrame({"ensembl_gene_id": ["ENSG4", None, "ENSG1"], "is_igap": True}),
+        pd.DataFrame(
+            {"ensembl_gene_id": ["ENSG5", "ENSG3"], "name": ["e", "c"], "score": 0.5}
+        ),
+    ]
+
+    @staticmethod
+    def merge_sequentially(frames: list) -> pd.DataFrame:
+        merged = frames[0]
+        for frame in frames[1:]:
+            merged = pd.merge(
+                left=merged,
+                right=frame,
+                on="ensembl_gene_id",
+                how="outer",
+                validate="one_to_one",
+            )
+        return merged
+
+    @pytest.mark.parametrize("n_frames", [1, 2, 3])
+    def test_merge_one_to_one_matches_sequential_merges(self, n_frames):
+        frames = self.frames[:n_frames]
+        merged = utils.merge_one_to_one(frames=frames, on="ensembl_gene_id")
+        pd.testing.assert_frame_equal(merged, self.merge_sequentially(frames))
+
+    def test_merge_one_to_one_rows_columns_and_types(self):
+        merged = utils.merge_one_to_one(frames=self.frames, on="ensembl_gene_id")
+        assert list(merged["ensembl_gene_id"].fillna("missing")) == [
+            "ENSG3",
+            "ENSG1",
+            "missing",
+            "ENSG4",
+            "ENSG5",
+        ]
+        assert list(merged.columns) == [
+            "name_x",
+            "ensembl_gene_id",
+            "score_x",
+            "is_igap",
+            "name_y",
+            "score_y",
+        ]
+        assert merged["score_x"].dtype == np.float64
+        assert merged["is_igap"].tolist()[:3] == [np.nan, True, True]
+
+    def test_merge_one_to_one_empty_first_frame(self):
+        frames = [self.frames[0].iloc[:0], self.frames[1]]
+        merged = utils.merge_one_to_one(frames=frames, on="ensembl_gene_id")
+        pd.testing.assert_frame_equal(merged, self.merge_sequentially(frames))
+        assert list(merged.columns) == ["name", "score", "ensembl_gene_id", "is_igap"]
+
+    @pytest.mark.parametrize("position, side", [(0, "left"), (2, "right")])
+    def test_merge_one_to_one_duplicate_keys(self, position, side):
+        frames = list(self.frames)
+        frames[position] = pd.concat([frames[position], frames[position]])
+        with pytest.raises(
+            pd.errors.MergeError,
+            match=f"Merge keys are not unique in {side} dataset; not a one-to-one merge",
+        ):
+            utils.merge_one_to_one(frames=frames, on="ensembl_gene_id")
+
+    def test_merge_one_to_one_duplicate_suffixes(self):
+        # the fourth frame adds a "name" column again, which the fifth renames to the existing "name_x"
+        frames = self.frames + [
+            pd.DataFrame({"ensembl_gene_id": ["ENSG1"], "name": "f"}),
+            pd.DataFrame({"ensembl_gene_id": ["ENSG2"], "name": "g"}),
+        ]
+        with pytest.raises(pd.errors.MergeError, match="cause duplicate columns"):
+            self.merge_sequentially(frames)
+        with pytest.raises(pd.errors.MergeError, match="cause duplicate columns"):
+            utils.merge_one_to_one(frames=frames, on="ensembl_gene_id")
+
+
 class TestNestFields:
     """Tests the nest_fields function using a dataframe that has multiple rows per group and
     one that only has one row per group.
@@ -269,6 +394,39 @@ class TestNestFields:
         )
         assert list(nested_df["e"]) == expected_column_e
 
+    def test_nest_fields_sorts_groups_and_keeps_row_order(self):
+        df = pd.DataFrame(
+            {
+                "a": ["group_2", "group_1", "group_2", np.nan, "group_1"],
+                "b": [1.0, 2.0, np.nan, 4.0, 5.0],
+                "c": ["x", None, "y", "z", np.nan],
+            }
+        )
+        nested_df = utils.nest_fields(df=df, grouping="a", new_column="e")
+
+        assert list(nested_df.columns) == ["a", "e"]
+        assert list(nested_df["a"]) == ["group_1", "group_2"]
+        assert list(nested_df["e"]) == [
+            [
+                {"a": "group_1", "b": 2.0, "c": None},
+                {"a": "group_1", "b": 5.0, "c": None},
+            ],
+            [
+                {"a": "group_2", "b": 1.0, "c": "x"},
+                {"a": "group_2", "b": None, "c": "y"},
+            ],
+        ]
+
+    def test_nest_fields_does_not_modify_data_frame(self):
+        df = self.df_multirow.iloc[::-1].copy()
+        utils.nest_fields(df=df, grouping="a", new_column="e", drop_columns=["d"])
+        pd.testing.assert_frame_equal(df, self.df_multirow.iloc[::-1])
+
+    def test_nest_fields_no_rows_to_nest_ValueError(self):
+        df = pd.DataFrame({"a": [np.nan], "b": ["1"]})
+        with pytest.raises(ValueError, match="no rows with a value for a"):
+            utils.nest_fields(df=df, grouping="a", new_column="e")
+
 
 class TestCalculateDistribution:
     # NOTE: pd.describe() calls np.quantile() with interpolation when quantiles fall between values.
@@ -89,11 +89,14 @@ Other notes about the test files:
                             "gene_metadata".
 """
 
+import io
 import os
 
+import numpy as np
 import pandas as pd
 import pytest
 
+from agoradatatools.etl import load
 from agoradatatools.etl.transform import gene_info
 
 
@@ -291,6 +294,68 @@ class TestTransformGeneInfo:
         expected_df = pd.read_json(json_file)
         pd.testing.assert_frame_equal(output_df, expected_df)
 
+    @pytest.mark.parametrize(
+        "input_files_dict, expected_output_file, param_set",
+        pass_test_data,
+        ids=pass_test_ids,
+    )
+    def test_transform_gene_info_records_are_unchanged(
+        self, input_files_dict: dict, expected_output_file: str, param_set: dict
+    ):
+        """
+        Test that the records written for gene_info are identical to those of the row by row implementation of
+        resource_url, alias, ensembl_possible_replacements and total_nominations, which wrote the "_records" files.
+        Unlike reading back the JSON file, this also distinguishes empty arrays from missing values.
+
+        Args:
+            input_files_dict: a dictionary where the keys are the names of the datasets, as expected by
+                               transform_gene_info, and the values are the filenames to load
+            expected_output_file: the filename of the expected output JSON file
+            param_set: a dictionary of parameters to pass to transform_gene_info
+
+        Returns:
+            None
+        """
+        datasets = self.read_input_files_dict(input_files_dict)
+
+        output_df = gene_info.transform_gene_info(
+            datasets=datasets,
+            adjusted_p_value_threshold=param_set["adjusted_p_value_threshold"],
+            protein_level_threshold=param_set["protein_level_threshold"],
+        )
+
+        records = io.StringIO()
+        load.write_json_records(df=output_df, file=records)
+        json_file = os.path.join(
+            self.data_files_path,
+            "output",
+            expected_output_file.replace(".json", "_records.json"),
+        )
+        with open(json_file) as expected:
+            assert records.getvalue() == expected.read()
+
+        for column in ["alias", "ensembl_info"]:
+            assert output_df[column].notna().all()
+        assert all(
+            isinstance(alias, np.ndarray) and alias.dtype == object
+            for alias in output_df["alias"]
+        )
+        assert output_df["total_nominations"].dtype == np.float64
+
+    def test_fill_empty_arrays(self):
+        column = pd.Series(
+            [np.array(["a"], dtype=object), np.NaN, None], index=[2, 5, 7], name="alias"
+        )
+        filled = gene_info.fill_empty_arrays(column=column)
+        assert filled.index.equals(column.index)
+        assert filled.name == "alias"
+        assert filled[2] is column[2]
+        for value in [filled[5], filled[7]]:
+            assert isinstance(value, np.ndarray)
+            assert value.dtype == object
+            assert len(value) == 0
+        assert column[5] is np.NaN
+
     @pytest.mark.parametrize(
         "input_files_dict, failure_case_files_dict, param_set, error_type, error_match_string",
         fail_test_data,
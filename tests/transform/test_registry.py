@@ -0,0 +1,219 @@
+import pkgutil
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+import yaml
+
+from agoradatatools.etl import transform
+from agoradatatools.etl.transform import registry
+
+
+TRANSFORM_MODULES = [
+    module.name
+    for module in pkgutil.iter_modules(transform.__path__)
+    if module.name != "registry"
+]
+
+
+class TestTransformRegistry:
+    @pytest.mark.parametrize("module_name", TRANSFORM_MODULES)
+    def test_every_transform_module_is_indexed(self, module_name):
+        registry._index_transform_modules()
+        full_name = f"{transform.__name__}.{module_name}"
+        dataset_names = [
+            name
+            for name, indexed_module in registry._dataset_modules.items()
+            if indexed_module == full_name
+        ]
+        assert dataset_names
+        for dataset_name in dataset_names:
+            assert (
+                registry.get_transform(dataset_name=dataset_name).func.__module__
+                == full_name
+            )
+        # the index agrees with the decorators once the module is imported
+        assert {
+            dataset_name
+            for dataset_name, spec in registry._registry.items()
+            if spec.func.__module__ == full_name
+        } == set(dataset_names)
+
+    def test_every_registered_transform_is_exported(self):
+        registry._index_transform_modules()
+        names = set(registry._function_modules)
+        assert names == set(transform.__all__)
+        for name in names:
+            assert getattr(transform, name).__name__ == name
+
+    def test_registered_names_are_read_from_the_source(self):
+        source = (
+            "@register_transform(datasets=['a', 'b'], inputs=['c'])\n"
+            "def transform_a(datasets): pass\n"
+            "@registry.register_transform(['d'])\n"
+            "def transform_d(df): pass\n"
+            "def helper(): pass\n"
+        )
+        assert registry._get_registered_names(source=source) == (
+            ["a", "b", "d"],
+            ["transform_a", "transform_d"],
+        )
+
+    def test_registered_names_that_are_not_literals_are_not_read(self):
+        source = (
+            "DATASETS = ['a']\n"
+            "@register_transform(datasets=DATASETS)\n"
+            "def transform_a(datasets): pass\n"
+        )
+        assert registry._get_registered_names(source=source) is None
+
+    @pytest.mark.parametrize(
+        "config_path", ["config.yaml", "test_config.yaml", "modelad_test_config.yaml"]
+    )
+    def test_custom_transformations_of_the_configs_are_registered(self, config_path):
+        with open(config_path) as config_file:
+            config = yaml.safe_load(config_file)
+        for dataset in config["datasets"]:
+            dataset_name, dataset_config = list(dataset.items())[0]
+            if "custom_transformations" not in dataset_config:
+                continue
+            assert registry.get_transform(dataset_name=dataset_name) is not None
+        assert registry.get_transform_config_errors(datasets=config["datasets"]) == []
+
+    def test_transform_config_errors(self):
+        datasets = [
+            {
+                "distribution_data": {
+                    "files": [{"name": "scores", "id": "syn1", "format": "csv"}],
+                    "custom_transformations": {"overall_max_score": 5},
+                }
+            },
+            {
+                "team_info": {
+                    "files": [{"name": "team_info", "id": "syn2", "format": "csv"}],
+                }
+            },
+            {
+                "neuropath_corr": {
+                    "files": [{"name": "neuropath", "id": "syn3", "format": "csv"}],
+                    "custom_transformations": 1,
+                }
+            },
+        ]
+        assert registry.get_transform_config_errors(datasets=datasets) == [
+            "The transformation of dataset distribution_data requires the following files: overall_scores",
+            "The transformation of dataset distribution_data requires the following custom_transformations: "
+            + "genetics_max_score, omics_max_score",
+        ]
+
+    def test_unknown_dataset_has_no_transform(self):
+        assert registry.get_transform(dataset_name="neuropath_corr") is None
+
+    def test_apply_passes_the_arguments_the_function_takes(self):
+        calls = []
+
+        def transform_test(datasets, dataset_name, threshold):
+            calls.append((datasets, dataset_name, threshold))
+            return datasets["test_input"]
+
+        with patch.dict(registry._registry):
+            registry.register_transform(
+                datasets=["test_dataset"],
+                inputs=["test_input"],
+                parameters=["threshold"],
+            )(transform_test)
+            spec = registry._registry["test_dataset"]
+            df = pd.DataFrame({"a": [1]})
+            result = spec.apply(
+                datasets={"test_input": df, "test_dataset": df},
+                dataset_name="test_dataset",
+                custom_transformations={"threshold": 0.05},
+            )
+        assert result is df
+        assert calls == [
+            (
+                {"test_input": df, "test_dataset": df},
+                "test_dataset",
+                0.05,
+            )
+        ]
+
+    def test_apply_passes_the_dataset_file_as_df(self):
+        spec = registry.get_transform(dataset_name="proteomics_tmt")
+        df = pd.DataFrame({"uniqid": ["a", "CON__b", None]})
+        result = spec.apply(
+            datasets={"proteomics_tmt": df}, dataset_name="proteomics_tmt"
+        )
+        assert result["uniqid"].to_list() == ["a"]
+
+    def test_apply_requires_inputs(self):
+        spec = registry.get_transform(dataset_name="team_info")
+        with pytest.raises(
+            ValueError, match="requires the following files: team_member_info"
+        ):
+            spec.apply(datasets={"team_info": pd.DataFrame()}, dataset_name="team_info")
+
+    def test_apply_requires_the_dataset_file(self):
+        spec = registry.get_transform(dataset_name="overall_scores")
+        with pytest.raises(
+            ValueError, match="requires the following files: overall_scores"
+        ):
+            spec.apply(
+                datasets={"scores": pd.DataFrame()}, dataset_name="overall_scores"
+            )
+
+    def test_apply_requires_parameters(self):
+        spec = registry.get_transform(dataset_name="distribution_data")
+        with pytest.raises(
+            ValueError,
+            match="requires the following custom_transformations: genetics_max_score, omics_max_score",
+        ):
+            spec.apply(
+                datasets={"overall_scores": pd.DataFrame()},
+                dataset_name="distribution_data",
+                custom_transformations={"overall_max_score": 5},
+            )
+
+    def test_register_transform_rejects_a_second_transform(self):
+        registry.get_transform(dataset_name="gene_info")
+        with patch.dict(registry._registry):
+            with pytest.raises(
+                ValueError, match="gene_info already has a transformation"
+            ):
+                registry.register_transform(datasets=["gene_info"])(
+                    lambda datasets: None
+                )
+
+    def test_transforms_are_imported_when_they_are_used(self):
+        code = (
+            "import sys\n"
+            "from agoradatatools import process\n"
+            "from agoradatatools.etl import transform\n"
+            "from agoradatatools.etl.transform import registry\n"
+            "loaded = lambda name: f'agoradatatools.etl.transform.{name}' in sys.modules\n"
+            "assert not loaded('gene_info') and not loaded('team_info')\n"
+            "registry.get_transform(dataset_name='team_info')\n"
+            "assert loaded('team_info') and not loaded('gene_info')\n"
+            "registry.get_transform(dataset_name='rna_distribution_data')\n"
+            "assert loaded('rna_distribution') and not loaded('gene_info')\n"
+            "assert transform.immunohisto_transform.__name__ == 'immunohisto_transform'\n"
+            "assert callable(transform.immunohisto_transform)\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_transform_functions_are_attributes_of_the_package(self):
+        code = (
+            "from agoradatatools.etl import transform\n"
+            "from agoradatatools.etl.transform.immunohisto_transform import immunohisto_transform\n"
+            "assert transform.transform_gene_info.__name__ == 'transform_gene_info'\n"
+            "assert callable(transform.immunohisto_transform)\n"
+            "try:\n"
+            "    transform.transform_unknown\n"
+            "except AttributeError:\n"
+            "    pass\n"
+            "else:\n"
+            "    raise AssertionError('transform_unknown')\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)